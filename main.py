@@ -38,10 +38,14 @@ from tg_imagebed.bot import start_telegram_bot_thread, _get_bot_status
 from tg_imagebed.utils import acquire_lock, release_lock, add_cache_headers, get_static_file_version
 
 # 导入数据库
-from tg_imagebed.database import init_database, get_all_files_count, get_total_size, init_system_settings
+from tg_imagebed.database import (
+    init_database, get_all_files_count, get_total_size, init_system_settings,
+    stop_access_count_flusher, start_stats_reconciler, stop_stats_reconciler,
+)
 
 # 导入服务
 from tg_imagebed.services.cdn_service import start_cdn_monitor, stop_cdn_monitor
+from tg_imagebed.services.upload_jobs import stop_upload_workers
 
 # 导入 admin_module（保持兼容）
 from tg_imagebed import admin_module
@@ -213,6 +217,9 @@ def main():
     # 初始化系统设置
     init_system_settings()
 
+    # 启动统计计数器定期重算
+    start_stats_reconciler()
+
     # 启动 CDN 监控（由 start_cdn_monitor 内部判断是否启用）
     start_cdn_monitor()
 
@@ -255,6 +262,9 @@ def main():
         shutdown_event.set()
     finally:
         stop_cdn_monitor()
+        stop_upload_workers()
+        stop_access_count_flusher()
+        stop_stats_reconciler()
         release_lock()
         logger.info("服务已停止")
 
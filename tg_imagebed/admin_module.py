@@ -12,12 +12,16 @@ import logging
 import time
 import json
 import re
-import requests
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import session, request, jsonify, render_template, make_response, redirect, url_for
 
-from .database.connection import get_connection
+from .database.connection import get_connection, get_connection_pool_stats
+from .database.files import find_orphaned_storage_objects, release_storage_objects, get_stats
+from .database.pagination import (
+    InvalidCursorError, cached_count, encode_cursor, invalidate_count_cache, keyset_condition,
+)
+from .database.search import SEARCH_TABLE, build_match_query, is_search_index_available
 
 # 日志配置
 logger = logging.getLogger(__name__)
@@ -657,34 +661,15 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
     @login_required
     def admin_stats():
         """获取管理统计信息"""
+        from .services.upload_jobs import get_upload_job_stats
+        from .telegram_api import get_telegram_api_stats
         try:
-            total_files = get_all_files_count()
-            total_size = get_total_size()
-
-            # 获取今日上传数
-            with get_connection() as conn:
-                cursor = conn.cursor()
-
-                try:
-                    # 修复日期查询 - 使用时间戳范围查询
-                    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                    today_end = datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999)
-                    today_start_ts = int(today_start.timestamp())
-                    today_end_ts = int(today_end.timestamp())
-
-                    cursor.execute('''
-                        SELECT COUNT(*) FROM file_storage
-                        WHERE upload_time >= ? AND upload_time <= ?
-                    ''', (today_start_ts, today_end_ts))
-                    today_uploads = cursor.fetchone()[0]
-
-                    # 获取 CDN 缓存数量
-                    cursor.execute('SELECT COUNT(*) FROM file_storage WHERE cdn_cached = 1')
-                    cdn_cached = cursor.fetchone()[0]
-                except Exception as e:
-                    logger.error(f"查询统计数据失败: {e}")
-                    today_uploads = 0
-                    cdn_cached = 0
+            # 统计计数器：O(1) 读取，不扫描 file_storage
+            stats = get_stats()
+            total_files = stats['total_files']
+            total_size = stats['total_size']
+            today_uploads = stats['today_uploads']
+            cdn_cached = stats['cdn_stats']['cached_files']
 
             response_data = {
                 'success': True,
@@ -695,7 +680,10 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                         'todayUploads': today_uploads,
                         'cdnCached': cdn_cached
                     },
-                    'config': _get_config_status_from_db()
+                    'config': _get_config_status_from_db(),
+                    'dbPool': get_connection_pool_stats(),
+                    'uploadJobs': get_upload_job_stats(),
+                    'telegramApi': get_telegram_api_stats()
                 }
             }
 
@@ -721,6 +709,8 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
             limit = request.args.get('limit', 20, type=int)
             search = request.args.get('search', '').strip()
             filter_type = request.args.get('filter', 'all').strip().lower()
+            page_cursor = request.args.get('cursor', '').strip()
+            sort = request.args.get('sort', '').strip().lower()
 
             # 边界保护：确保 page >= 1，1 <= limit <= 200
             page = max(1, page)
@@ -746,28 +736,43 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                 select_columns = [
                     'fs.encrypted_id', 'fs.file_id', 'fs.original_filename',
                     'fs.file_size', 'fs.source', 'fs.created_at', 'fs.username',
-                    'fs.access_count', 'fs.last_accessed', 'fs.upload_time',
-                    'fs.cdn_cached', 'fs.cdn_cache_time', 'fs.mime_type'
+                    'fs.upload_time', 'fs.cdn_cached', 'fs.cdn_cache_time', 'fs.mime_type',
+                    # 访问统计在独立的 file_access_stats 表中（未被访问过的文件没有记录）
+                    'COALESCE(fas.access_count, 0) AS access_count',
+                    'COALESCE(fas.cdn_hit_count, 0) AS cdn_hit_count',
+                    'COALESCE(fas.direct_hit_count, 0) AS direct_hit_count',
+                    'fas.last_accessed',
                 ]
 
                 # 可选列
                 if 'is_group_upload' in columns:
                     select_columns.append('fs.is_group_upload')
-                if 'cdn_hit_count' in columns:
-                    select_columns.append('fs.cdn_hit_count')
-                if 'direct_hit_count' in columns:
-                    select_columns.append('fs.direct_hit_count')
+
+                # 搜索优先使用全文索引（文件名/用户名/来源子串匹配），关键词过短或索引不可用时退回 LIKE
+                match_query = build_match_query(search) if search else None
+                if match_query and not is_search_index_available(cursor):
+                    match_query = None
+                # 全文检索默认按相关度排序；sort=time 或游标翻页时按时间排序
+                ranked = bool(match_query) and not page_cursor and sort != 'time'
+
+                from_clause = 'FROM file_storage fs'
+                if match_query:
+                    from_clause += f' JOIN {SEARCH_TABLE} ON {SEARCH_TABLE}.rowid = fs.rowid'
 
                 query = f'''
                     SELECT {', '.join(select_columns)}
-                    FROM file_storage fs
+                    {from_clause}
+                    LEFT JOIN file_access_stats fas ON fas.encrypted_id = fs.encrypted_id
                 '''
 
                 # 构建 WHERE 条件
                 where_clauses = []
                 where_params = []
 
-                if search:
+                if match_query:
+                    where_clauses.append(f'{SEARCH_TABLE} MATCH ?')
+                    where_params.append(match_query)
+                elif search:
                     # 搜索文件名和用户名
                     where_clauses.append('(fs.original_filename LIKE ? OR fs.username LIKE ?)')
                     search_pattern = f'%{search}%'
@@ -791,37 +796,55 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                         # 如果列不存在，返回空结果
                         where_clauses.append('1 = 0')
 
+                # 获取总数（与查询条件一致，短时缓存，翻页时不重复 COUNT）
+                if match_query and len(where_clauses) == 1:
+                    # 仅有搜索条件时直接在索引上计数，不回表
+                    count_query = f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?'
+                else:
+                    count_query = f'SELECT COUNT(*) {from_clause}'
+                    if where_clauses:
+                        count_query += ' WHERE ' + ' AND '.join(where_clauses)
+
+                def _count():
+                    cursor.execute(count_query, where_params)
+                    return cursor.fetchone()[0]
+
+                total_count = cached_count(('admin_images', search, filter_type), _count)
+
+                # 游标翻页：从上一页最后一条之后开始，不再扫描并丢弃前面的行
+                params = list(where_params)
+                if page_cursor:
+                    condition, cursor_params = keyset_condition('fs.created_at', 'fs.encrypted_id', page_cursor)
+                    where_clauses.append(condition)
+                    params.extend(cursor_params)
+                    offset = 0
+
                 # 拼接 WHERE 子句
                 if where_clauses:
                     query += ' WHERE ' + ' AND '.join(where_clauses)
 
-                # 获取总数（与查询条件一致）
-                count_query = 'SELECT COUNT(*) FROM file_storage fs'
-                if where_clauses:
-                    count_query += ' WHERE ' + ' AND '.join(where_clauses)
-                cursor.execute(count_query, where_params)
-
-                total_count = cursor.fetchone()[0]
-
                 # 获取当前页数据
-                query += ' ORDER BY fs.created_at DESC LIMIT ? OFFSET ?'
-                params = list(where_params)
+                order_by = 'fs.created_at DESC, fs.encrypted_id DESC'
+                if ranked:
+                    order_by = f'{SEARCH_TABLE}.rank, {order_by}'
+                query += f' ORDER BY {order_by} LIMIT ? OFFSET ?'
                 params.extend([limit, offset])
 
                 cursor.execute(query, params)
+                rows = cursor.fetchall()
+                # 相关度排序不支持游标翻页（仅页码分页）
+                next_cursor = (
+                    encode_cursor(rows[-1]['created_at'], rows[-1]['encrypted_id'])
+                    if len(rows) == limit and not ranked else None
+                )
                 images = []
 
-                for row in cursor.fetchall():
+                for row in rows:
                     image_data = dict(row)
 
                     # 如果没有 is_group_upload 列，默认为 0
                     if 'is_group_upload' not in image_data:
                         image_data['is_group_upload'] = 0
-                    # 如果没有访问统计列，默认为 0
-                    if 'cdn_hit_count' not in image_data:
-                        image_data['cdn_hit_count'] = 0
-                    if 'direct_hit_count' not in image_data:
-                        image_data['direct_hit_count'] = 0
 
                     # 处理时间格式
                     if image_data.get('upload_time'):
@@ -924,13 +947,17 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                     'totalPages': total_pages,
                     'total': total_count,
                     'page': page,
-                    'limit': limit
+                    'limit': limit,
+                    'nextCursor': next_cursor,
+                    'sort': 'relevance' if ranked else 'time'
                 }
             }
 
             logger.info(f"成功返回图片列表: {len(images)} 张图片, 总页数: {total_pages}")
             return jsonify(response_data)
 
+        except InvalidCursorError:
+            return jsonify({'success': False, 'error': '无效的分页游标'}), 400
         except Exception as e:
             logger.error(f"获取图片列表失败: {e}")
             import traceback
@@ -973,14 +1000,15 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                     placeholders = ','.join('?' * len(chunk))
                     try:
                         cursor.execute(f'''
-                            SELECT encrypted_id, file_size, group_chat_id, group_message_id
+                            SELECT encrypted_id, file_size, group_chat_id, group_message_id,
+                                   storage_backend, storage_key
                             FROM file_storage
                             WHERE encrypted_id IN ({placeholders})
                         ''', chunk)
                     except sqlite3.OperationalError as e:
                         if 'no such column' in str(e).lower():
                             cursor.execute(f'''
-                                SELECT encrypted_id, file_size, NULL, NULL
+                                SELECT encrypted_id, file_size, NULL, NULL, NULL, NULL
                                 FROM file_storage
                                 WHERE encrypted_id IN ({placeholders})
                             ''', chunk)
@@ -1004,7 +1032,10 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                 if tg_sync_delete_enabled:
                     try:
                         from .bot_control import get_effective_bot_token
+                        from .config import get_proxy_url
+                        from .telegram_api import get_telegram_client
                         bot_token, _ = get_effective_bot_token()
+                        tg_client = get_telegram_client(get_proxy_url())
                         if bot_token:
                             seen = set()
                             for row in files_to_delete:
@@ -1016,11 +1047,10 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                                     continue
                                 seen.add(key)
                                 try:
-                                    url = f"https://api.telegram.org/bot{bot_token}/deleteMessage"
-                                    resp = requests.post(url, data={
+                                    resp = tg_client.call(bot_token, 'deleteMessage', data={
                                         'chat_id': chat_id,
                                         'message_id': message_id
-                                    }, timeout=5)
+                                    }, timeout=5, max_wait=5)
                                     if resp.ok:
                                         try:
                                             payload = resp.json()
@@ -1042,6 +1072,13 @@ def register_admin_routes(app, DATABASE_PATH, get_all_files_count, get_total_siz
                     ''', chunk)
                     deleted_count += cursor.rowcount
 
+                # 去重共享的存储对象：最后一个引用被删除后才删除物理对象
+                orphaned = find_orphaned_storage_objects(
+                    cursor, {(row[4], row[5]) for row in files_to_delete}
+                )
+
+            invalidate_count_cache()
+            release_storage_objects(orphaned)
             logger.info(f"管理员删除了 {deleted_count} 张图片，TG消息同步删除 {tg_deleted_count} 条")
 
             return jsonify({
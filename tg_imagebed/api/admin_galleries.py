@@ -15,6 +15,7 @@ from ..database import (
     admin_update_gallery, admin_delete_gallery, admin_set_gallery_cover,
     admin_add_images_to_gallery, admin_remove_images_from_gallery,
     admin_get_gallery_images, admin_update_gallery_share,
+    InvalidCursorError,
 )
 from .. import admin_module
 
@@ -106,7 +107,11 @@ def admin_gallery_images(gallery_id: int):
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 50, type=int)
         limit = max(1, min(200, limit))
-        result = admin_get_gallery_images(gallery_id, page, limit)
+        cursor = request.args.get('cursor', '').strip() or None
+        try:
+            result = admin_get_gallery_images(gallery_id, page, limit, cursor=cursor)
+        except InvalidCursorError:
+            return _admin_json({'success': False, 'error': '无效的分页游标'}, 400)
         base_url = get_domain(request)
         cdn_domain = _get_cdn_domain()
         cdn_enabled = str(get_system_setting('cdn_enabled') or '0') == '1'
@@ -14,7 +14,9 @@ from ..config import logger
 from ..utils import add_cache_headers, format_size, get_domain
 from ..database import get_system_setting, update_system_setting
 from ..services.file_service import process_upload
+from ..services.upload_stream import UploadStream
 from ..storage.router import get_storage_router, reload_storage_router, _load_storage_config
+from ..storage.cache import CACHE_POLICIES, get_disk_cache_stats, normalize_cache_config
 from .. import admin_module
 
 # 敏感字段列表（需要掩码）
@@ -32,6 +34,9 @@ def _mask_sensitive(cfg: dict) -> dict:
     for k, v in (cfg or {}).items():
         if isinstance(v, dict):
             result[k] = _mask_sensitive(v)
+        elif isinstance(v, list):
+            # 如 telegram 的 shards: [{"bot_token": ..., "chat_id": ...}]
+            result[k] = [_mask_sensitive(item) if isinstance(item, dict) else item for item in v]
         elif k in _SENSITIVE_FIELDS and v:
             result[k] = _MASKED_VALUE
         else:
@@ -45,6 +50,15 @@ def _merge_sensitive(new_cfg: dict, old_cfg: dict) -> dict:
     for k, v in (new_cfg or {}).items():
         if isinstance(v, dict) and isinstance(old_cfg.get(k), dict):
             result[k] = _merge_sensitive(v, old_cfg[k])
+        elif isinstance(v, list) and isinstance(old_cfg.get(k), list):
+            # 列表按位置合并（被掩码的条目取旧列表同一位置的原值）
+            old_list = old_cfg[k]
+            result[k] = [
+                _merge_sensitive(item, old_list[i]) if (
+                    isinstance(item, dict) and i < len(old_list) and isinstance(old_list[i], dict)
+                ) else item
+                for i, item in enumerate(v)
+            ]
         elif k in _SENSITIVE_FIELDS and v == _MASKED_VALUE:
             result[k] = old_cfg.get(k, '')
         else:
@@ -208,14 +222,11 @@ def admin_upload():
 
     backend = (request.form.get('backend') or '').strip()
 
-    f.seek(0, 2)
-    size = f.tell()
-    f.seek(0)
-    file_content = f.read()
-
+    upload = UploadStream.from_stream(f.stream)
     try:
         result = process_upload(
-            file_content=file_content,
+            file_content=None,
+            file_stream=upload,
             filename=f.filename,
             content_type=content_type,
             username=session.get('admin_username', 'admin'),
@@ -225,6 +236,8 @@ def admin_upload():
         )
     except ValueError as e:
         return _admin_json({'success': False, 'error': str(e)}, 400)
+    finally:
+        upload.close()
 
     if not result:
         return _admin_json({'success': False, 'error': '上传失败'}, 500)
@@ -312,6 +325,7 @@ def add_storage_backend():
                 update_system_setting('telegram_bot_token', real_token)
                 from ..bot_control import clear_token_cache, request_bot_restart
                 clear_token_cache()
+                reload_storage_router()
                 request_bot_restart()
                 logger.info("存储 Bot Token 已同步到机器人配置，已触发重启")
 
@@ -380,6 +394,7 @@ def modify_storage_backend(name: str):
                 update_system_setting('telegram_bot_token', real_token)
                 from ..bot_control import clear_token_cache, request_bot_restart
                 clear_token_cache()
+                reload_storage_router()
                 request_bot_restart()
                 logger.info("存储 Bot Token 已同步到机器人配置，已触发重启")
 
@@ -392,4 +407,58 @@ def modify_storage_backend(name: str):
 
     except Exception as e:
         logger.error(f"修改存储后端失败: {e}")
-        return _admin_json({'success': False, 'error': '修改存储后端失败'}, 500)
\ No newline at end of file
+        return _admin_json({'success': False, 'error': '修改存储后端失败'}, 500)
+
+
+@admin_bp.route('/api/admin/storage/cache', methods=['GET', 'PUT', 'OPTIONS'])
+@admin_module.login_required
+def storage_disk_cache():
+    """获取/更新本地磁盘缓存配置"""
+    if request.method == 'OPTIONS':
+        return _admin_options('GET, PUT, OPTIONS')
+
+    try:
+        config = _load_storage_config()
+
+        if request.method == 'GET':
+            return _admin_json({
+                'success': True,
+                'data': {
+                    'config': normalize_cache_config(config.get('cache')),
+                    'stats': get_disk_cache_stats(),
+                }
+            })
+
+        # PUT 请求：更新缓存配置
+        data = request.get_json(silent=True) or {}
+        cache_cfg = data.get('cache') if isinstance(data.get('cache'), dict) else data
+        if not isinstance(cache_cfg, dict):
+            return _admin_json({'success': False, 'error': 'cache 必须为 JSON 对象'}, 400)
+
+        policy = str(cache_cfg.get('policy') or 'lru').strip().lower()
+        if policy not in CACHE_POLICIES:
+            return _admin_json({'success': False, 'error': f"不支持的淘汰策略: {policy}"}, 400)
+
+        backends = cache_cfg.get('backends')
+        if backends is not None:
+            if not isinstance(backends, list):
+                return _admin_json({'success': False, 'error': 'backends 必须为数组'}, 400)
+            configured = config.get('backends') or {}
+            for x in backends:
+                if str(x) not in configured:
+                    return _admin_json({'success': False, 'error': f"后端 {x} 未配置"}, 400)
+
+        try:
+            normalized = normalize_cache_config({**cache_cfg, 'policy': policy})
+        except (TypeError, ValueError):
+            return _admin_json({'success': False, 'error': '缓存大小必须为非负整数'}, 400)
+
+        config['cache'] = normalized
+        _save_storage_config(config)
+
+        logger.info(f"更新磁盘缓存配置: enabled={normalized['enabled']}, max_size_mb={normalized['max_size_mb']}")
+        return _admin_json({'success': True, 'data': {'config': normalized}})
+
+    except Exception as e:
+        logger.error(f"磁盘缓存配置操作失败: {e}")
+        return _admin_json({'success': False, 'error': '磁盘缓存配置操作失败'}, 500)
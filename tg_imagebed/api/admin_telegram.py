@@ -10,6 +10,7 @@ from .admin_helpers import _admin_json, _admin_options
 from ..config import logger
 from ..utils import add_cache_headers
 from ..database import update_system_setting
+from ..storage.router import reload_storage_router
 from .. import admin_module
 
 
@@ -45,6 +46,8 @@ def admin_telegram_bot_config():
         # 保存到数据库
         update_system_setting('telegram_bot_token', new_token)
         clear_token_cache()
+        # 未单独配置 bot_token 的 telegram 存储后端依赖该 Token，需要重建
+        reload_storage_router()
 
         logger.info(f"更新 Telegram Bot Token: {'已设置' if new_token else '已清除'}")
 
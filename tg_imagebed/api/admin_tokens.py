@@ -14,6 +14,7 @@ from ..database import (
     admin_list_tokens, admin_create_token,
     admin_update_token_status, admin_update_token, admin_delete_token,
     admin_get_token_detail, admin_get_token_uploads, admin_get_token_galleries,
+    InvalidCursorError,
 )
 from ..services.token_service import TokenService
 from .. import admin_module
@@ -147,8 +148,9 @@ def admin_token_uploads_api(token_id: int):
     try:
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 50, type=int)
+        cursor = request.args.get('cursor', '').strip() or None
 
-        data = admin_get_token_uploads(token_id, page=page, page_size=page_size)
+        data = admin_get_token_uploads(token_id, page=page, page_size=page_size, cursor=cursor)
 
         # 为每张图片附加 image_url
         base_url = get_domain(request)
@@ -161,6 +163,8 @@ def admin_token_uploads_api(token_id: int):
 
         return _admin_json({'success': True, 'data': data})
 
+    except InvalidCursorError:
+        return _admin_json({'success': False, 'error': '无效的分页游标'}, 400)
     except Exception as e:
         logger.error(f"Token 上传记录 API 失败: {e}")
         return _admin_json({'success': False, 'error': '获取上传记录失败'}, 500)
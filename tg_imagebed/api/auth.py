@@ -12,15 +12,21 @@ from .auth_helpers import extract_bearer_token
 from ..config import logger
 from ..utils import add_cache_headers, format_size, get_domain
 from ..database import (
-    verify_auth_token, verify_auth_token_access, get_token_info, update_token_usage,
+    verify_auth_token, verify_auth_token_access, get_token_info,
+    reserve_token_uploads, release_token_uploads,
     update_token_description, is_token_generation_allowed, is_token_upload_allowed,
-    get_system_setting_int, get_upload_count_today,
-    create_auth_token, get_token_uploads,
+    get_system_setting_int,
+    create_auth_token, get_token_uploads, InvalidCursorError, next_page_cursor,
     get_system_setting, verify_tg_session, get_user_token_count, bind_token_to_user, unbind_token_from_user,
     count_tokens_by_ip,
 )
 from ..services.file_service import process_upload
-from .upload import validate_image_magic, is_extension_allowed
+from ..services.upload_stream import UploadStream, UploadTooLargeError
+from .upload import (
+    validate_image_magic, is_extension_allowed, wants_async_upload, submit_async_upload,
+    get_batch_files, run_batch_upload, batch_upload_response, UPLOAD_BATCH_MAX_FILES,
+    reserve_upload_quota, daily_limit_response,
+)
 
 
 def _extract_bearer_token() -> str:
@@ -28,6 +34,19 @@ def _extract_bearer_token() -> str:
     return extract_bearer_token()
 
 
+def _token_limit_response(verification: dict):
+    """Token 上传次数用完的响应"""
+    limit = (verification.get('token_data') or {}).get('upload_limit')
+    return add_cache_headers(jsonify({'success': False, 'error': f"Token无效: 已达到上传限制({limit}张)"}), 'no-cache'), 401
+
+
+def _release_upload_reservations(token: str, quota, count: int = 1) -> None:
+    """归还预占的 Token 上传次数与每日额度"""
+    release_token_uploads(token, count)
+    if quota:
+        quota.release(count)
+
+
 @auth_bp.route('/api/auth/token/generate', methods=['POST'])
 def generate_token():
     """生成游客 Token"""
@@ -198,13 +217,6 @@ def upload_with_token():
     if not verification['valid']:
         return add_cache_headers(jsonify({'success': False, 'error': f"Token无效: {verification['reason']}"}), 'no-cache'), 401
 
-    # 检查每日上传限制（按 token 统计）
-    daily_limit = get_system_setting_int('daily_upload_limit', 0, minimum=0, maximum=1000000)
-    if daily_limit > 0:
-        uploaded_today = get_upload_count_today(auth_token=token)
-        if uploaded_today >= daily_limit:
-            return add_cache_headers(jsonify({'success': False, 'error': f'已达到每日上传限制({daily_limit}张)'}), 'no-cache'), 429
-
     # 检查文件
     if 'file' not in request.files:
         return add_cache_headers(jsonify({'success': False, 'error': '未提供文件'}), 'no-cache'), 400
@@ -235,28 +247,54 @@ def upload_with_token():
     if file_size > max_size_bytes:
         return add_cache_headers(jsonify({'success': False, 'error': f'文件大小超过 {max_size_mb}MB 限制'}), 'no-cache'), 400
 
+    async_mode = wants_async_upload()
+    upload = None
+    reserved = False
+    quota = None
     try:
-        file_content = file.read()
+        # 流式读取：统计大小、计算哈希、嗅探文件头（不整体读入内存）
+        try:
+            upload = UploadStream.from_stream(file.stream, max_size=max_size_bytes, detached=async_mode)
+        except UploadTooLargeError:
+            return add_cache_headers(jsonify({'success': False, 'error': f'文件大小超过 {max_size_mb}MB 限制'}), 'no-cache'), 400
 
         # 魔数校验：验证文件实际类型
-        detected_mime = validate_image_magic(file_content)
+        detected_mime = validate_image_magic(upload.head)
         if not detected_mime:
             return add_cache_headers(jsonify({'success': False, 'error': '无效的图片文件格式'}), 'no-cache'), 400
 
-        result = process_upload(
-            file_content=file_content,
-            filename=file.filename,
-            content_type=file.content_type,
-            username='guest_user',
-            source='guest_token',
-            auth_token=token
-        )
+        # 提交前预占 Token 上传次数与每日额度（按 token 统计），上传失败时归还
+        if not reserve_token_uploads(token):
+            return _token_limit_response(verification)
+        reserved = True
+        quota = reserve_upload_quota(auth_token=token)
+        if quota and not quota.granted:
+            quota = None
+            return daily_limit_response()
+
+        upload_kwargs = {
+            'filename': file.filename,
+            'content_type': file.content_type,
+            'username': 'guest_user',
+            'source': 'guest_token',
+            'auth_token': token,
+        }
+
+        # 异步上传：已预占的次数随任务转交，任务失败时归还
+        if async_mode:
+            pending, upload = upload, None
+            reservation, quota, reserved = quota, None, False
+            return submit_async_upload(
+                pending,
+                on_failure=lambda: _release_upload_reservations(token, reservation),
+                **upload_kwargs,
+            )
+
+        result = process_upload(file_content=None, file_stream=upload, **upload_kwargs)
 
         if not result:
             return add_cache_headers(jsonify({'success': False, 'error': '上传到Telegram失败'}), 'no-cache'), 500
-
-        # 更新 Token 使用次数
-        update_token_usage(token)
+        reserved, quota = False, None
 
         # 生成 URL
         base_url = get_domain(request)
@@ -282,6 +320,73 @@ def upload_with_token():
     except Exception as e:
         logger.error(f"Token上传错误: {e}")
         return add_cache_headers(jsonify({'success': False, 'error': '上传失败，请稍后重试'}), 'no-cache'), 500
+    finally:
+        if reserved:
+            _release_upload_reservations(token, quota)
+        elif quota:
+            quota.release()
+        if upload is not None:
+            upload.close()
+
+@auth_bp.route('/api/auth/upload/batch', methods=['POST'])
+def upload_batch_with_token():
+    """使用 Token 批量上传图片（单个请求包含多个文件）"""
+    if not is_token_upload_allowed():
+        return add_cache_headers(jsonify({
+            'success': False,
+            'error': 'Token 上传已关闭，仅管理员可上传'
+        }), 'no-cache'), 403
+
+    # Token 只验证一次
+    token = _extract_bearer_token()
+    if not token:
+        return add_cache_headers(jsonify({'success': False, 'error': '未提供Token'}), 'no-cache'), 401
+
+    verification = verify_auth_token(token)
+    if not verification['valid']:
+        return add_cache_headers(jsonify({'success': False, 'error': f"Token无效: {verification['reason']}"}), 'no-cache'), 401
+
+    files = get_batch_files()
+    if not files:
+        return add_cache_headers(jsonify({'success': False, 'error': '未提供文件'}), 'no-cache'), 400
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        return add_cache_headers(jsonify({'success': False, 'error': f'单次最多上传 {UPLOAD_BATCH_MAX_FILES} 个文件'}), 'no-cache'), 400
+
+    # 可接受的文件数：预占 Token 剩余次数，再按此数预占每日额度，多余部分立即归还
+    reserved = reserve_token_uploads(token, len(files))
+    if not reserved:
+        return _token_limit_response(verification)
+    daily_quota = reserve_upload_quota(reserved, auth_token=token)
+    if daily_quota and not daily_quota.granted:
+        release_token_uploads(token, reserved)
+        return daily_limit_response()
+    accepted = daily_quota.granted if daily_quota else reserved
+    release_token_uploads(token, reserved - accepted)
+
+    max_size_mb = get_system_setting_int('max_file_size_mb', 20, minimum=1, maximum=1024)
+
+    try:
+        results = run_batch_upload(
+            files,
+            max_size_mb=max_size_mb,
+            quota=accepted,
+            username='guest_user',
+            source='guest_token',
+            auth_token=token,
+        )
+    except Exception as e:
+        logger.error(f"Token批量上传错误: {e}")
+        _release_upload_reservations(token, daily_quota, accepted)
+        return add_cache_headers(jsonify({'success': False, 'error': '上传失败，请稍后重试'}), 'no-cache'), 500
+
+    succeeded = sum(1 for r in results if r.get('success'))
+    _release_upload_reservations(token, daily_quota, accepted - succeeded)
+
+    remaining = max(0, verification.get('remaining_uploads', 0) - succeeded)
+    logger.info(f"游客批量上传完成: {succeeded}/{len(results)}, 剩余: {remaining}次")
+
+    return batch_upload_response(results, remaining_uploads=remaining)
+
 
 @auth_bp.route('/api/auth/uploads', methods=['GET'])
 def get_token_uploads_api():
@@ -301,8 +406,10 @@ def get_token_uploads_api():
 
         limit = request.args.get('limit', 50, type=int)
         page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor', '').strip() or None
 
-        uploads = get_token_uploads(token, limit, page)
+        uploads = get_token_uploads(token, limit, page, cursor=cursor)
+        next_cursor = next_page_cursor(uploads, limit, 'created_at')
 
         base_url = get_domain(request)
         for upload in uploads:
@@ -326,10 +433,13 @@ def get_token_uploads_api():
                 'can_upload': verification.get('can_upload', False),
                 'page': page,
                 'limit': limit,
-                'has_more': len(uploads) == limit
+                'has_more': len(uploads) == limit,
+                'next_cursor': next_cursor
             }
         }), 'no-cache')
 
+    except InvalidCursorError:
+        return add_cache_headers(jsonify({'success': False, 'error': '无效的分页游标'}), 'no-cache'), 400
     except Exception as e:
         logger.error(f"获取token上传列表失败: {e}")
         return add_cache_headers(jsonify({'success': False, 'error': '获取上传列表失败，请稍后重试'}), 'no-cache'), 500
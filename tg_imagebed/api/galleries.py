@@ -19,7 +19,8 @@ from ..database import (
     get_share_all_link, create_or_update_share_all_link, get_share_all_galleries,
     get_share_all_gallery, get_share_all_gallery_images,
     grant_gallery_token_access, revoke_gallery_token_access,
-    list_gallery_token_access, is_token_authorized_for_gallery, is_gallery_owner
+    list_gallery_token_access, is_token_authorized_for_gallery, is_gallery_owner,
+    InvalidCursorError,
 )
 
 
@@ -155,7 +156,11 @@ def gallery_images(gallery_id: int):
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 50, type=int)
         limit = max(1, min(100, limit))
-        result = get_gallery_images(gallery_id, token, page, limit)
+        cursor = request.args.get('cursor', '').strip() or None
+        try:
+            result = get_gallery_images(gallery_id, token, page, limit, cursor=cursor)
+        except InvalidCursorError:
+            return _cors_response({'success': False, 'error': '无效的分页游标'}, 400)
         base_url = get_domain(request)
         for item in result['items']:
             item['image_url'] = f"{base_url}/image/{item['encrypted_id']}"
@@ -365,7 +370,11 @@ def shared_gallery_api(share_token: str):
     limit = request.args.get('limit', 50, type=int)
     limit = max(1, min(100, limit))
 
-    images_result = get_gallery_images(gallery['id'], None, page, limit)
+    cursor = request.args.get('cursor', '').strip() or None
+    try:
+        images_result = get_gallery_images(gallery['id'], None, page, limit, cursor=cursor)
+    except InvalidCursorError:
+        return _cors_response({'success': False, 'error': '无效的分页游标'}, 400)
     base_url = get_domain(request)
     for item in images_result['items']:
         item['image_url'] = f"{base_url}/image/{item['encrypted_id']}"
@@ -383,7 +392,8 @@ def shared_gallery_api(share_token: str):
             'total': images_result['total'],
             'page': page,
             'limit': limit,
-            'has_more': page * limit < images_result['total']
+            'has_more': bool(images_result['next_cursor']) if cursor else page * limit < images_result['total'],
+            'next_cursor': images_result['next_cursor']
         }
     })
 
@@ -584,7 +594,11 @@ def shared_all_gallery_detail_api(share_all_token: str, gallery_id: int):
     limit = request.args.get('limit', 50, type=int)
     limit = max(1, min(100, limit))
 
-    images_result = get_share_all_gallery_images(share_all_token, gallery['id'], page, limit)
+    cursor = request.args.get('cursor', '').strip() or None
+    try:
+        images_result = get_share_all_gallery_images(share_all_token, gallery['id'], page, limit, cursor=cursor)
+    except InvalidCursorError:
+        return _cors_response({'success': False, 'error': '无效的分页游标'}, 400)
     if not images_result:
         return _cors_response({'success': False, 'error': '分享链接无效或画集不可见'}, 404)
 
@@ -606,7 +620,8 @@ def shared_all_gallery_detail_api(share_all_token: str, gallery_id: int):
             'total': images_result['total'],
             'page': page,
             'limit': limit,
-            'has_more': page * limit < images_result['total']
+            'has_more': bool(images_result['next_cursor']) if cursor else page * limit < images_result['total'],
+            'next_cursor': images_result['next_cursor']
         }
     })
 
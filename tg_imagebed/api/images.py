@@ -7,7 +7,9 @@ import os
 import time
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Optional
 from flask import request, jsonify, Response, send_file, redirect, make_response, send_from_directory
+from werkzeug.http import http_date, parse_date, parse_etags, unquote_etag
 
 from . import images_bp
 from ..config import (
@@ -17,23 +19,92 @@ from ..config import (
 from ..database import (
     get_file_info, update_access_count, update_cdn_cache_status,
     get_stats, get_recent_uploads, update_file_path_in_db,
-    get_system_setting, get_system_setting_int
+    InvalidCursorError, next_page_cursor,
+    get_system_setting, get_system_setting_int, get_settings_snapshot
 )
 from ..utils import (
     add_cache_headers, format_size, get_domain, get_static_file_version, LOCAL_IP
 )
 from ..services.cdn_service import cloudflare_cdn, get_monitor_queue_size
+from ..storage.base import FileBody
 from ..storage.router import get_storage_router
 
 
-def _get_domain_mode():
+def _get_domain_mode(settings=None):
     """获取域名模式配置"""
-    domain = str(get_system_setting('cloudflare_cdn_domain') or '').strip()
-    cdn_enabled = str(get_system_setting('cdn_enabled') or '0') == '1'
+    settings = settings or get_settings_snapshot()
+    domain = settings.get_str('cloudflare_cdn_domain')
+    cdn_enabled = settings.get_bool('cdn_enabled')
     cdn_mode = bool(domain) and cdn_enabled
     return domain, cdn_enabled, cdn_mode
 
 
+def _is_not_modified(etag: str, upload_time: int) -> bool:
+    """条件请求判断（If-None-Match 存在时忽略 If-Modified-Since）"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0])
+    if upload_time > 0:
+        since = parse_date(request.headers.get('If-Modified-Since'))
+        if since is not None:
+            return upload_time <= int(since.timestamp())
+    return False
+
+
+def _if_range_matches(etag: str, upload_time: int) -> bool:
+    """If-Range 校验：不匹配时应忽略 Range 返回完整内容"""
+    if_range = (request.headers.get('If-Range') or '').strip()
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # If-Range 要求强比较，弱 ETag 永不匹配
+        tag, tag_weak = unquote_etag(if_range)
+        value, weak = unquote_etag(etag)
+        return not tag_weak and not weak and tag == value
+    date = parse_date(if_range)
+    return date is not None and upload_time > 0 and int(date.timestamp()) == upload_time
+
+
+def _image_response_headers(
+    base: Optional[Dict[str, str]],
+    etag: str,
+    last_modified: Optional[str],
+    filename: str,
+    access_type: str,
+    backend_name: str,
+) -> Dict[str, str]:
+    """图片响应通用头部（后端返回的头部优先）"""
+    headers = dict(base or {})
+    headers.setdefault('Content-Disposition', f'inline; filename="{filename}"')
+    headers.setdefault('X-Content-Type-Options', 'nosniff')
+    headers.setdefault('Accept-Ranges', 'bytes')
+    headers['ETag'] = etag
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    headers['X-Access-Type'] = access_type
+    headers['X-Storage-Backend'] = backend_name
+    headers['Access-Control-Allow-Origin'] = '*'
+    headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
+    headers['Access-Control-Allow-Headers'] = 'Range, Cache-Control'
+    headers['Access-Control-Expose-Headers'] = (
+        'Content-Length, Content-Range, Accept-Ranges, ETag, Last-Modified, X-Storage-Backend'
+    )
+    return headers
+
+
+def _apply_image_cache_headers(resp: Response, encrypted_id: str, cdn_mode: bool, is_new_file: bool) -> None:
+    """根据模式设置缓存头"""
+    if cdn_mode:
+        if is_new_file:
+            resp.headers['Cache-Control'] = 'public, max-age=300, s-maxage=300'
+        else:
+            resp.headers['Cache-Control'] = 'public, max-age=31536000, s-maxage=2592000, immutable'
+        resp.headers['Vary'] = 'Accept-Encoding'
+        resp.headers['Cache-Tag'] = f'image-{encrypted_id[:8]},imagebed,static'
+    else:
+        resp.headers['Cache-Control'] = 'public, max-age=3600'
+
+
 @images_bp.route('/')
 def index():
     """返回主页"""
@@ -73,11 +144,12 @@ def serve_image(encrypted_id):
     is_cdn_request = bool(request.headers.get('CF-Connecting-IP'))
     access_type = 'cdn_pull' if is_cdn_request else 'direct_access'
 
-    # 从数据库读取域名和 CDN 配置
-    cdn_domain, _, cdn_mode = _get_domain_mode()
-    cdn_redirect_enabled = str(get_system_setting('cdn_redirect_enabled') or '0') == '1'
-    cdn_redirect_max_count = get_system_setting_int('cdn_redirect_max_count', 2, minimum=1)
-    cdn_redirect_delay = get_system_setting_int('cdn_redirect_delay', 10, minimum=0)
+    # 从设置快照读取域名和 CDN 配置
+    settings = get_settings_snapshot()
+    cdn_domain, _, cdn_mode = _get_domain_mode(settings)
+    cdn_redirect_enabled = settings.get_bool('cdn_redirect_enabled')
+    cdn_redirect_max_count = settings.get_int('cdn_redirect_max_count', 2, minimum=1)
+    cdn_redirect_delay = settings.get_int('cdn_redirect_delay', 10, minimum=0)
 
     # 检查是否来自 CDN 域名
     host = request.headers.get('Host', '')
@@ -115,7 +187,7 @@ def serve_image(encrypted_id):
             if cdn_url not in request_url:
                 logger.info(f"图片已缓存，重定向到CDN: {encrypted_id} -> {cdn_url}")
                 update_access_count(encrypted_id, access_type)
-                cdn_redirect_cache_time = get_system_setting_int('cdn_redirect_cache_time', 300, minimum=0)
+                cdn_redirect_cache_time = settings.get_int('cdn_redirect_cache_time', 300, minimum=0)
                 response = redirect(cdn_url, code=302)
                 response.headers['Cache-Control'] = f'public, max-age={cdn_redirect_cache_time}'
                 response.headers['X-CDN-Redirect'] = 'true'
@@ -129,14 +201,17 @@ def serve_image(encrypted_id):
     # 更新访问计数
     update_access_count(encrypted_id, access_type)
 
-    # 生成 ETag
+    # 生成 ETag / Last-Modified
     etag = file_info.get('etag') or f'W/"{encrypted_id}-{file_info.get("file_size", 0)}"'
+    upload_time = int(file_info.get('upload_time') or 0)
+    last_modified = http_date(upload_time) if upload_time > 0 else None
 
-    # 检查条件请求
-    if_none_match = request.headers.get('If-None-Match')
-    if if_none_match and if_none_match == etag:
+    # 检查条件请求（If-None-Match 优先于 If-Modified-Since）
+    if _is_not_modified(etag, upload_time):
         response = Response(status=304)
         response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = last_modified
         # CDN 模式使用长缓存，其他模式使用短缓存
         if cdn_mode:
             response.headers['Cache-Control'] = 'public, max-age=31536000, s-maxage=2592000, immutable'
@@ -145,11 +220,50 @@ def serve_image(encrypted_id):
         response.headers['Access-Control-Allow-Origin'] = '*'
         return response
 
+    path_for_ext = file_info.get('file_path') or file_info.get('original_filename') or ''
+    file_ext = Path(path_for_ext).suffix or '.jpg'
+    filename = f"image_{encrypted_id[:12]}{file_ext}"
+
+    # HEAD 请求直接用数据库元数据响应，不访问存储后端
+    file_size = int(file_info.get('file_size') or 0)
+    if request.method == 'HEAD' and file_size > 0:
+        resp = Response(
+            status=200,
+            mimetype=file_info.get('mime_type') or 'application/octet-stream',
+        )
+        resp.headers.update(_image_response_headers(
+            {'Content-Length': str(file_size)},
+            etag, last_modified, filename, access_type, file_info.get('storage_backend') or '',
+        ))
+        _apply_image_cache_headers(resp, encrypted_id, cdn_mode, is_new_file)
+        return resp
+
     # 从存储后端下载图片
     try:
         router = get_storage_router()
         backend = router.get_backend_for_record(file_info)
+
+        # 重定向模式：302 到对象存储的公开/预签名 URL（访问计数已在上面记录）
+        if backend.serve_mode == 'redirect':
+            storage_key = str(
+                file_info.get('storage_key') or
+                file_info.get('file_path') or
+                file_info.get('file_id') or ''
+            ).strip()
+            target_url = backend.get_public_url(storage_key=storage_key, file_info=file_info) if storage_key else None
+            if target_url:
+                response = redirect(target_url, code=302)
+                response.headers['Access-Control-Allow-Origin'] = '*'
+                response.headers['X-Storage-Backend'] = backend.name
+                # 不缓存重定向本身：每次访问都经过本服务计数，图片内容按目标 URL 缓存
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            logger.warning(f"后端 {backend.name} 无法生成重定向 URL，改为代理: {encrypted_id}")
+
         range_header = request.headers.get('Range')
+        if range_header and not _if_range_matches(etag, upload_time):
+            # If-Range 不匹配：返回完整内容
+            range_header = None
 
         dl = backend.download(file_info=file_info, range_header=range_header)
 
@@ -168,40 +282,21 @@ def serve_image(encrypted_id):
 
         logger.info(f"从后端获取图片: {encrypted_id} (backend={backend.name}, 访问类型: {access_type})")
 
-        path_for_ext = file_info.get('file_path') or file_info.get('original_filename') or ''
-        file_ext = Path(path_for_ext).suffix or '.jpg'
-        filename = f"image_{encrypted_id[:12]}{file_ext}"
-
-        resp_headers = dict(dl.headers or {})
-        resp_headers.setdefault('Content-Disposition', f'inline; filename="{filename}"')
-        resp_headers.setdefault('X-Content-Type-Options', 'nosniff')
-        resp_headers.setdefault('Accept-Ranges', 'bytes')
-        resp_headers['ETag'] = etag
-        resp_headers['X-Access-Type'] = access_type
-        resp_headers['X-Storage-Backend'] = backend.name
-        resp_headers['Access-Control-Allow-Origin'] = '*'
-        resp_headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-        resp_headers['Access-Control-Allow-Headers'] = 'Range, Cache-Control'
-        resp_headers['Access-Control-Expose-Headers'] = 'Content-Length, Content-Range, Accept-Ranges, ETag, X-Storage-Backend'
+        resp_headers = _image_response_headers(
+            dl.headers, etag, last_modified, filename, access_type, backend.name
+        )
 
+        # 本地文件交给 wsgi.file_wrapper 发送（waitress 在 IO 线程完成传输，立即释放工作线程）
+        is_file_body = isinstance(dl.body, FileBody)
         resp = Response(
-            dl.body,
+            dl.body.wsgi_iter(request.environ) if is_file_body else dl.body,
             status=dl.status_code,
             mimetype=dl.content_type or (file_info.get('mime_type') or 'application/octet-stream'),
-            headers=resp_headers
+            headers=resp_headers,
+            direct_passthrough=is_file_body,
         )
 
-        # 根据模式设置缓存头
-        if cdn_mode:
-            if is_new_file:
-                resp.headers['Cache-Control'] = 'public, max-age=300, s-maxage=300'
-            else:
-                resp.headers['Cache-Control'] = 'public, max-age=31536000, s-maxage=2592000, immutable'
-            resp.headers['Vary'] = 'Accept-Encoding'
-            resp.headers['Cache-Tag'] = f'image-{encrypted_id[:8]},imagebed,static'
-        else:
-            resp.headers['Cache-Control'] = 'public, max-age=3600'
-
+        _apply_image_cache_headers(resp, encrypted_id, cdn_mode, is_new_file)
         return resp
 
     except Exception as e:
@@ -247,9 +342,11 @@ def get_recent_api():
     """获取最近上传的文件"""
     limit = request.args.get('limit', 12, type=int)
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '').strip() or None
 
     try:
-        recent_files = get_recent_uploads(limit, page)
+        recent_files = get_recent_uploads(limit, page, cursor=cursor)
+        next_cursor = next_page_cursor(recent_files, limit, 'created_at')
         base_url = get_domain(request)
         cdn_domain, _, cdn_mode = _get_domain_mode()
 
@@ -272,12 +369,17 @@ def get_recent_api():
             'files': recent_files,
             'page': page,
             'limit': limit,
-            'has_more': len(recent_files) == limit
+            'has_more': len(recent_files) == limit,
+            'next_cursor': next_cursor
         })
 
         response.headers['Access-Control-Allow-Origin'] = '*'
         return add_cache_headers(response, 'no-cache')
 
+    except InvalidCursorError:
+        response = jsonify({'success': False, 'error': 'Invalid cursor', 'files': []})
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        return add_cache_headers(response, 'no-cache'), 400
     except Exception as e:
         logger.error(f"Failed to get recent files: {e}")
         response = jsonify({
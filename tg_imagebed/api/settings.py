@@ -11,6 +11,7 @@ from flask import request, jsonify, make_response
 from . import admin_bp, images_bp
 from ..config import logger, PROXY_URL
 from ..utils import add_cache_headers, clear_domain_cache
+from ..storage.router import reload_storage_router
 from ..database import (
     get_public_settings, get_all_system_settings, update_system_settings,
     disable_guest_tokens, disable_all_tokens
@@ -420,6 +421,8 @@ def admin_system_settings():
                     else:
                         os.environ.pop('HTTP_PROXY', None)
                         os.environ.pop('HTTPS_PROXY', None)
+                    # 代理变化需重建依赖代理的存储后端
+                    reload_storage_router()
 
             # 获取更新后的有效配置
             updated_settings = get_all_system_settings()
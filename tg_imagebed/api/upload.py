@@ -9,8 +9,15 @@ from flask import request, jsonify
 from . import upload_bp
 from ..config import logger
 from ..utils import add_cache_headers, format_size, get_domain
-from ..services.file_service import process_upload
-from ..database import is_guest_upload_allowed, get_system_setting_int, get_upload_count_today
+from ..services.file_service import process_upload, process_upload_batch
+from ..services.upload_stream import UploadStream, UploadTooLargeError
+from ..services.upload_jobs import submit_upload_job, get_upload_job, UploadQueueFullError
+from ..database import (
+    is_guest_upload_allowed, get_system_setting_int, reserve_daily_uploads, release_daily_uploads,
+)
+
+# 批量上传单次最多文件数
+UPLOAD_BATCH_MAX_FILES = 50
 
 # 图片魔数签名
 IMAGE_SIGNATURES = {
@@ -55,6 +62,75 @@ def is_extension_allowed(filename: str) -> bool:
     return ext in get_allowed_extensions()
 
 
+def wants_async_upload() -> bool:
+    """请求是否要求异步上传（?async=1 或表单字段 async=1）"""
+    value = request.args.get('async') or request.form.get('async') or ''
+    return value.strip().lower() in ('1', 'true', 'yes')
+
+
+def submit_async_upload(upload: UploadStream, *, on_success=None, on_failure=None, **upload_kwargs):
+    """提交异步上传任务并返回 202 响应（upload 的所有权转交给任务，入队失败时调用 on_failure）"""
+    try:
+        job = submit_upload_job(upload, on_success=on_success, on_failure=on_failure, **upload_kwargs)
+    except UploadQueueFullError:
+        upload.close()
+        if on_failure:
+            on_failure()
+        logger.warning("上传队列已满，拒绝异步上传")
+        return add_cache_headers(jsonify({'success': False, 'error': '上传队列繁忙，请稍后重试'}), 'no-cache'), 503
+
+    base_url = get_domain(request)
+    logger.info(f"上传任务已提交: {job.filename} -> {job.job_id}")
+
+    return add_cache_headers(jsonify({
+        'success': True,
+        'data': {
+            'job_id': job.job_id,
+            'status': job.status,
+            'encrypted_id': job.encrypted_id,
+            'url': f"{base_url}/image/{job.encrypted_id}",
+            'status_url': f"{base_url}/api/upload/jobs/{job.job_id}",
+        }
+    }), 'no-cache'), 202
+
+
+class QuotaReservation:
+    """已预占的每日上传额度（未用完的部分通过 release 归还）"""
+
+    def __init__(self, day: str, granted: int, scope: dict):
+        self.day = day
+        self.granted = granted
+        self._scope = scope
+
+    def release(self, count: int | None = None) -> None:
+        """归还额度（默认全部）"""
+        release_daily_uploads(self.day, self.granted if count is None else count, **self._scope)
+
+
+def reserve_upload_quota(count: int = 1, **scope) -> QuotaReservation | None:
+    """
+    预占每日上传额度（写入存储后端之前调用）
+
+    Args:
+        count: 希望预占的数量
+        **scope: source 或 auth_token
+
+    Returns:
+        QuotaReservation（granted 为 0 表示额度已用完）；未设置每日限制时返回 None
+    """
+    daily_limit = get_system_setting_int('daily_upload_limit', 0, minimum=0, maximum=1000000)
+    if daily_limit <= 0:
+        return None
+    day, granted = reserve_daily_uploads(daily_limit, count, **scope)
+    return QuotaReservation(day, granted, scope)
+
+
+def daily_limit_response():
+    """每日上传额度用完的响应"""
+    daily_limit = get_system_setting_int('daily_upload_limit', 0, minimum=0, maximum=1000000)
+    return add_cache_headers(jsonify({'success': False, 'error': f'已达到每日上传限制({daily_limit}张)'}), 'no-cache'), 429
+
+
 @upload_bp.route('/api/upload', methods=['POST'])
 @upload_bp.route('/upload', methods=['POST'])
 def upload_file():
@@ -85,13 +161,6 @@ def upload_file():
     if content_type and not content_type.startswith('image/'):
         return add_cache_headers(jsonify({'success': False, 'error': '只允许上传图片文件'}), 'no-cache'), 400
 
-    # 检查每日上传限制（匿名上传按来源全局限制）
-    daily_limit = get_system_setting_int('daily_upload_limit', 0, minimum=0, maximum=1000000)
-    if daily_limit > 0:
-        uploaded_today = get_upload_count_today(source='web_upload')
-        if uploaded_today >= daily_limit:
-            return add_cache_headers(jsonify({'success': False, 'error': f'已达到每日上传限制({daily_limit}张)'}), 'no-cache'), 429
-
     # 检查文件大小（使用动态配置）
     file.seek(0, 2)
     file_size = file.tell()
@@ -103,25 +172,48 @@ def upload_file():
     if file_size > max_size_bytes:
         return add_cache_headers(jsonify({'success': False, 'error': f'文件大小超过 {max_size_mb}MB 限制'}), 'no-cache'), 400
 
+    async_mode = wants_async_upload()
+    upload = None
+    quota = None
     try:
-        file_content = file.read()
+        # 流式读取：统计大小、计算哈希、嗅探文件头（不整体读入内存）
+        try:
+            upload = UploadStream.from_stream(file.stream, max_size=max_size_bytes, detached=async_mode)
+        except UploadTooLargeError:
+            return add_cache_headers(jsonify({'success': False, 'error': f'文件大小超过 {max_size_mb}MB 限制'}), 'no-cache'), 400
 
         # 魔数校验：验证文件实际类型
-        detected_mime = validate_image_magic(file_content)
+        detected_mime = validate_image_magic(upload.head)
         if not detected_mime:
             return add_cache_headers(jsonify({'success': False, 'error': '无效的图片文件格式'}), 'no-cache'), 400
 
+        # 预占每日上传额度（匿名上传按来源全局限制），上传失败时归还
+        quota = reserve_upload_quota(source='web_upload')
+        if quota and not quota.granted:
+            quota = None
+            return daily_limit_response()
+
+        upload_kwargs = {
+            'filename': file.filename,
+            'content_type': file.content_type,
+            'username': 'web_user',
+            'source': 'web_upload',
+        }
+
+        # 异步上传：入队后立即返回任务 ID，上传流与额度交由任务处理
+        if async_mode:
+            pending, upload = upload, None
+            reservation, quota = quota, None
+            return submit_async_upload(
+                pending, on_failure=reservation.release if reservation else None, **upload_kwargs
+            )
+
         # 处理上传
-        result = process_upload(
-            file_content=file_content,
-            filename=file.filename,
-            content_type=file.content_type,
-            username='web_user',
-            source='web_upload'
-        )
+        result = process_upload(file_content=None, file_stream=upload, **upload_kwargs)
 
         if not result:
             return add_cache_headers(jsonify({'error': 'Failed to upload to Telegram'}), 'no-cache'), 500
+        quota = None
 
         # 生成 URL
         base_url = get_domain(request)
@@ -142,3 +234,156 @@ def upload_file():
     except Exception as e:
         logger.error(f"Upload error: {e}")
         return add_cache_headers(jsonify({'error': '上传失败，请稍后重试'}), 'no-cache'), 500
+    finally:
+        if quota:
+            quota.release()
+        if upload is not None:
+            upload.close()
+
+
+def get_batch_files():
+    """读取批量上传的文件列表（字段名 files，兼容 file）"""
+    files = request.files.getlist('files') or request.files.getlist('file')
+    return [f for f in files if f and f.filename]
+
+
+def _check_file_type(file) -> str | None:
+    """检查扩展名与 Content-Type，返回错误信息或 None"""
+    if not is_extension_allowed(file.filename):
+        ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in (file.filename or '') else ''
+        return f'不支持的文件格式: .{ext}'
+    content_type = (file.content_type or '').strip().lower()
+    if content_type and not content_type.startswith('image/'):
+        return '只允许上传图片文件'
+    return None
+
+
+def run_batch_upload(files, *, max_size_mb: int, quota: int | None = None, **upload_kwargs) -> list:
+    """
+    校验并批量上传多个文件
+
+    Args:
+        files: 上传的文件列表
+        max_size_mb: 单文件大小上限（MB）
+        quota: 本次最多接受的文件数（None 表示不限）
+        **upload_kwargs: 传给 process_upload_batch 的参数
+
+    Returns:
+        与 files 顺序一致的逐文件结果
+    """
+    max_size_bytes = max_size_mb * 1024 * 1024
+    results = []
+    accepted = []
+    try:
+        for file in files:
+            entry = {'filename': file.filename}
+            results.append(entry)
+
+            error = _check_file_type(file)
+            if not error and quota is not None and len(accepted) >= quota:
+                error = '超出剩余上传额度'
+            if not error:
+                try:
+                    upload = UploadStream.from_stream(file.stream, max_size=max_size_bytes)
+                except UploadTooLargeError:
+                    error = f'文件大小超过 {max_size_mb}MB 限制'
+                else:
+                    if validate_image_magic(upload.head):
+                        accepted.append((entry, upload, file.filename, file.content_type))
+                    else:
+                        upload.close()
+                        error = '无效的图片文件格式'
+            if error:
+                entry.update({'success': False, 'error': error})
+
+        outcomes = process_upload_batch(
+            [(upload, filename, content_type) for _entry, upload, filename, content_type in accepted],
+            **upload_kwargs,
+        ) if accepted else []
+    finally:
+        for _entry, upload, _filename, _content_type in accepted:
+            upload.close()
+
+    base_url = get_domain(request)
+    for (entry, _upload, _filename, _content_type), result in zip(accepted, outcomes):
+        if result:
+            entry.update({
+                'success': True,
+                'url': f"{base_url}/image/{result['encrypted_id']}",
+                'size': format_size(result['file_size']),
+            })
+        else:
+            entry.update({'success': False, 'error': '上传失败，请稍后重试'})
+    return results
+
+
+def batch_upload_response(results: list, **extra):
+    """构建批量上传响应"""
+    succeeded = sum(1 for r in results if r.get('success'))
+    data = {
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'upload_time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+    data.update(extra)
+    return add_cache_headers(jsonify({'success': succeeded > 0, 'data': data}), 'no-cache')
+
+
+@upload_bp.route('/api/upload/batch', methods=['POST'])
+def upload_batch():
+    """批量上传（匿名上传，单个请求包含多个文件）"""
+    if not is_guest_upload_allowed():
+        return add_cache_headers(jsonify({
+            'success': False,
+            'error': '匿名上传已关闭，请使用 Token 上传或联系管理员'
+        }), 'no-cache'), 403
+
+    files = get_batch_files()
+    if not files:
+        return add_cache_headers(jsonify({'success': False, 'error': 'No file provided'}), 'no-cache'), 400
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        return add_cache_headers(jsonify({'success': False, 'error': f'单次最多上传 {UPLOAD_BATCH_MAX_FILES} 个文件'}), 'no-cache'), 400
+
+    # 每日上传限制（匿名上传按来源全局限制）：预占额度，只接受额度内的文件
+    quota = reserve_upload_quota(len(files), source='web_upload')
+    if quota and not quota.granted:
+        return daily_limit_response()
+
+    max_size_mb = get_system_setting_int('max_file_size_mb', 20, minimum=1, maximum=1024)
+
+    try:
+        results = run_batch_upload(
+            files,
+            max_size_mb=max_size_mb,
+            quota=quota.granted if quota else None,
+            username='web_user',
+            source='web_upload',
+        )
+    except Exception as e:
+        logger.error(f"Batch upload error: {e}")
+        if quota:
+            quota.release()
+        return add_cache_headers(jsonify({'success': False, 'error': '上传失败，请稍后重试'}), 'no-cache'), 500
+
+    succeeded = sum(1 for r in results if r.get('success'))
+    if quota:
+        quota.release(quota.granted - succeeded)
+    logger.info(f"Web批量上传完成: {succeeded}/{len(results)}")
+    return batch_upload_response(results)
+
+
+@upload_bp.route('/api/upload/jobs/<job_id>', methods=['GET'])
+def get_upload_job_status(job_id):
+    """查询异步上传任务状态"""
+    job = get_upload_job(job_id)
+    if not job:
+        return add_cache_headers(jsonify({'success': False, 'error': '任务不存在或已过期'}), 'no-cache'), 404
+
+    data = job.to_dict()
+    data['url'] = f"{get_domain(request)}/image/{job.encrypted_id}"
+    if 'file_size' in data:
+        data['size'] = format_size(data['file_size'])
+
+    return add_cache_headers(jsonify({'success': True, 'data': data}), 'no-cache')
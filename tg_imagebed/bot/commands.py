@@ -61,6 +61,16 @@ def build_upload_success_keyboard(
     ])
 
 
+def format_upload_success_text(permanent_url: str, file_size: int) -> str:
+    """上传成功的回复文本"""
+    return (
+        f"✅ *上传成功！*\n\n"
+        f"🔗 *永久直链:*\n`{permanent_url}`\n\n"
+        f"📊 *文件大小:* {file_size} bytes\n"
+        f"💡 链接永久有效"
+    )
+
+
 # ===================== 命令处理器 =====================
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
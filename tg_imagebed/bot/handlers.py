@@ -102,7 +102,7 @@ async def handle_photo(update: Update, context):
 
     # 检测批量上传（media_group_id）
     media_group_id = getattr(message, 'media_group_id', None)
-    use_batch = bool(is_group and reply_enabled and media_group_id)
+    use_batch = bool(reply_enabled and media_group_id)
 
     # 发送处理中消息（批量模式下延迟到首张图片时发送）
     status_msg = None
@@ -165,6 +165,7 @@ async def handle_photo(update: Update, context):
                 batch = _MediaBatch(
                     chat_id=chat.id,
                     media_group_id=str(media_group_id),
+                    private=not is_group,
                     message_thread_id=getattr(message, 'message_thread_id', None),
                     delete_delay=delete_delay,
                 )
@@ -239,12 +240,8 @@ async def handle_photo(update: Update, context):
             _inc_bot_stats(success=1)
             base_url = get_domain(None)
             permanent_url = f"{base_url}/image/{result['encrypted_id']}"
-            text = (
-                f"✅ *上传成功！*\n\n"
-                f"🔗 *永久直链:*\n`{permanent_url}`\n\n"
-                f"📊 *文件大小:* {result['file_size']} bytes\n"
-                f"💡 链接永久有效"
-            )
+            from .commands import format_upload_success_text
+            text = format_upload_success_text(permanent_url, result['file_size'])
 
             # 私聊场景添加 inline 按钮（打开链接 + 删除）
             reply_markup = None
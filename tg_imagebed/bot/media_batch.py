@@ -3,7 +3,9 @@
 """
 批量图片处理模块（media_group）
 
-处理群组/频道中的批量图片上传，使用 debounce 机制合并汇总消息。
+处理相册（media_group）批量图片上传，使用 debounce 机制合并汇总消息：
+- 群组/频道：记录既有文件，不做二次上传
+- 私聊：整组转存到存储后端（支持时使用批量接口），每张图片另外回复带 inline 按钮的成功消息
 """
 import time
 from dataclasses import dataclass, field
@@ -21,9 +23,10 @@ _DOWNLOAD_TIMEOUT = 60
 
 @dataclass
 class _MediaBatch:
-    """群组/频道批量图片上传的累加器"""
+    """相册（media_group）批量图片上传的累加器"""
     chat_id: int
     media_group_id: str
+    private: bool = False           # 私聊相册：转存到存储后端（群组相册只记录既有文件）
     items: List[Dict[str, Any]] = field(default_factory=list)
     status_message_id: Optional[int] = None
     first_message_id: Optional[int] = None
@@ -88,6 +91,79 @@ def _format_batch_summary(
     return "\n".join(lines)
 
 
+async def _upload_private_items(items: List[Dict[str, Any]], bot: Any) -> List[Optional[Dict[str, Any]]]:
+    """
+    私聊相册：下载全部图片后一次批量转存
+
+    存储后端支持批量接口时（Telegram sendMediaGroup）整组只需一次发送。
+    转存（线程池 + 可能等待限流的 HTTP 调用）在工作线程中执行，不阻塞事件循环上的其他会话。
+    """
+    import io
+    import asyncio
+    from ..services.file_service import process_upload_batch
+    from ..services.upload_stream import UploadStream
+
+    streams: List[Optional[UploadStream]] = []
+    for item in items:
+        try:
+            file_info = await asyncio.wait_for(bot.get_file(item["file_id"]), timeout=_DOWNLOAD_TIMEOUT)
+            file_bytes = await asyncio.wait_for(file_info.download_as_bytearray(), timeout=_DOWNLOAD_TIMEOUT)
+            streams.append(UploadStream.from_stream(io.BytesIO(bytes(file_bytes))))
+        except Exception as e:
+            streams.append(None)
+            logger.error(f"下载相册图片失败: {e}")
+
+    files = [
+        (stream, item.get("filename", ""), item.get("content_type", "image/jpeg"))
+        for item, stream in zip(items, streams) if stream is not None
+    ]
+    try:
+        uploaded = iter(await asyncio.to_thread(
+            process_upload_batch,
+            files,
+            username=items[0].get("username", "") if items else "",
+            source="telegram_bot",
+        ))
+    except Exception as e:
+        logger.error(f"相册批量上传失败: {e}")
+        return [None] * len(items)
+    finally:
+        for stream, _filename, _content_type in files:
+            stream.close()
+
+    return [next(uploaded) if stream is not None else None for stream in streams]
+
+
+async def _reply_private_results(
+    batch: _MediaBatch,
+    items: List[Dict[str, Any]],
+    results: List[Optional[Dict[str, Any]]],
+    bot: Any,
+    base_url: str,
+) -> None:
+    """私聊相册：与单张上传一致，逐张回复成功消息与 inline 按钮（打开链接 + 删除）"""
+    from ..database import get_system_setting
+    from .commands import build_upload_success_keyboard, format_upload_success_text
+
+    if str(get_system_setting('bot_inline_buttons_enabled') or '1') != '1':
+        return
+
+    for item, result in zip(items, results):
+        if not result:
+            continue
+        permanent_url = f"{base_url}/image/{result['encrypted_id']}"
+        try:
+            await bot.send_message(
+                chat_id=batch.chat_id,
+                text=format_upload_success_text(permanent_url, result['file_size']),
+                parse_mode="Markdown",
+                reply_markup=build_upload_success_keyboard(permanent_url, result['encrypted_id']),
+                reply_to_message_id=item.get("message_id"),
+            )
+        except Exception as e:
+            logger.warning(f"发送相册图片上传结果失败: {e}")
+
+
 async def _flush_media_group(
     batch_key: Tuple[int, str],
     bot: Any,
@@ -134,39 +210,46 @@ async def _flush_media_group(
     failure_count = 0
 
     # 按消息ID排序处理
-    for item in sorted(batch.items, key=lambda x: x.get("message_id", 0)):
-        try:
-            file_id = item.get("file_id")
-            if not file_id:
-                failure_count += 1
-                continue
-
-            file_info = await asyncio.wait_for(bot.get_file(file_id), timeout=_DOWNLOAD_TIMEOUT)
-            file_bytes = await asyncio.wait_for(file_info.download_as_bytearray(), timeout=_DOWNLOAD_TIMEOUT)
-
-            result = record_existing_telegram_file(
-                file_id=file_id,
-                file_unique_id=item.get("file_unique_id"),
-                file_path=getattr(file_info, "file_path", "") or "",
-                file_content=bytes(file_bytes),
-                filename=item.get("filename", ""),
-                content_type=item.get("content_type", "image/jpeg"),
-                username=item.get("username", ""),
-                source="telegram_group",
-                is_group_upload=True,
-                group_message_id=item.get("message_id"),
-                group_chat_id=batch.chat_id,
-            )
+    items = sorted(batch.items, key=lambda x: x.get("message_id", 0))
+    if batch.private:
+        results = await _upload_private_items(items, bot)
+    else:
+        results = []
+        for item in items:
+            try:
+                file_id = item.get("file_id")
+                if not file_id:
+                    results.append(None)
+                    continue
+
+                file_info = await asyncio.wait_for(bot.get_file(file_id), timeout=_DOWNLOAD_TIMEOUT)
+                file_bytes = await asyncio.wait_for(file_info.download_as_bytearray(), timeout=_DOWNLOAD_TIMEOUT)
+
+                results.append(record_existing_telegram_file(
+                    file_id=file_id,
+                    file_unique_id=item.get("file_unique_id"),
+                    file_path=getattr(file_info, "file_path", "") or "",
+                    file_content=bytes(file_bytes),
+                    filename=item.get("filename", ""),
+                    content_type=item.get("content_type", "image/jpeg"),
+                    username=item.get("username", ""),
+                    source="telegram_group",
+                    is_group_upload=True,
+                    group_message_id=item.get("message_id"),
+                    group_chat_id=batch.chat_id,
+                ))
+            except Exception as e:
+                results.append(None)
+                logger.error(f"批量处理图片失败: {e}")
 
-            if not result:
-                failure_count += 1
-                continue
+    for result in results:
+        if not result:
+            continue
+        urls.append(f"{base_url}/image/{result['encrypted_id']}")
+        total_size_bytes += int(result.get("file_size", 0) or 0)
 
-            urls.append(f"{base_url}/image/{result['encrypted_id']}")
-            total_size_bytes += int(result.get("file_size", 0) or 0)
-        except Exception as e:
-            failure_count += 1
-            logger.error(f"批量处理图片失败: {e}")
+    if batch.private:
+        await _reply_private_results(batch, items, results, bot, base_url)
 
     success_count = len(urls)
     failure_count = total_count - success_count
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+机器人限流适配器
+
+让 python-telegram-bot 发出的请求与存储后端、管理端等路径共享同一个限流器：
+同一 Bot / 聊天的配额与 429 冷却在所有路径之间可见。
+"""
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from ..config import logger
+from ..telegram_api import (
+    CHAT_METHODS, UNLIMITED_METHODS,
+    get_telegram_rate_limiter, record_telegram_api_call, request_cost,
+)
+
+
+def _retry_after_seconds(value: Any) -> float:
+    """RetryAfter.retry_after 可能是秒数或 timedelta"""
+    if hasattr(value, 'total_seconds'):
+        return float(value.total_seconds())
+    return float(value or 0)
+
+
+class SharedRateLimiter(BaseRateLimiter[int]):
+    """python-telegram-bot 限流器：使用全局令牌桶，429 时记录冷却并重试"""
+
+    def __init__(self, bot_token: str, max_retries: int = 1):
+        self._bot_token = bot_token
+        self._max_retries = max_retries
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        if endpoint in UNLIMITED_METHODS:
+            return await callback(*args, **kwargs)
+
+        limiter = get_telegram_rate_limiter()
+        chat_id = data.get('chat_id') if endpoint in CHAT_METHODS else None
+        cost = request_cost(endpoint, data)
+        attempt = 0
+        while True:
+            waited = limiter.reserve(self._bot_token, chat_id, cost)
+            if waited > 0:
+                await asyncio.sleep(waited)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after = _retry_after_seconds(e.retry_after)
+                limiter.block(self._bot_token, chat_id, retry_after)
+                record_telegram_api_call(endpoint, status=429, waited=waited)
+                logger.warning(f"Telegram 机器人请求被限流: method={endpoint} chat={chat_id} retry_after={retry_after}s")
+                if attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                continue
+            except Exception:
+                record_telegram_api_call(endpoint, status=None, waited=waited)
+                raise
+            record_telegram_api_call(endpoint, status=200, waited=waited)
+            return result
@@ -15,6 +15,7 @@ from ..bot_control import (
 )
 from .state import _set_bot_status, _get_bot_status, _utc_iso, set_bot_instance, set_bot_loop
 from .handlers import start, handle_photo, handle_verify_text
+from .rate_limiter import SharedRateLimiter
 from .commands import help_command, myuploads_command, delete_command, id_command, callback_handler, login_command, mytokens_command
 
 
@@ -95,7 +96,12 @@ def run_telegram_bot():
 
             try:
                 # 构建 Application
-                builder = Application.builder().token(current_token).job_queue(None)
+                builder = (
+                    Application.builder()
+                    .token(current_token)
+                    .job_queue(None)
+                    .rate_limiter(SharedRateLimiter(current_token))
+                )
                 proxy_url = get_proxy_url()
                 if proxy_url:
                     logger.info(f"Telegram Bot 使用代理: {proxy_url}")
@@ -8,22 +8,40 @@
 """
 
 # 连接管理 + 初始化
-from .connection import get_connection, db_retry, init_database
+from .connection import get_connection, get_connection_pool_stats, db_retry, init_database
 
 # 文件 CRUD + 统计
 from .files import (
-    get_file_info, save_file_info, update_file_path_in_db,
+    get_file_info, save_file_info, save_file_infos, update_file_path_in_db,
     update_cdn_cache_status, update_access_count, delete_files_by_ids,
+    find_file_by_hash, find_orphaned_storage_objects, release_storage_objects,
+    flush_access_counts, stop_access_count_flusher,
     get_all_files_count, get_total_size, get_stats,
     get_recent_uploads, get_uncached_files, get_cdn_dashboard_stats,
     get_user_uploads,
 )
 
+# 游标分页 + 总数缓存
+from .pagination import (
+    InvalidCursorError, encode_cursor, decode_cursor, keyset_condition,
+    next_page_cursor, cached_count, invalidate_count_cache,
+)
+
+# 全文检索
+from .search import ensure_search_index, rebuild_search_index, is_search_index_available, build_match_query
+
+# 统计计数器
+from .stats import (
+    get_stats_counters, get_daily_upload_stats, reconcile_stats_counters,
+    start_stats_reconciler, stop_stats_reconciler,
+)
+
 # Token 管理（用户 + 管理员）
 from .tokens import (
     generate_auth_token, create_auth_token, verify_auth_token,
     verify_auth_token_access, update_token_description,
-    update_token_usage, get_token_info, get_token_uploads,
+    update_token_usage, reserve_token_uploads, release_token_uploads,
+    get_token_info, get_token_uploads,
     admin_list_tokens, admin_create_token,
     admin_update_token_status, admin_update_token, admin_delete_token,
     admin_get_token_detail, admin_get_token_uploads, admin_get_token_galleries,
@@ -37,6 +55,8 @@ from .settings import (
     get_system_setting, get_all_system_settings,
     update_system_setting, update_system_settings,
     get_system_setting_int, get_upload_count_today,
+    reserve_daily_uploads, release_daily_uploads,
+    get_settings_snapshot, invalidate_settings_snapshot, SettingsSnapshot,
     get_public_settings,
     is_guest_upload_allowed, is_token_upload_allowed, is_token_generation_allowed,
     disable_guest_tokens, disable_all_tokens,
@@ -76,20 +96,31 @@ from .tg_auth import (
 
 __all__ = [
     # 连接管理
-    'get_connection', 'db_retry',
+    'get_connection', 'get_connection_pool_stats', 'db_retry',
     # 初始化
     'init_database',
     # 文件操作
-    'get_file_info', 'save_file_info', 'update_file_path_in_db',
+    'get_file_info', 'save_file_info', 'save_file_infos', 'update_file_path_in_db',
     'update_cdn_cache_status', 'update_access_count', 'delete_files_by_ids',
+    'find_file_by_hash', 'find_orphaned_storage_objects', 'release_storage_objects',
+    'flush_access_counts', 'stop_access_count_flusher',
     # 统计（admin_module.py 兼容）
     'get_all_files_count', 'get_total_size', 'get_stats',
     'get_recent_uploads', 'get_uncached_files', 'get_cdn_dashboard_stats',
     'get_user_uploads',
+    # 游标分页
+    'InvalidCursorError', 'encode_cursor', 'decode_cursor', 'keyset_condition',
+    'next_page_cursor', 'cached_count', 'invalidate_count_cache',
+    # 全文检索
+    'ensure_search_index', 'rebuild_search_index', 'is_search_index_available', 'build_match_query',
+    # 统计计数器
+    'get_stats_counters', 'get_daily_upload_stats', 'reconcile_stats_counters',
+    'start_stats_reconciler', 'stop_stats_reconciler',
     # Token
     'generate_auth_token', 'create_auth_token', 'verify_auth_token',
     'verify_auth_token_access', 'update_token_description',
-    'update_token_usage', 'get_token_info', 'get_token_uploads',
+    'update_token_usage', 'reserve_token_uploads', 'release_token_uploads',
+    'get_token_info', 'get_token_uploads',
     # Token 管理（管理员后台）
     'admin_list_tokens', 'admin_create_token',
     'admin_update_token_status', 'admin_update_token', 'admin_delete_token',
@@ -100,7 +131,9 @@ __all__ = [
     # 系统设置
     'init_system_settings', 'get_system_setting', 'get_all_system_settings',
     'update_system_setting', 'update_system_settings', 'get_public_settings',
+    'get_settings_snapshot', 'invalidate_settings_snapshot', 'SettingsSnapshot',
     'get_system_setting_int', 'get_upload_count_today',
+    'reserve_daily_uploads', 'release_daily_uploads',
     'is_guest_upload_allowed', 'is_token_upload_allowed', 'is_token_generation_allowed',
     'disable_guest_tokens', 'disable_all_tokens',
     'DEFAULT_SYSTEM_SETTINGS', 'SENSITIVE_SETTINGS',
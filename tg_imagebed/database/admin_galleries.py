@@ -6,6 +6,8 @@ from typing import Optional, Dict, Any, List
 
 from ..config import logger
 from .connection import get_connection
+from .galleries import _query_gallery_images
+from .pagination import invalidate_count_cache, keyset_condition
 from .tokens import _parse_datetime
 
 
@@ -201,7 +203,8 @@ def admin_add_images_to_gallery(gallery_id: int, encrypted_ids: List[str]) -> Di
             result['added'] = inserted
             result['skipped'] = max(0, len(to_insert) - inserted)
             cur.execute('UPDATE galleries SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (gallery_id,))
-            return result
+        invalidate_count_cache()
+        return result
     except Exception as e:
         logger.error(f"Admin 添加图片到画集失败: {e}")
         return result
@@ -228,38 +231,33 @@ def admin_remove_images_from_gallery(gallery_id: int, encrypted_ids: List[str])
                 logger.info(f"封面图片被移除，清除封面设置: gallery_id={gallery_id}")
             else:
                 cur.execute('UPDATE galleries SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (gallery_id,))
-            return removed
+        invalidate_count_cache()
+        return removed
     except Exception as e:
         logger.error(f"Admin 从画集移除图片失败: {e}")
         return 0
 
-def admin_get_gallery_images(gallery_id: int, page: int = 1, limit: int = 50) -> Dict[str, Any]:
-    """管理员获取画集图片"""
+def admin_get_gallery_images(gallery_id: int, page: int = 1, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    管理员获取画集图片
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
     page = max(1, int(page or 1))
     limit = max(1, min(200, int(limit or 50)))
+    if cursor:
+        keyset_condition('gi.added_at', 'gi.encrypted_id', cursor)  # 提前校验游标
     try:
         with get_connection() as conn:
             cur = conn.cursor()
             cur.execute('SELECT 1 FROM galleries WHERE id = ?', (gallery_id,))
             if not cur.fetchone():
-                return {'items': [], 'total': 0, 'page': page, 'limit': limit}
-            offset = (page - 1) * limit
-            cur.execute('SELECT COUNT(*) FROM gallery_images WHERE gallery_id = ?', (gallery_id,))
-            total = cur.fetchone()[0]
-            cur.execute('''
-                SELECT fs.encrypted_id, fs.original_filename, fs.file_size, fs.created_at,
-                       fs.cdn_cached, fs.cdn_url, fs.mime_type, gi.added_at
-                FROM gallery_images gi
-                JOIN file_storage fs ON gi.encrypted_id = fs.encrypted_id
-                WHERE gi.gallery_id = ?
-                ORDER BY gi.added_at DESC
-                LIMIT ? OFFSET ?
-            ''', (gallery_id, limit, offset))
-            items = [dict(r) for r in cur.fetchall()]
-            return {'items': items, 'total': total, 'page': page, 'limit': limit}
+                return {'items': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None}
+            return _query_gallery_images(cur, gallery_id, page, limit, cursor)
     except Exception as e:
         logger.error(f"Admin 获取画集图片失败: {e}")
-        return {'items': [], 'total': 0, 'page': page, 'limit': limit}
+        return {'items': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None}
 
 
 def admin_update_gallery_share(gallery_id: int, enabled: bool, expires_at: Optional[str] = None) -> Optional[Dict[str, Any]]:
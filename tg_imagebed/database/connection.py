@@ -5,30 +5,140 @@ import sqlite3
 import time
 import random
 import json
+import weakref
+import threading
 from datetime import datetime
 from contextlib import contextmanager
 from functools import wraps
+from pathlib import Path
 
 from ..config import DATABASE_PATH, logger
+from .search import ensure_search_index
 
 
 # ===================== 数据库连接管理 =====================
-@contextmanager
-def get_connection():
-    """获取数据库连接的上下文管理器"""
-    conn = sqlite3.connect(DATABASE_PATH)
+# 每个线程复用自己的连接（读写 / 只读各一个），PRAGMA 只在建连时设置一次。
+# 同一线程内嵌套调用 get_connection() 时复用外层连接，内层用 SAVEPOINT 隔离，
+# 只有最外层负责 commit / rollback。外层尚未开启事务时先显式 BEGIN，
+# 否则内层 SAVEPOINT 会自行开启事务、RELEASE 时直接提交，外层随后失败也无法回滚。
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KIB = 8192             # 每连接页缓存（KiB）
+DB_MMAP_SIZE = 256 * 1024 * 1024     # 内存映射读取上限（字节）
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_stats = {
+    'created': 0,
+    'reused': 0,
+    'discarded': 0,
+    'readonly_created': 0,
+}
+
+
+class _PooledConnection(sqlite3.Connection):
+    """池化连接（子类化以支持弱引用计数）"""
+
+
+# 存活连接（线程结束后随线程局部变量一起释放）
+_open_connections: "weakref.WeakSet[_PooledConnection]" = weakref.WeakSet()
+
+
+def _open_connection(readonly: bool) -> sqlite3.Connection:
+    """新建连接并设置 PRAGMA"""
+    if readonly:
+        conn = sqlite3.connect(
+            Path(DATABASE_PATH).resolve().as_uri() + '?mode=ro',
+            uri=True, factory=_PooledConnection,
+        )
+    else:
+        conn = sqlite3.connect(DATABASE_PATH, factory=_PooledConnection)
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
     conn.execute('PRAGMA foreign_keys = ON')
-    conn.execute('PRAGMA busy_timeout = 5000')
-    conn.execute('PRAGMA journal_mode=WAL')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    else:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+
+    with _pool_lock:
+        _pool_stats['readonly_created' if readonly else 'created'] += 1
+        _open_connections.add(conn)
+    return conn
+
+
+def _discard_connection(slot: str) -> None:
+    """关闭并丢弃当前线程的连接（连接异常时调用）"""
+    conn = getattr(_local, slot, None)
+    setattr(_local, slot, None)
+    setattr(_local, slot + '_depth', 0)
+    if conn is None:
+        return
+    try:
+        conn.close()
+    except Exception:
+        pass
+    with _pool_lock:
+        _pool_stats['discarded'] += 1
+        _open_connections.discard(conn)
+
+
+@contextmanager
+def get_connection(readonly: bool = False):
+    """获取数据库连接的上下文管理器
+
+    Args:
+        readonly: 使用只读连接（仅查询路径）
+    """
+    slot = 'ro_conn' if readonly else 'conn'
+    depth_attr = slot + '_depth'
+    conn = getattr(_local, slot, None)
+    depth = getattr(_local, depth_attr, 0)
+
+    if conn is None:
+        conn = _open_connection(readonly)
+        setattr(_local, slot, conn)
+        depth = 0
+    elif depth == 0:
+        with _pool_lock:
+            _pool_stats['reused'] += 1
+
+    savepoint = f'sp_{depth}' if depth > 0 else None
+    setattr(_local, depth_attr, depth + 1)
     try:
+        if savepoint:
+            if not conn.in_transaction:
+                conn.execute('BEGIN')
+            conn.execute(f'SAVEPOINT {savepoint}')
         yield conn
-        conn.commit()
+        if savepoint:
+            conn.execute(f'RELEASE {savepoint}')
+        else:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        try:
+            if savepoint:
+                conn.execute(f'ROLLBACK TO {savepoint}')
+                conn.execute(f'RELEASE {savepoint}')
+            else:
+                conn.rollback()
+        except sqlite3.Error:
+            # 连接已不可用，丢弃后由下次调用重建
+            _discard_connection(slot)
         raise
     finally:
-        conn.close()
+        if getattr(_local, slot, None) is conn:
+            setattr(_local, depth_attr, depth)
+
+
+def get_connection_pool_stats() -> dict:
+    """获取连接池统计信息（用于监控）"""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats['open'] = len(_open_connections)
+    return stats
 
 
 def db_retry(max_attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0):
@@ -56,6 +166,50 @@ def db_retry(max_attempts: int = 3, base_delay: float = 0.1, max_delay: float =
 
 
 # ===================== 数据库初始化 =====================
+_LEGACY_ACCESS_COLUMNS = ('access_count', 'cdn_hit_count', 'direct_hit_count', 'last_accessed')
+
+
+def _migrate_access_stats(cursor, columns: list) -> bool:
+    """
+    将 file_storage 中的访问计数列迁移到 file_access_stats 并删除原列
+
+    可重复执行：已迁移的记录不会重复累加；SQLite 不支持 DROP COLUMN 时保留原列（不再写入）。
+
+    Returns:
+        是否执行了迁移
+    """
+    legacy = [col for col in _LEGACY_ACCESS_COLUMNS if col in columns]
+    if not legacy:
+        return False
+
+    def _col(name: str, default: str) -> str:
+        return f'COALESCE({name}, {default})' if name in legacy else default
+
+    cursor.execute(f'''
+        INSERT INTO file_access_stats (encrypted_id, access_count, cdn_hit_count, direct_hit_count, last_accessed)
+        SELECT encrypted_id, {_col('access_count', '0')}, {_col('cdn_hit_count', '0')},
+               {_col('direct_hit_count', '0')}, {_col('last_accessed', 'NULL')}
+        FROM file_storage
+        WHERE {_col('access_count', '0')} > 0 OR {_col('last_accessed', 'NULL')} IS NOT NULL
+        ON CONFLICT(encrypted_id) DO NOTHING
+    ''')
+    logger.info(f"已迁移 {cursor.rowcount} 条访问统计到 file_access_stats")
+
+    # 引用旧列的触发器需先删除（由 ensure_stats_counters 按新表重建）
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'file_storage'")
+    for name, sql in cursor.fetchall():
+        if any(col in (sql or '') for col in legacy):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+    try:
+        for col in legacy:
+            cursor.execute(f'ALTER TABLE file_storage DROP COLUMN {col}')
+        logger.info("已从 file_storage 删除访问计数列")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"无法删除 file_storage 访问计数列（需要 SQLite 3.35+），保留旧列: {e}")
+    return True
+
+
 def init_database(quiet: bool = False) -> None:
     """初始化数据库 - 创建所有必要的表和索引"""
     try:
@@ -81,10 +235,6 @@ def init_database(quiet: bool = False) -> None:
                     cdn_url TEXT,
                     cdn_cached BOOLEAN DEFAULT 0,
                     cdn_cache_time TIMESTAMP,
-                    access_count INTEGER DEFAULT 0,
-                    cdn_hit_count INTEGER DEFAULT 0,
-                    direct_hit_count INTEGER DEFAULT 0,
-                    last_accessed TIMESTAMP,
                     last_file_path_update TIMESTAMP,
                     is_group_upload BOOLEAN DEFAULT 0,
                     group_message_id INTEGER,
@@ -92,7 +242,8 @@ def init_database(quiet: bool = False) -> None:
                     auth_token TEXT,
                     storage_backend TEXT,
                     storage_key TEXT,
-                    storage_meta TEXT
+                    storage_meta TEXT,
+                    upload_day TEXT
                 )
             ''')
 
@@ -163,14 +314,11 @@ def init_database(quiet: bool = False) -> None:
                 ('cdn_url', 'TEXT'),
                 ('cdn_cached', 'BOOLEAN DEFAULT 0'),
                 ('cdn_cache_time', 'TIMESTAMP'),
-                ('access_count', 'INTEGER DEFAULT 0'),
-                ('cdn_hit_count', 'INTEGER DEFAULT 0'),
-                ('direct_hit_count', 'INTEGER DEFAULT 0'),
-                ('last_accessed', 'TIMESTAMP'),
                 ('auth_token', 'TEXT'),
                 ('storage_backend', 'TEXT'),
                 ('storage_key', 'TEXT'),
                 ('storage_meta', 'TEXT'),
+                ('upload_day', 'TEXT'),
             ]
 
             # 记录是否新增了 storage 相关列
@@ -181,6 +329,10 @@ def init_database(quiet: bool = False) -> None:
                     cursor.execute(f'ALTER TABLE file_storage ADD COLUMN {col_name} {col_type}')
                     if col_name in ('storage_backend', 'storage_key', 'storage_meta'):
                         storage_columns_added = True
+                    if col_name == 'upload_day':
+                        # 回填上传日期（与原 date(created_at) 判断一致），仅在新增列时执行一次
+                        cursor.execute('UPDATE file_storage SET upload_day = date(created_at) WHERE upload_day IS NULL')
+                        logger.info("已回填历史记录的 upload_day 字段")
 
             # 兼容历史数据：只在新增 storage 列时回填，避免每次启动全表扫描
             if storage_columns_added:
@@ -200,6 +352,33 @@ def init_database(quiet: bool = False) -> None:
                 except Exception as e:
                     logger.debug(f"回填 storage 字段失败（可忽略）: {e}")
 
+            # 访问统计表：每次图片访问都会更新的计数与元数据分离，避免反复改写宽行
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS file_access_stats (
+                    encrypted_id TEXT PRIMARY KEY,
+                    access_count INTEGER NOT NULL DEFAULT 0,
+                    cdn_hit_count INTEGER NOT NULL DEFAULT 0,
+                    direct_hit_count INTEGER NOT NULL DEFAULT 0,
+                    last_accessed TIMESTAMP
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS file_access_stats_cleanup AFTER DELETE ON file_storage BEGIN
+                    DELETE FROM file_access_stats WHERE encrypted_id = old.encrypted_id;
+                END
+            ''')
+            access_stats_migrated = _migrate_access_stats(cursor, columns)
+
+            # 每日上传额度计数（按 source / token 分别计数，上传前以条件 UPDATE 预占）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS upload_quota_daily (
+                    day TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, scope)
+                ) WITHOUT ROWID
+            ''')
+
             # ===================== TG 认证相关表 =====================
             # TG 用户表
             cursor.execute('''
@@ -459,6 +638,13 @@ def init_database(quiet: bool = False) -> None:
             # 创建索引
             indexes = [
                 ('idx_file_storage_created', 'file_storage(created_at)'),
+                # 游标分页：(created_at, encrypted_id) 复合索引
+                ('idx_file_storage_created_id', 'file_storage(created_at, encrypted_id)'),
+                ('idx_file_storage_user_created', 'file_storage(username, created_at, encrypted_id)'),
+                ('idx_file_storage_token_created', 'file_storage(auth_token, created_at, encrypted_id)'),
+                # 每日上传额度：按 (来源 | Token, 日期) 计数
+                ('idx_file_storage_source_day', 'file_storage(source, upload_day)'),
+                ('idx_file_storage_token_day', 'file_storage(auth_token, upload_day)'),
                 ('idx_original_filename', 'file_storage(original_filename)'),
                 ('idx_file_size', 'file_storage(file_size)'),
                 ('idx_cdn_cached', 'file_storage(cdn_cached)'),
@@ -466,6 +652,7 @@ def init_database(quiet: bool = False) -> None:
                 ('idx_auth_token', 'file_storage(auth_token)'),
                 ('idx_storage_backend', 'file_storage(storage_backend)'),
                 ('idx_storage_key', 'file_storage(storage_backend, storage_key)'),
+                ('idx_file_hash', 'file_storage(file_hash)'),
                 ('idx_auth_tokens_expires', 'auth_tokens(expires_at)'),
                 ('idx_auth_tokens_active', 'auth_tokens(is_active)'),
                 ('idx_galleries_owner', 'galleries(owner_token)'),
@@ -474,6 +661,7 @@ def init_database(quiet: bool = False) -> None:
                 ('idx_galleries_access_mode', 'galleries(access_mode)'),
                 ('idx_galleries_hide_share_all', 'galleries(hide_from_share_all)'),
                 ('idx_gallery_images_gallery', 'gallery_images(gallery_id, added_at DESC)'),
+                ('idx_gallery_images_keyset', 'gallery_images(gallery_id, added_at, encrypted_id)'),
                 ('idx_share_all_token', 'share_all_links(share_token)'),
                 ('idx_gallery_token_access_gallery', 'gallery_token_access(gallery_id)'),
                 ('idx_gallery_token_access_token', 'gallery_token_access(token)'),
@@ -489,6 +677,13 @@ def init_database(quiet: bool = False) -> None:
             for idx_name, idx_def in indexes:
                 cursor.execute(f'CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_def}')
 
+            # 文件名/用户名全文检索索引（FTS5 trigram）
+            ensure_search_index(cursor)
+
+            # 统计计数器（触发器增量维护）
+            from .stats import ensure_stats_counters
+            ensure_stats_counters(cursor, recompute=access_stats_migrated)
+
         if not quiet:
             logger.info(f"数据库初始化完成: {DATABASE_PATH}")
 
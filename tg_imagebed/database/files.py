@@ -1,90 +1,189 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """文件 CRUD + 统计查询"""
-import sqlite3
 import json
+import time
+import atexit
+import threading
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from ..config import logger
 from .connection import get_connection, db_retry
+from .pagination import cached_count, invalidate_count_cache, keyset_condition
+from .stats import get_stats_counters, get_daily_upload_stats
 
 
 # ===================== 文件存储操作 =====================
 def get_file_info(encrypted_id: str) -> Optional[Dict[str, Any]]:
     """获取文件信息"""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM file_storage WHERE encrypted_id = ?', (encrypted_id,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
 
-@db_retry(max_attempts=3, base_delay=0.1, max_delay=2.0)
-def save_file_info(encrypted_id: str, file_info: Dict[str, Any]) -> None:
-    """保存文件信息到数据库（带重试）"""
-    from .settings import get_system_setting
+def find_file_by_hash(file_hash: str, storage_backend: str, file_size: int) -> Optional[Dict[str, Any]]:
+    """
+    按内容哈希查找可复用的存储对象（上传去重）
 
-    with get_connection() as conn:
+    群组监听记录（group_chat_id 非空）引用的是用户群消息中的文件，不作为复用来源。
+    """
+    if not file_hash:
+        return None
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
+        cursor.execute('''
+            SELECT encrypted_id, file_id, file_path, file_size,
+                   storage_backend, storage_key, storage_meta
+            FROM file_storage
+            WHERE file_hash = ? AND storage_backend = ? AND file_size = ?
+              AND group_chat_id IS NULL
+              AND storage_key IS NOT NULL AND storage_key != ''
+            ORDER BY upload_time DESC
+            LIMIT 1
+        ''', (file_hash, storage_backend, file_size))
+        row = cursor.fetchone()
+        return dict(row) if row else None
 
-        # 生成 ETag
-        etag = f'W/"{encrypted_id}-{file_info.get("file_size", 0)}"'
-
-        # 生成 CDN URL（仅在 CDN Mode：域名已配置 + cdn_enabled=1）
-        cdn_url = None
-        cdn_enabled = str(get_system_setting('cdn_enabled') or '0') == '1'
-        cdn_domain = str(get_system_setting('cloudflare_cdn_domain') or '').strip()
-        if cdn_enabled and cdn_domain:
-            cdn_url = f"https://{cdn_domain}/image/{encrypted_id}"
-
-        # 处理存储字段（类型防御：确保是字符串）
-        storage_backend = str(file_info.get('storage_backend') or 'telegram').strip() or 'telegram'
-        storage_key = str(file_info.get('storage_key') or file_info.get('file_id') or '').strip()
-        storage_meta = file_info.get('storage_meta')
-        if isinstance(storage_meta, str):
-            storage_meta_json = storage_meta
-        else:
-            try:
-                storage_meta_json = json.dumps(storage_meta or {}, ensure_ascii=False, separators=(",", ":"))
-            except Exception:
-                storage_meta_json = "{}"
 
-        cursor.execute('''
-            INSERT INTO file_storage (
-                encrypted_id, file_id, file_path, upload_time,
-                user_id, username, file_size, source,
-                original_filename, mime_type, etag, file_hash,
-                cdn_url, cdn_cached, is_group_upload, group_message_id,
-                group_chat_id, auth_token, storage_backend, storage_key,
-                storage_meta, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            encrypted_id,
-            file_info['file_id'],
-            file_info.get('file_path', ''),
-            file_info['upload_time'],
-            file_info.get('user_id'),
-            file_info.get('username', 'unknown'),
-            file_info.get('file_size', 0),
-            file_info.get('source', 'unknown'),
-            file_info.get('original_filename', ''),
-            file_info.get('mime_type', 'image/jpeg'),
-            etag,
-            file_info.get('file_hash', ''),
-            cdn_url,
-            0,  # cdn_cached
-            1 if file_info.get('is_group_upload') else 0,
-            file_info.get('group_message_id'),
-            file_info.get('group_chat_id'),
-            file_info.get('auth_token'),
-            storage_backend,
-            storage_key,
-            storage_meta_json,
-            datetime.now().isoformat()
-        ))
+def _insert_file_info(
+    cursor,
+    encrypted_id: str,
+    file_info: Dict[str, Any],
+    *,
+    require_existing_object: bool = False,
+) -> bool:
+    """在当前事务中插入一条文件记录，返回是否写入"""
+    from .settings import get_system_setting
 
+    # 生成 ETag
+    etag = f'W/"{encrypted_id}-{file_info.get("file_size", 0)}"'
+
+    # 生成 CDN URL（仅在 CDN Mode：域名已配置 + cdn_enabled=1）
+    cdn_url = None
+    cdn_enabled = str(get_system_setting('cdn_enabled') or '0') == '1'
+    cdn_domain = str(get_system_setting('cloudflare_cdn_domain') or '').strip()
+    if cdn_enabled and cdn_domain:
+        cdn_url = f"https://{cdn_domain}/image/{encrypted_id}"
+
+    # 处理存储字段（类型防御：确保是字符串）
+    storage_backend = str(file_info.get('storage_backend') or 'telegram').strip() or 'telegram'
+    storage_key = str(file_info.get('storage_key') or file_info.get('file_id') or '').strip()
+    storage_meta = file_info.get('storage_meta')
+    if isinstance(storage_meta, str):
+        storage_meta_json = storage_meta
+    else:
+        try:
+            storage_meta_json = json.dumps(storage_meta or {}, ensure_ascii=False, separators=(",", ":"))
+        except Exception:
+            storage_meta_json = "{}"
+
+    now = datetime.now()
+    columns = '''
+            encrypted_id, file_id, file_path, upload_time,
+            user_id, username, file_size, source,
+            original_filename, mime_type, etag, file_hash,
+            cdn_url, cdn_cached, is_group_upload, group_message_id,
+            group_chat_id, auth_token, storage_backend, storage_key,
+            storage_meta, created_at, upload_day
+    '''
+    values = (
+        encrypted_id,
+        file_info['file_id'],
+        file_info.get('file_path', ''),
+        file_info['upload_time'],
+        file_info.get('user_id'),
+        file_info.get('username', 'unknown'),
+        file_info.get('file_size', 0),
+        file_info.get('source', 'unknown'),
+        file_info.get('original_filename', ''),
+        file_info.get('mime_type', 'image/jpeg'),
+        etag,
+        file_info.get('file_hash', ''),
+        cdn_url,
+        0,  # cdn_cached
+        1 if file_info.get('is_group_upload') else 0,
+        file_info.get('group_message_id'),
+        file_info.get('group_chat_id'),
+        file_info.get('auth_token'),
+        storage_backend,
+        storage_key,
+        storage_meta_json,
+        now.isoformat(),
+        now.strftime('%Y-%m-%d'),
+    )
+    placeholders = ', '.join('?' * len(values))
+
+    if require_existing_object:
+        cursor.execute(f'''
+            INSERT INTO file_storage ({columns})
+            SELECT {placeholders}
+            WHERE EXISTS (
+                SELECT 1 FROM file_storage
+                WHERE storage_backend = ? AND storage_key = ?
+            )
+        ''', values + (storage_backend, storage_key))
+        return cursor.rowcount > 0
+
+    cursor.execute(f'''
+        INSERT INTO file_storage ({columns})
+        VALUES ({placeholders})
+    ''', values)
+    return True
+
+
+@db_retry(max_attempts=3, base_delay=0.1, max_delay=2.0)
+def save_file_info(
+    encrypted_id: str,
+    file_info: Dict[str, Any],
+    *,
+    require_existing_object: bool = False,
+) -> bool:
+    """
+    保存文件信息到数据库（带重试）
+
+    Args:
+        encrypted_id: 加密 ID
+        file_info: 文件信息
+        require_existing_object: 仅当同一存储对象仍被其他记录引用时才写入
+            （去重复用时使用，与删除最后一个引用的操作原子互斥）
+
+    Returns:
+        是否写入
+    """
+    with get_connection() as conn:
+        saved = _insert_file_info(
+            conn.cursor(), encrypted_id, file_info,
+            require_existing_object=require_existing_object,
+        )
+    invalidate_count_cache()
+    if saved:
         logger.info(f"文件信息已保存: {encrypted_id}")
+    return saved
+
+
+@db_retry(max_attempts=3, base_delay=0.1, max_delay=2.0)
+def save_file_infos(records: List[Tuple[str, Dict[str, Any], bool]]) -> List[bool]:
+    """
+    在单个事务中批量保存文件信息（带重试）
+
+    Args:
+        records: (encrypted_id, file_info, require_existing_object) 列表
+
+    Returns:
+        与 records 顺序一致的写入结果
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        saved = [
+            _insert_file_info(cursor, encrypted_id, file_info, require_existing_object=require_existing)
+            for encrypted_id, file_info, require_existing in records
+        ]
+    invalidate_count_cache()
+    logger.info(f"批量保存文件信息: {sum(saved)}/{len(records)} 条")
+    return saved
 
 
 def update_file_path_in_db(encrypted_id: str, new_file_path: str) -> None:
@@ -111,52 +210,197 @@ def update_cdn_cache_status(encrypted_id: str, cached: bool) -> None:
         logger.info(f"更新CDN缓存状态: {encrypted_id} -> {'已缓存' if cached else '未缓存'}")
 
 
+# ===================== 访问计数（写缓冲） =====================
+# 每次图片请求只累加内存中的增量，由后台线程定期批量写回数据库，
+# 避免所有图片流量都排队等待 SQLite 的单写锁。
+ACCESS_FLUSH_INTERVAL = 5.0       # 定时刷新间隔（秒）
+ACCESS_FLUSH_MAX_ENTRIES = 500    # 缓冲条目达到该数量时立即刷新
+
+# encrypted_id -> [access, cdn_hit, direct_hit, last_accessed]
+_access_buffer: Dict[str, List[Any]] = {}
+_access_buffer_lock = threading.Lock()
+_access_flush_event = threading.Event()
+_access_flush_stop = threading.Event()
+_access_flush_thread: Optional[threading.Thread] = None
+_access_flush_thread_lock = threading.Lock()
+
+
 def update_access_count(encrypted_id: str, access_type: str = 'direct_access') -> None:
-    """更新访问计数
+    """更新访问计数（写入内存缓冲，异步批量落库）
 
     Args:
         encrypted_id: 加密的文件ID
         access_type: 访问类型 ('cdn_pull' 或 'direct_access')
     """
+    # 与 CURRENT_TIMESTAMP 保持一致：UTC 'YYYY-MM-DD HH:MM:SS'
+    now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    with _access_buffer_lock:
+        entry = _access_buffer.get(encrypted_id)
+        if entry is None:
+            entry = [0, 0, 0, now]
+            _access_buffer[encrypted_id] = entry
+        entry[0] += 1
+        if access_type == 'cdn_pull':
+            entry[1] += 1
+        elif access_type == 'direct_access':
+            entry[2] += 1
+        entry[3] = now
+        pending = len(_access_buffer)
+
+    _ensure_access_flusher()
+    if pending >= ACCESS_FLUSH_MAX_ENTRIES:
+        _access_flush_event.set()
+
+
+@db_retry(max_attempts=3, base_delay=0.1, max_delay=2.0)
+def _write_access_counts(rows: List[tuple]) -> None:
+    """在单个事务中批量写入访问计数增量（只改写窄表 file_access_stats，不触碰 file_storage 宽行）"""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cdn_inc = 1 if access_type == 'cdn_pull' else 0
-        direct_inc = 1 if access_type == 'direct_access' else 0
+        conn.executemany('''
+            INSERT INTO file_access_stats (access_count, cdn_hit_count, direct_hit_count, last_accessed, encrypted_id)
+            SELECT ?, ?, ?, ?, encrypted_id FROM file_storage WHERE encrypted_id = ?
+            ON CONFLICT(encrypted_id) DO UPDATE SET
+                access_count = access_count + excluded.access_count,
+                cdn_hit_count = cdn_hit_count + excluded.cdn_hit_count,
+                direct_hit_count = direct_hit_count + excluded.direct_hit_count,
+                last_accessed = excluded.last_accessed
+        ''', rows)
+
+
+def flush_access_counts() -> int:
+    """将缓冲中的访问计数写回数据库，返回写入的条目数"""
+    with _access_buffer_lock:
+        if not _access_buffer:
+            return 0
+        pending = dict(_access_buffer)
+        _access_buffer.clear()
+
+    rows = [(v[0], v[1], v[2], v[3], k) for k, v in pending.items()]
+    try:
+        _write_access_counts(rows)
+        return len(rows)
+    except Exception as e:
+        # 写入失败：把增量合并回缓冲，等待下次刷新
+        logger.warning(f"访问计数批量写入失败，稍后重试: {e}")
+        with _access_buffer_lock:
+            for k, v in pending.items():
+                entry = _access_buffer.get(k)
+                if entry is None:
+                    _access_buffer[k] = v
+                else:
+                    entry[0] += v[0]
+                    entry[1] += v[1]
+                    entry[2] += v[2]
+        return 0
+
+
+def _access_flush_worker() -> None:
+    """访问计数刷新线程"""
+    while not _access_flush_stop.is_set():
+        _access_flush_event.wait(timeout=ACCESS_FLUSH_INTERVAL)
+        _access_flush_event.clear()
+        try:
+            flush_access_counts()
+        except Exception as e:
+            logger.error(f"访问计数刷新线程错误: {e}")
+
+
+def _ensure_access_flusher() -> None:
+    """按需启动刷新线程"""
+    global _access_flush_thread
+    if _access_flush_thread is not None and _access_flush_thread.is_alive():
+        return
+    with _access_flush_thread_lock:
+        if _access_flush_thread is not None and _access_flush_thread.is_alive():
+            return
+        if _access_flush_stop.is_set():
+            return
+        _access_flush_thread = threading.Thread(
+            target=_access_flush_worker, name='access-count-flusher', daemon=True
+        )
+        _access_flush_thread.start()
+
+
+def stop_access_count_flusher() -> None:
+    """停止刷新线程并写回剩余计数（优雅关闭时调用）"""
+    _access_flush_stop.set()
+    _access_flush_event.set()
+    thread = _access_flush_thread
+    if thread is not None and thread.is_alive():
+        thread.join(timeout=5)
+    flushed = flush_access_counts()
+    if flushed:
+        logger.info(f"已写回 {flushed} 条访问计数")
+
+
+# 进程退出时兜底写回（未经过 main() 优雅关闭路径时）
+atexit.register(flush_access_counts)
+
+
+# ===================== 存储对象引用计数 =====================
+# 去重后多条记录可共享同一存储对象 (storage_backend, storage_key)，
+# 引用数即引用该对象的记录数（走 idx_storage_key 索引），删除最后一条记录时才删除物理对象。
+def find_orphaned_storage_objects(cursor, objects) -> List[Tuple[str, str]]:
+    """
+    找出已无记录引用的存储对象（需在删除记录的同一事务中调用）
+
+    Args:
+        cursor: 数据库游标
+        objects: 被删除记录引用的 (storage_backend, storage_key) 集合
+
+    Returns:
+        可删除的 (storage_backend, storage_key) 列表
+    """
+    orphaned = []
+    for backend_name, storage_key in objects:
+        if not backend_name or not storage_key:
+            continue
+        cursor.execute('''
+            SELECT 1 FROM file_storage
+            WHERE storage_backend = ? AND storage_key = ?
+            LIMIT 1
+        ''', (backend_name, storage_key))
+        if cursor.fetchone() is None:
+            orphaned.append((backend_name, storage_key))
+    return orphaned
+
+
+def release_storage_objects(objects: List[Tuple[str, str]]) -> int:
+    """
+    删除已无引用的物理存储对象（在事务提交后调用，失败只记录日志）
+
+    Returns:
+        成功删除的对象数
+    """
+    if not objects:
+        return 0
+    from ..storage.router import get_storage_router
+
+    released = 0
+    router = get_storage_router()
+    for backend_name, storage_key in objects:
         try:
-            cursor.execute('''
-                UPDATE file_storage
-                SET access_count = access_count + 1,
-                    cdn_hit_count = cdn_hit_count + ?,
-                    direct_hit_count = direct_hit_count + ?,
-                    last_accessed = CURRENT_TIMESTAMP
-                WHERE encrypted_id = ?
-            ''', (cdn_inc, direct_inc, encrypted_id))
-        except sqlite3.OperationalError as e:
-            # 仅在列不存在时回退到旧逻辑（兼容旧数据库结构）
-            if 'no such column' in str(e).lower():
-                cursor.execute('''
-                    UPDATE file_storage
-                    SET access_count = access_count + 1,
-                        last_accessed = CURRENT_TIMESTAMP
-                    WHERE encrypted_id = ?
-                ''', (encrypted_id,))
-            else:
-                raise
+            if router.get_backend(backend_name).delete(storage_key=storage_key):
+                released += 1
+        except Exception as e:
+            logger.warning(f"删除存储对象失败 {backend_name}:{storage_key}: {e}")
+    return released
 
 
 def delete_files_by_ids(encrypted_ids: List[str]) -> tuple:
-    """批量删除文件记录"""
+    """批量删除文件记录（最后一个引用被删除时同时删除存储对象）"""
     with get_connection() as conn:
         cursor = conn.cursor()
         placeholders = ','.join('?' * len(encrypted_ids))
 
-        # 获取要删除的文件大小
+        # 获取要删除的文件大小与存储对象
         cursor.execute(f'''
-            SELECT SUM(file_size) FROM file_storage
+            SELECT file_size, storage_backend, storage_key FROM file_storage
             WHERE encrypted_id IN ({placeholders})
         ''', encrypted_ids)
-        result = cursor.fetchone()
-        deleted_size = result[0] if result and result[0] else 0
+        rows = cursor.fetchall()
+        deleted_size = sum(row[0] or 0 for row in rows)
+        objects = {(row[1], row[2]) for row in rows}
 
         # 删除记录
         cursor.execute(f'''
@@ -165,89 +409,77 @@ def delete_files_by_ids(encrypted_ids: List[str]) -> tuple:
         ''', encrypted_ids)
         deleted_count = cursor.rowcount
 
-        return deleted_count, deleted_size
+        orphaned = find_orphaned_storage_objects(cursor, objects)
+
+    invalidate_count_cache()
+    release_storage_objects(orphaned)
+    return deleted_count, deleted_size
 
 # ===================== 统计查询（admin_module.py 兼容） =====================
 def get_all_files_count() -> int:
-    """获取所有文件数量（admin_module.py 兼容接口）"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM file_storage')
-        return cursor.fetchone()[0]
+    """获取所有文件数量（admin_module.py 兼容接口，读取统计计数器）"""
+    return get_stats_counters()['total_files']
 
 
 def get_total_size() -> int:
-    """获取所有文件总大小（admin_module.py 兼容接口）"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT COALESCE(SUM(file_size), 0) FROM file_storage')
-        return cursor.fetchone()[0]
+    """获取所有文件总大小（admin_module.py 兼容接口，读取统计计数器）"""
+    return get_stats_counters()['total_size']
 
 
 def get_stats() -> Dict[str, Any]:
-    """获取完整统计信息"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-
-        # 获取总文件数和大小
-        cursor.execute('SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM file_storage')
-        total_files, total_size = cursor.fetchone()
-
-        # 获取今日上传数
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_timestamp = int(today_start.timestamp())
-        cursor.execute(
-            'SELECT COUNT(*) FROM file_storage WHERE upload_time >= ?',
-            (today_timestamp,)
-        )
-        today_uploads = cursor.fetchone()[0]
-
-        # 获取CDN缓存的文件数
-        cursor.execute('SELECT COUNT(*) FROM file_storage WHERE cdn_cached = 1')
-        cached_files = cursor.fetchone()[0]
-
-        # 获取待缓存数
-        cursor.execute(
-            'SELECT COUNT(*) FROM file_storage WHERE cdn_cached = 0 AND cdn_url IS NOT NULL'
-        )
-        pending_cache = cursor.fetchone()[0]
-
-        # 获取群组上传数
-        cursor.execute('SELECT COUNT(*) FROM file_storage WHERE is_group_upload = 1')
-        group_uploads = cursor.fetchone()[0]
-
-        return {
-            'total_files': total_files,
-            'total_size': total_size,
-            'today_uploads': today_uploads,
-            'group_uploads': group_uploads,
-            'cdn_stats': {
-                'cached_files': cached_files,
-                'pending_cache': pending_cache,
-                'monitor_queue_size': 0  # 由 cdn_service 更新
-            }
+    """获取完整统计信息（读取统计计数器，不扫描 file_storage）"""
+    counters = get_stats_counters()
+    today = get_daily_upload_stats()
+
+    return {
+        'total_files': counters['total_files'],
+        'total_size': counters['total_size'],
+        'today_uploads': today['uploads'],
+        'group_uploads': counters['group_uploads'],
+        'cdn_stats': {
+            'cached_files': counters['cached_files'],
+            'pending_cache': counters['pending_cache'],
+            'monitor_queue_size': 0  # 由 cdn_service 更新
         }
+    }
 
 
-def get_recent_uploads(limit: int = 10, page: int = 1) -> List[Dict[str, Any]]:
-    """获取最近上传的文件"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        offset = (page - 1) * limit
+def get_recent_uploads(limit: int = 10, page: int = 1, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    获取最近上传的文件
 
-        cursor.execute('''
+    Args:
+        limit: 每页数量
+        page: 页码（从1开始，未提供 cursor 时使用）
+        cursor: 分页游标（上一页的 next_cursor，提供时忽略 page）
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
+    where = ''
+    params: List[Any] = []
+    offset = (page - 1) * limit
+    if cursor:
+        where, params = keyset_condition('created_at', 'encrypted_id', cursor)
+        where = f'WHERE {where}'
+        offset = 0
+
+    with get_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        cur.execute(f'''
             SELECT encrypted_id, original_filename, file_size,
                    created_at, username, cdn_cached, is_group_upload
             FROM file_storage
-            ORDER BY created_at DESC
+            {where}
+            ORDER BY created_at DESC, encrypted_id DESC
             LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        ''', params + [limit, offset])
 
-        return [dict(row) for row in cursor.fetchall()]
+        return [dict(row) for row in cur.fetchall()]
 
 def get_uncached_files(since_timestamp: int, limit: int = 100) -> List[Dict[str, Any]]:
     """获取未缓存的文件（用于恢复CDN监控任务）"""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT encrypted_id, upload_time FROM file_storage
@@ -260,37 +492,49 @@ def get_uncached_files(since_timestamp: int, limit: int = 100) -> List[Dict[str,
         return [dict(row) for row in cursor.fetchall()]
 
 
-def get_user_uploads(username: str, limit: int = 10, page: int = 1) -> tuple:
+def get_user_uploads(username: str, limit: int = 10, page: int = 1, cursor: Optional[str] = None) -> tuple:
     """获取指定用户的上传记录（分页）
 
     Args:
         username: 用户名（与上传时保存的 username 字段一致）
         limit: 每页数量
-        page: 页码（从1开始）
+        page: 页码（从1开始，未提供 cursor 时使用）
+        cursor: 分页游标（提供时忽略 page）
 
     Returns:
-        (files_list, total_count) 元组
+        (files_list, total_count) 元组，total_count 为短时缓存的总数
+
+    Raises:
+        InvalidCursorError: 游标格式错误
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        offset = (page - 1) * limit
+    where = 'WHERE username = ?'
+    params: List[Any] = [username]
+    offset = (page - 1) * limit
+    if cursor:
+        condition, cursor_params = keyset_condition('created_at', 'encrypted_id', cursor)
+        where += f' AND {condition}'
+        params += cursor_params
+        offset = 0
 
-        cursor.execute(
-            'SELECT COUNT(*) FROM file_storage WHERE username = ?',
-            (username,)
-        )
-        total = cursor.fetchone()[0]
+    with get_connection(readonly=True) as conn:
+        cur = conn.cursor()
 
-        cursor.execute('''
+        def _count() -> int:
+            cur.execute('SELECT COUNT(*) FROM file_storage WHERE username = ?', (username,))
+            return cur.fetchone()[0]
+
+        total = cached_count(('user_uploads', username), _count)
+
+        cur.execute(f'''
             SELECT encrypted_id, original_filename, file_size,
                    created_at, username, mime_type
             FROM file_storage
-            WHERE username = ?
-            ORDER BY created_at DESC
+            {where}
+            ORDER BY created_at DESC, encrypted_id DESC
             LIMIT ? OFFSET ?
-        ''', (username, limit, offset))
+        ''', params + [limit, offset])
 
-        files = [dict(row) for row in cursor.fetchall()]
+        files = [dict(row) for row in cur.fetchall()]
         return files, total
 
 
@@ -299,62 +543,55 @@ def get_cdn_dashboard_stats(window_hours: Optional[int] = None) -> Dict[str, Any
     CDN 仪表盘统计
     注意：无法从源站精确推断 Cloudflare 边缘 HIT 率，边缘命中不会到达源站
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-
-        # 文件缓存统计
-        cursor.execute("SELECT COUNT(*) FROM file_storage")
-        total_files = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM file_storage WHERE cdn_cached = 1")
-        cached_files = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM file_storage WHERE cdn_cached = 0 OR cdn_cached IS NULL")
-        uncached_files = cursor.fetchone()[0]
-
-        # 访问统计（可选时间窗口）
-        where = ""
-        params: List[Any] = []
-        if window_hours is not None:
-            hours = int(window_hours)
-            where = "WHERE last_accessed IS NOT NULL AND last_accessed >= datetime('now', ?)"
-            params = [f"-{hours} hours"]
-
-        cursor.execute(
-            f"""
-            SELECT
-              COALESCE(SUM(access_count), 0),
-              COALESCE(SUM(cdn_hit_count), 0),
-              COALESCE(SUM(direct_hit_count), 0)
-            FROM file_storage
-            {where}
-            """,
-            params
-        )
-        row = cursor.fetchone()
+    # 文件缓存统计（统计计数器）
+    counters = get_stats_counters()
+    total_files = counters['total_files']
+    cached_files = counters['cached_files']
+    uncached_files = total_files - cached_files
+
+    # 访问统计：全量读取计数器；指定时间窗口时按 last_accessed 筛选汇总
+    if window_hours is None:
+        access_total = counters['access_count']
+        cdn_origin_requests = counters['cdn_hit_count']
+        direct_origin_requests = counters['direct_hit_count']
+    else:
+        with get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT
+                  COALESCE(SUM(access_count), 0),
+                  COALESCE(SUM(cdn_hit_count), 0),
+                  COALESCE(SUM(direct_hit_count), 0)
+                FROM file_access_stats
+                WHERE last_accessed IS NOT NULL AND last_accessed >= datetime('now', ?)
+                """,
+                [f"-{int(window_hours)} hours"]
+            )
+            row = cursor.fetchone()
         access_total = int(row[0] or 0)
         cdn_origin_requests = int(row[1] or 0)
         direct_origin_requests = int(row[2] or 0)
 
-        origin_total = cdn_origin_requests + direct_origin_requests
-        direct_share = (direct_origin_requests / origin_total) if origin_total else 0.0
-        cdn_origin_share = (cdn_origin_requests / origin_total) if origin_total else 0.0
-
-        return {
-            "files": {
-                "total": total_files,
-                "cached": cached_files,
-                "uncached": uncached_files,
-                "cache_rate": (cached_files / total_files) if total_files else 0.0,
-            },
-            "origin_requests": {
-                "window_hours": window_hours,
-                "total_access_count": access_total,
-                "origin_total": origin_total,
-                "cdn_origin_requests": cdn_origin_requests,
-                "direct_origin_requests": direct_origin_requests,
-                "cdn_origin_share": cdn_origin_share,
-                "direct_origin_share": direct_share,
-                "note": "Edge HITs do not reach origin; use Cloudflare analytics for real hit rate.",
-            },
-        }
+    origin_total = cdn_origin_requests + direct_origin_requests
+    direct_share = (direct_origin_requests / origin_total) if origin_total else 0.0
+    cdn_origin_share = (cdn_origin_requests / origin_total) if origin_total else 0.0
+
+    return {
+        "files": {
+            "total": total_files,
+            "cached": cached_files,
+            "uncached": uncached_files,
+            "cache_rate": (cached_files / total_files) if total_files else 0.0,
+        },
+        "origin_requests": {
+            "window_hours": window_hours,
+            "total_access_count": access_total,
+            "origin_total": origin_total,
+            "cdn_origin_requests": cdn_origin_requests,
+            "direct_origin_requests": direct_origin_requests,
+            "cdn_origin_share": cdn_origin_share,
+            "direct_origin_share": direct_share,
+            "note": "Edge HITs do not reach origin; use Cloudflare analytics for real hit rate.",
+        },
+    }
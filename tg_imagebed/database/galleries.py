@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any, List
 from ..config import logger
 from .connection import get_connection
 from .tokens import _parse_datetime
+from .pagination import cached_count, invalidate_count_cache, keyset_condition, next_page_cursor
 
 
 # ===================== 画集 CRUD =====================
@@ -24,6 +25,40 @@ def _read_gallery(cursor, gallery_id: int) -> Optional[Dict[str, Any]]:
     return data
 
 
+def _query_gallery_images(cur, gallery_id: int, page: int, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    查询画集图片的一页（按加入时间倒序）
+
+    提供 cursor 时按 (added_at, encrypted_id) 游标翻页，忽略 page。
+    """
+    condition, params = ('', [])
+    offset = (page - 1) * limit
+    if cursor:
+        condition, params = keyset_condition('gi.added_at', 'gi.encrypted_id', cursor)
+        condition = f'AND {condition}'
+        offset = 0
+
+    def _count() -> int:
+        cur.execute('SELECT COUNT(*) FROM gallery_images WHERE gallery_id = ?', (gallery_id,))
+        return cur.fetchone()[0]
+
+    total = cached_count(('gallery_images', gallery_id), _count)
+    cur.execute(f'''
+        SELECT fs.encrypted_id, fs.original_filename, fs.file_size, fs.created_at,
+               fs.cdn_cached, fs.cdn_url, fs.mime_type, gi.added_at
+        FROM gallery_images gi
+        JOIN file_storage fs ON gi.encrypted_id = fs.encrypted_id
+        WHERE gi.gallery_id = ? {condition}
+        ORDER BY gi.added_at DESC, gi.encrypted_id DESC
+        LIMIT ? OFFSET ?
+    ''', [gallery_id] + params + [limit, offset])
+    items = [dict(r) for r in cur.fetchall()]
+    return {
+        'items': items, 'total': total, 'page': page, 'limit': limit,
+        'next_cursor': next_page_cursor(items, limit, 'added_at'),
+    }
+
+
 def create_gallery(owner_token: str, name: str, description: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """创建画集"""
     try:
@@ -198,6 +233,7 @@ def add_images_to_gallery(gallery_id: int, owner_token: str, encrypted_ids: List
                 except sqlite3.IntegrityError:
                     result['skipped'] += 1
             cursor.execute('UPDATE galleries SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (gallery_id,))
+        invalidate_count_cache()
         logger.info(f"添加图片到画集: gallery_id={gallery_id}, added={result['added']}")
         return result
     except Exception as e:
@@ -223,46 +259,49 @@ def remove_images_from_gallery(gallery_id: int, owner_token: str, encrypted_ids:
                 logger.info(f"封面图片被移除，清除封面设置: gallery_id={gallery_id}")
             else:
                 cursor.execute('UPDATE galleries SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (gallery_id,))
-            logger.info(f"从画集移除图片: gallery_id={gallery_id}, removed={removed}")
-            return removed
+        invalidate_count_cache()
+        logger.info(f"从画集移除图片: gallery_id={gallery_id}, removed={removed}")
+        return removed
     except Exception as e:
         logger.error(f"从画集移除图片失败: {e}")
         return 0
 
 
-def get_gallery_images(gallery_id: int, owner_token: Optional[str] = None, page: int = 1, limit: int = 50) -> Dict[str, Any]:
-    """获取画集内的图片"""
+def get_gallery_images(
+    gallery_id: int,
+    owner_token: Optional[str] = None,
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    获取画集内的图片
+
+    提供 cursor 时按游标翻页（忽略 page），返回值中的 next_cursor 用于获取下一页。
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
+    if cursor:
+        keyset_condition('gi.added_at', 'gi.encrypted_id', cursor)  # 提前校验游标
     try:
         with get_connection() as conn:
-            cursor = conn.cursor()
+            cur = conn.cursor()
             if owner_token:
-                cursor.execute('SELECT id FROM galleries WHERE id = ? AND owner_token = ?', (gallery_id, owner_token))
+                cur.execute('SELECT id FROM galleries WHERE id = ? AND owner_token = ?', (gallery_id, owner_token))
             else:
-                cursor.execute('''
+                cur.execute('''
                     SELECT id FROM galleries
                     WHERE id = ? AND share_enabled = 1
                     AND (share_expires_at IS NULL OR share_expires_at > CURRENT_TIMESTAMP)
                 ''', (gallery_id,))
-            row = cursor.fetchone()
+            row = cur.fetchone()
             if not row:
-                return {'items': [], 'total': 0, 'page': page, 'limit': limit}
-            offset = (page - 1) * limit
-            cursor.execute('SELECT COUNT(*) FROM gallery_images WHERE gallery_id = ?', (gallery_id,))
-            total = cursor.fetchone()[0]
-            cursor.execute('''
-                SELECT fs.encrypted_id, fs.original_filename, fs.file_size, fs.created_at,
-                       fs.cdn_cached, fs.cdn_url, fs.mime_type, gi.added_at
-                FROM gallery_images gi
-                JOIN file_storage fs ON gi.encrypted_id = fs.encrypted_id
-                WHERE gi.gallery_id = ?
-                ORDER BY gi.added_at DESC
-                LIMIT ? OFFSET ?
-            ''', (gallery_id, limit, offset))
-            items = [dict(r) for r in cursor.fetchall()]
-            return {'items': items, 'total': total, 'page': page, 'limit': limit}
+                return {'items': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None}
+            return _query_gallery_images(cur, gallery_id, page, limit, cursor)
     except Exception as e:
         logger.error(f"获取画集图片失败: {e}")
-        return {'items': [], 'total': 0, 'page': page, 'limit': limit}
+        return {'items': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None}
 
 # ===================== 分享 =====================
 def update_gallery_share(gallery_id: int, owner_token: str, enabled: bool, expires_at: Optional[str] = None) -> Optional[Dict[str, Any]]:
@@ -459,43 +498,37 @@ def get_share_all_gallery_images(
     share_token: str,
     gallery_id: int,
     page: int = 1,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
-    """在全部分享上下文中获取画集图片（不检查解锁 cookie，由 API 层处理）"""
+    """
+    在全部分享上下文中获取画集图片（不检查解锁 cookie，由 API 层处理）
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
     page = max(1, int(page or 1))
     limit = max(1, min(200, int(limit or 50)))
+    if cursor:
+        keyset_condition('gi.added_at', 'gi.encrypted_id', cursor)  # 提前校验游标
     try:
         with get_connection() as conn:
-            cursor = conn.cursor()
-            if not _validate_share_all_token(cursor, share_token):
+            cur = conn.cursor()
+            if not _validate_share_all_token(cur, share_token):
                 return None
 
             # 确保画集在 share-all 中可见
-            cursor.execute('''
+            cur.execute('''
                 SELECT 1 FROM galleries
                 WHERE id = ?
                   AND hide_from_share_all = 0
                   AND access_mode != 'admin_only'
                 LIMIT 1
             ''', (gallery_id,))
-            if not cursor.fetchone():
+            if not cur.fetchone():
                 return None
 
-            offset = (page - 1) * limit
-            cursor.execute('SELECT COUNT(*) FROM gallery_images WHERE gallery_id = ?', (gallery_id,))
-            total = cursor.fetchone()[0]
-
-            cursor.execute('''
-                SELECT fs.encrypted_id, fs.original_filename, fs.file_size, fs.created_at,
-                       fs.cdn_cached, fs.cdn_url, fs.mime_type, gi.added_at
-                FROM gallery_images gi
-                JOIN file_storage fs ON gi.encrypted_id = fs.encrypted_id
-                WHERE gi.gallery_id = ?
-                ORDER BY gi.added_at DESC
-                LIMIT ? OFFSET ?
-            ''', (gallery_id, limit, offset))
-            items = [dict(r) for r in cursor.fetchall()]
-            return {'items': items, 'total': total, 'page': page, 'limit': limit}
+            return _query_gallery_images(cur, gallery_id, page, limit, cursor)
     except Exception as e:
         logger.error(f"Share-all 获取画集图片失败: {e}")
         return None
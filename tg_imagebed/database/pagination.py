@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游标（keyset）分页 + 总数缓存
+
+游标是 (排序值, encrypted_id) 的 base64url 编码，对客户端不透明。
+按游标翻页时以 (排序列, encrypted_id) < (?, ?) 配合复合索引直接定位，
+翻到再深的位置也不必扫描并丢弃前面的行；页码分页仍保留，两种方式并存。
+"""
+import base64
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+COUNT_CACHE_TTL_SECONDS = 30.0      # 总数缓存有效期
+COUNT_CACHE_MAX_ENTRIES = 1024      # 总数缓存条目上限
+
+_count_cache: Dict[Hashable, Tuple[float, int]] = {}
+_count_cache_lock = threading.Lock()
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析"""
+
+
+def encode_cursor(sort_value: Any, encrypted_id: str) -> str:
+    """编码分页游标"""
+    raw = json.dumps([sort_value, encrypted_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """
+    解码分页游标
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise InvalidCursorError('invalid cursor')
+    if (not isinstance(value, list) or len(value) != 2 or
+            not isinstance(value[0], (str, int, float)) or not isinstance(value[1], str)):
+        raise InvalidCursorError('invalid cursor')
+    return value[0], value[1]
+
+
+def keyset_condition(sort_column: str, id_column: str, cursor: str) -> Tuple[str, List[Any]]:
+    """
+    生成降序翻页的 WHERE 条件
+
+    Returns:
+        (条件 SQL, 参数列表)
+    """
+    sort_value, encrypted_id = decode_cursor(cursor)
+    return f'({sort_column}, {id_column}) < (?, ?)', [sort_value, encrypted_id]
+
+
+def next_page_cursor(items: List[Dict[str, Any]], limit: int, sort_field: str) -> Optional[str]:
+    """
+    生成下一页游标（本页已取满 limit 条时以最后一条为起点，否则没有下一页）
+
+    Args:
+        items: 当前页数据（需包含排序字段与 encrypted_id 原始值）
+        limit: 每页数量
+        sort_field: 排序字段名
+    """
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.get(sort_field), last.get('encrypted_id'))
+
+
+def cached_count(key: Hashable, compute: Callable[[], int], ttl: float = COUNT_CACHE_TTL_SECONDS) -> int:
+    """
+    带短时缓存的总数（翻页时不必每页重新 COUNT(*)）
+
+    Args:
+        key: 缓存键（查询范围 + 筛选条件）
+        compute: 缓存未命中时计算总数
+        ttl: 有效期（秒）
+    """
+    now = time.monotonic()
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    value = int(compute() or 0)
+
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            expired = [k for k, (expires, _) in _count_cache.items() if expires <= now]
+            for k in expired:
+                del _count_cache[k]
+            if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+                _count_cache.clear()
+        _count_cache[key] = (now + ttl, value)
+    return value
+
+
+def invalidate_count_cache() -> None:
+    """清空总数缓存（文件或画集图片增删后调用）"""
+    with _count_cache_lock:
+        _count_cache.clear()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件全文检索（FTS5 trigram 索引）
+
+file_storage_fts 是 file_storage 的外部内容索引，覆盖文件名（含机器人 caption 生成的文件名）、
+用户名与来源，由触发器随增删改同步。trigram 分词支持任意子串匹配，
+取代 LIKE '%x%' 的全表扫描；SQLite 未编译 FTS5 / trigram 时退回 LIKE。
+"""
+import sqlite3
+import threading
+from typing import Optional
+
+from ..config import logger
+
+
+SEARCH_TABLE = 'file_storage_fts'
+SEARCH_MIN_LENGTH = 3   # trigram 索引最短可检索长度，更短的关键词退回 LIKE
+
+_available: Optional[bool] = None
+_available_lock = threading.Lock()
+
+_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON file_storage BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, original_filename, username, source)
+        VALUES (new.rowid, new.original_filename, new.username, new.source);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON file_storage BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, original_filename, username, source)
+        VALUES ('delete', old.rowid, old.original_filename, old.username, old.source);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au
+    AFTER UPDATE OF original_filename, username, source ON file_storage BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, original_filename, username, source)
+        VALUES ('delete', old.rowid, old.original_filename, old.username, old.source);
+        INSERT INTO {SEARCH_TABLE}(rowid, original_filename, username, source)
+        VALUES (new.rowid, new.original_filename, new.username, new.source);
+    END
+    ''',
+)
+
+
+def ensure_search_index(cursor) -> bool:
+    """
+    创建检索索引与同步触发器
+
+    首次创建时从 file_storage 回填；已存在时比对行数与最大 rowid，不一致则重建。
+
+    Returns:
+        索引是否可用
+    """
+    global _available
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,))
+    existed = cursor.fetchone() is not None
+    try:
+        if not existed:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+                    original_filename, username, source,
+                    content='file_storage', content_rowid='rowid',
+                    tokenize='trigram'
+                )
+            ''')
+        for trigger in _TRIGGERS:
+            cursor.execute(trigger)
+        if not existed:
+            rebuild_search_index(cursor)
+            logger.info("已创建文件检索索引并回填现有记录")
+        elif not _index_matches_content(cursor):
+            rebuild_search_index(cursor)
+            logger.warning("文件检索索引与 file_storage 的 rowid 不一致（可能执行过 VACUUM），已重建")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite 不支持 FTS5 trigram，文件搜索退回 LIKE: {e}")
+        with _available_lock:
+            _available = False
+        return False
+
+    with _available_lock:
+        _available = True
+    return True
+
+
+def _index_matches_content(cursor) -> bool:
+    """
+    索引与 file_storage 的行数、最大 rowid 是否一致（廉价校验，启动时执行）
+
+    file_storage 以 TEXT 主键建表，rowid 不是稳定别名：VACUUM 会把有空洞的 rowid 压缩为连续编号，
+    此时最大 rowid 随之变化，外部内容索引错位可由此发现。
+    """
+    cursor.execute(f"SELECT COUNT(*), MAX(id) FROM {SEARCH_TABLE}_docsize")
+    indexed = tuple(cursor.fetchone())
+    cursor.execute("SELECT COUNT(*), MAX(rowid) FROM file_storage")
+    return indexed == tuple(cursor.fetchone())
+
+
+def rebuild_search_index(cursor) -> None:
+    """从 file_storage 重建检索索引（接受连接或游标）"""
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def is_search_index_available(cursor) -> bool:
+    """检索索引是否存在（结果缓存）"""
+    global _available
+    with _available_lock:
+        if _available is not None:
+            return _available
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,))
+    available = cursor.fetchone() is not None
+    with _available_lock:
+        _available = available
+    return available
+
+
+def build_match_query(search: str) -> Optional[str]:
+    """
+    将用户输入转换为 FTS5 MATCH 表达式（整体作为一个短语做子串匹配）
+
+    Returns:
+        MATCH 表达式；关键词过短无法使用 trigram 索引时返回 None
+    """
+    search = (search or '').strip()
+    if len(search) < SEARCH_MIN_LENGTH:
+        return None
+    return '"' + search.replace('"', '""') + '"'
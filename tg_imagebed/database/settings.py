@@ -2,7 +2,10 @@
 # -*- coding: utf-8 -*-
 """系统设置 + 公告管理"""
 import json
-from typing import Optional, Dict, Any, List
+import time
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
 
 from ..config import logger
 from .connection import get_connection
@@ -158,40 +161,160 @@ def init_system_settings() -> None:
                         logger.info(f"初始化系统设置: {key}={default_value} (默认值)")
     except Exception as e:
         logger.error(f"初始化系统设置失败: {e}")
+    invalidate_settings_snapshot()
 
 
-def get_system_setting(key: str) -> Optional[str]:
-    """获取单个系统设置"""
-    try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT value FROM admin_config WHERE key = ?', (key,))
-            row = cursor.fetchone()
-            if row:
-                return row[0]
-            return DEFAULT_SYSTEM_SETTINGS.get(key)
-    except Exception as e:
-        logger.error(f"获取系统设置失败 {key}: {e}")
+# ===================== 设置快照 =====================
+# 所有设置一次性加载为内存快照，热路径（如图片请求）不再逐项查库。
+# 本进程写入时立即失效；其他进程的写入通过 settings_version 版本行感知，
+# 版本行最多每 SETTINGS_VERSION_CHECK_INTERVAL 秒检查一次。
+SETTINGS_VERSION_KEY = 'settings_version'
+SETTINGS_VERSION_CHECK_INTERVAL = 1.0
+
+# admin_config 中的内部数据（账号、会话、日志等），不属于系统设置，不进入快照
+_NON_SETTING_KEYS = {
+    SETTINGS_VERSION_KEY, 'username', 'password_hash',
+    'security_log', 'active_sessions', 'admin_gallery_owner_token',
+}
+
+
+class SettingsSnapshot:
+    """系统设置只读快照（带类型的读取方法）"""
+
+    __slots__ = ('version', '_values')
+
+    def __init__(self, values: Dict[str, str], version: int):
+        self.version = version
+        self._values = values
+
+    def get(self, key: str) -> Optional[str]:
+        """获取原始值，数据库中不存在时回退默认值"""
+        if key in self._values:
+            return self._values[key]
         return DEFAULT_SYSTEM_SETTINGS.get(key)
 
+    def get_str(self, key: str, default: str = '') -> str:
+        """获取字符串（去除首尾空白）"""
+        return str(self.get(key) or default).strip()
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """获取 '0'/'1' 开关"""
+        value = self.get(key)
+        if value is None or value == '':
+            return default
+        return str(value) == '1'
+
+    def get_int(
+        self,
+        key: str,
+        default: int,
+        minimum: Optional[int] = None,
+        maximum: Optional[int] = None
+    ) -> int:
+        """获取 int（带容错/范围约束）"""
+        value = _safe_int(self.get(key), default)
+        if minimum is not None:
+            value = max(minimum, value)
+        if maximum is not None:
+            value = min(maximum, value)
+        return value
+
+    def as_dict(self) -> Dict[str, str]:
+        """返回所有已知设置（默认值 + 数据库值）"""
+        settings = dict(DEFAULT_SYSTEM_SETTINGS)
+        for key in DEFAULT_SYSTEM_SETTINGS:
+            if key in self._values:
+                settings[key] = self._values[key]
+        return settings
+
+
+_snapshot: Optional[SettingsSnapshot] = None
+_snapshot_checked_at = 0.0
+_snapshot_generation = 0
+_snapshot_lock = threading.Lock()
+
+
+def _load_settings_rows() -> Tuple[Dict[str, str], int]:
+    """单条查询读取全部设置和版本号"""
+    values: Dict[str, str] = {}
+    version = 0
+    with get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT key, value FROM admin_config')
+        for key, value in cursor.fetchall():
+            if key == SETTINGS_VERSION_KEY:
+                version = _safe_int(value, 0)
+            elif key not in _NON_SETTING_KEYS:
+                values[key] = value
+    return values, version
+
+
+def _read_settings_version() -> int:
+    """读取设置版本号"""
+    with get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT value FROM admin_config WHERE key = ?', (SETTINGS_VERSION_KEY,))
+        row = cursor.fetchone()
+        return _safe_int(row[0], 0) if row else 0
+
+
+def _bump_settings_version(cursor) -> None:
+    """在当前事务中递增设置版本号（通知其他进程重新加载）"""
+    cursor.execute('''
+        INSERT INTO admin_config (key, value, updated_at)
+        VALUES (?, '1', CURRENT_TIMESTAMP)
+        ON CONFLICT(key) DO UPDATE SET
+            value = CAST(value AS INTEGER) + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (SETTINGS_VERSION_KEY,))
+
+
+def invalidate_settings_snapshot() -> None:
+    """使设置快照失效，下次读取时重新加载"""
+    global _snapshot, _snapshot_generation
+    with _snapshot_lock:
+        _snapshot = None
+        _snapshot_generation += 1
+
+
+def get_settings_snapshot() -> SettingsSnapshot:
+    """获取当前设置快照"""
+    global _snapshot, _snapshot_checked_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and (now - _snapshot_checked_at) < SETTINGS_VERSION_CHECK_INTERVAL:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        generation = _snapshot_generation
 
-def get_all_system_settings() -> Dict[str, Any]:
-    """获取所有系统设置"""
     try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            settings = dict(DEFAULT_SYSTEM_SETTINGS)  # 从默认值开始
+        if snapshot is not None and _read_settings_version() == snapshot.version:
+            fresh = snapshot
+        else:
+            values, version = _load_settings_rows()
+            fresh = SettingsSnapshot(values, version)
+    except Exception as e:
+        logger.error(f"加载系统设置快照失败: {e}")
+        fresh = snapshot or SettingsSnapshot({}, -1)
 
-            for key in DEFAULT_SYSTEM_SETTINGS.keys():
-                cursor.execute('SELECT value FROM admin_config WHERE key = ?', (key,))
-                row = cursor.fetchone()
-                if row:
-                    settings[key] = row[0]
+    with _snapshot_lock:
+        # 加载期间本进程有写入时不缓存，避免覆盖失效
+        if generation == _snapshot_generation:
+            _snapshot = fresh
+            _snapshot_checked_at = now
+    return fresh
 
-            return settings
-    except Exception as e:
-        logger.error(f"获取所有系统设置失败: {e}")
-        return dict(DEFAULT_SYSTEM_SETTINGS)
+
+def get_system_setting(key: str) -> Optional[str]:
+    """获取单个系统设置"""
+    return get_settings_snapshot().get(key)
+
+
+def get_all_system_settings() -> Dict[str, Any]:
+    """获取所有系统设置"""
+    return get_settings_snapshot().as_dict()
 
 
 def update_system_setting(key: str, value: str) -> bool:
@@ -207,11 +330,13 @@ def update_system_setting(key: str, value: str) -> bool:
                 INSERT OR REPLACE INTO admin_config (key, value, updated_at)
                 VALUES (?, ?, CURRENT_TIMESTAMP)
             ''', (key, value))
+            _bump_settings_version(cursor)
             if key in SENSITIVE_SETTINGS:
                 logger.info(f"更新系统设置: {key}=[REDACTED]")
             else:
                 logger.info(f"更新系统设置: {key}={value}")
-            return True
+        invalidate_settings_snapshot()
+        return True
     except Exception as e:
         logger.error(f"更新系统设置失败 {key}: {e}")
         return False
@@ -232,7 +357,9 @@ def update_system_settings(settings: Dict[str, str]) -> bool:
                         logger.info(f"更新系统设置: {key}=[REDACTED]")
                     else:
                         logger.info(f"更新系统设置: {key}={value}")
-            return True
+            _bump_settings_version(cursor)
+        invalidate_settings_snapshot()
+        return True
     except Exception as e:
         logger.error(f"批量更新系统设置失败: {e}")
         return False
@@ -252,24 +379,19 @@ def get_system_setting_int(
     maximum: Optional[int] = None
 ) -> int:
     """获取 int 类型系统设置（带容错/范围约束）"""
-    value = _safe_int(get_system_setting(key), default)
-    if minimum is not None:
-        value = max(minimum, value)
-    if maximum is not None:
-        value = min(maximum, value)
-    return value
+    return get_settings_snapshot().get_int(key, default, minimum=minimum, maximum=maximum)
 
 
 def get_upload_count_today(*, source: Optional[str] = None, auth_token: Optional[str] = None) -> int:
-    """获取今天的上传次数（按 source 或 auth_token 过滤）"""
+    """获取今天的上传次数（按 source 或 auth_token 过滤，走 (source | auth_token, upload_day) 索引）"""
     if not source and auth_token is None:
         return 0
 
     try:
-        with get_connection() as conn:
+        with get_connection(readonly=True) as conn:
             cursor = conn.cursor()
-            conditions = ["date(created_at) = date('now', 'localtime')"]
-            params: List[Any] = []
+            conditions = ["upload_day = ?"]
+            params: List[Any] = [datetime.now().strftime('%Y-%m-%d')]
 
             if source:
                 conditions.append("source = ?")
@@ -290,6 +412,89 @@ def get_upload_count_today(*, source: Optional[str] = None, auth_token: Optional
         return 0
 
 
+def _quota_scope(source: Optional[str], auth_token: Optional[str]) -> Tuple[str, str, str]:
+    """额度计数范围：(scope 键, file_storage 列名, 列值)"""
+    if auth_token is not None:
+        return f'token:{auth_token}', 'auth_token', auth_token
+    return f'source:{source}', 'source', source or ''
+
+
+def reserve_daily_uploads(
+    limit: int,
+    count: int = 1,
+    *,
+    source: Optional[str] = None,
+    auth_token: Optional[str] = None,
+) -> Tuple[str, int]:
+    """
+    预占今日上传额度（在写入存储后端之前调用，上传失败时用 release_daily_uploads 归还）
+
+    计数行首次使用当天时按 file_storage 中已有的记录初始化，之后以
+    count + n <= limit 的条件 UPDATE 原子扣减，并发上传不会超出限制。
+
+    Args:
+        limit: 每日上限
+        count: 希望预占的数量（批量上传时额度不足则只预占剩余部分）
+        source / auth_token: 计数范围（二选一）
+
+    Returns:
+        (日期, 实际预占数)
+    """
+    day = datetime.now().strftime('%Y-%m-%d')
+    scope, column, value = _quota_scope(source, auth_token)
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                INSERT INTO upload_quota_daily (day, scope, count)
+                SELECT ?, ?, COUNT(*) FROM file_storage WHERE upload_day = ? AND {column} = ?
+                ON CONFLICT(day, scope) DO NOTHING
+            ''', (day, scope, day, value))
+            if cursor.rowcount:
+                # 当天第一次预占：顺带清理之前的计数
+                cursor.execute('DELETE FROM upload_quota_daily WHERE day < ?', (day,))
+
+            wanted = count
+            while wanted > 0:
+                cursor.execute('''
+                    UPDATE upload_quota_daily SET count = count + ?
+                    WHERE day = ? AND scope = ? AND count + ? <= ?
+                ''', (wanted, day, scope, wanted, limit))
+                if cursor.rowcount:
+                    return day, wanted
+                cursor.execute(
+                    'SELECT count FROM upload_quota_daily WHERE day = ? AND scope = ?',
+                    (day, scope)
+                )
+                row = cursor.fetchone()
+                wanted = min(wanted, limit - int(row[0] if row else 0))
+            return day, 0
+    except Exception as e:
+        logger.error(f"预占今日上传额度失败: {e}")
+        return day, count
+
+
+def release_daily_uploads(
+    day: str,
+    count: int = 1,
+    *,
+    source: Optional[str] = None,
+    auth_token: Optional[str] = None,
+) -> None:
+    """归还预占但未上传成功的额度"""
+    if count <= 0:
+        return
+    scope, _column, _value = _quota_scope(source, auth_token)
+    try:
+        with get_connection() as conn:
+            conn.execute(
+                'UPDATE upload_quota_daily SET count = MAX(0, count - ?) WHERE day = ? AND scope = ?',
+                (count, day, scope)
+            )
+    except Exception as e:
+        logger.error(f"归还今日上传额度失败: {e}")
+
+
 def get_public_settings() -> Dict[str, Any]:
     """获取公开的系统设置（供前端使用）"""
     settings = get_all_system_settings()
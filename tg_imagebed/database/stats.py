@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计计数器（物化汇总）
+
+stats_counters / stats_daily_uploads 由 file_storage 与 file_access_stats 上的触发器增量维护，
+统计接口读取时为 O(1)，不再对整表做 COUNT/SUM。
+触发器覆盖所有写路径（包括直接执行 SQL 的批量删除）；
+后台任务定期从零重算一次，修正手工改库等绕过触发器造成的偏差。
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from ..config import logger
+from .connection import get_connection
+
+
+STATS_RECONCILE_INTERVAL = 6 * 3600    # 重算间隔（秒）
+
+# 计数器名称 -> 单行贡献值表达式（{r} 替换为 new / old）
+# 文件计数器来自 file_storage，访问计数器来自 file_access_stats
+_FILE_COUNTERS = {
+    'total_files': '1',
+    'total_size': 'COALESCE({r}.file_size, 0)',
+    'cached_files': 'COALESCE({r}.cdn_cached = 1, 0)',
+    'pending_cache': 'COALESCE({r}.cdn_cached = 0 AND {r}.cdn_url IS NOT NULL, 0)',
+    'group_uploads': 'COALESCE({r}.is_group_upload = 1, 0)',
+}
+_ACCESS_COUNTERS = {
+    'access_count': 'COALESCE({r}.access_count, 0)',
+    'cdn_hit_count': 'COALESCE({r}.cdn_hit_count, 0)',
+    'direct_hit_count': 'COALESCE({r}.direct_hit_count, 0)',
+}
+_ALL_COUNTERS = {**_FILE_COUNTERS, **_ACCESS_COUNTERS}
+
+_DAY_EXPR = "date({r}.upload_time, 'unixepoch', 'localtime')"
+
+_reconcile_thread: Optional[threading.Thread] = None
+_reconcile_stop = threading.Event()
+_reconcile_thread_lock = threading.Lock()
+
+
+def _counter_update(counters: Dict[str, str], *, add: Optional[str], sub: Optional[str]) -> str:
+    """生成按行增减计数器的 UPDATE 语句"""
+    cases = []
+    for name, expr in counters.items():
+        delta = ' - '.join(
+            part for part in (
+                expr.format(r=add) if add else '0',
+                expr.format(r=sub) if sub else None,
+            ) if part
+        )
+        cases.append(f"WHEN '{name}' THEN {delta}")
+    names = ', '.join(f"'{name}'" for name in counters)
+    return (
+        f"UPDATE stats_counters SET value = value + CASE name {' '.join(cases)} END "
+        f"WHERE name IN ({names});"
+    )
+
+
+def _daily_add(r: str) -> str:
+    return (
+        f"INSERT INTO stats_daily_uploads (day, uploads, total_size) "
+        f"VALUES ({_DAY_EXPR.format(r=r)}, 1, COALESCE({r}.file_size, 0)) "
+        f"ON CONFLICT(day) DO UPDATE SET uploads = uploads + 1, total_size = total_size + excluded.total_size;"
+    )
+
+
+def _daily_sub(r: str) -> str:
+    return (
+        f"UPDATE stats_daily_uploads SET uploads = uploads - 1, total_size = total_size - COALESCE({r}.file_size, 0) "
+        f"WHERE day = {_DAY_EXPR.format(r=r)};"
+    )
+
+
+def _triggers() -> Dict[str, str]:
+    return {
+        'stats_files_ai': (
+            f"AFTER INSERT ON file_storage BEGIN "
+            f"{_counter_update(_FILE_COUNTERS, add='new', sub=None)} {_daily_add('new')} END"
+        ),
+        'stats_files_ad': (
+            f"AFTER DELETE ON file_storage BEGIN "
+            f"{_counter_update(_FILE_COUNTERS, add=None, sub='old')} {_daily_sub('old')} END"
+        ),
+        'stats_files_au': (
+            f"AFTER UPDATE OF file_size, cdn_cached, cdn_url, is_group_upload ON file_storage BEGIN "
+            f"{_counter_update({k: v for k, v in _FILE_COUNTERS.items() if k != 'total_files'}, add='new', sub='old')} END"
+        ),
+        'stats_files_au_daily': (
+            f"AFTER UPDATE OF upload_time, file_size ON file_storage BEGIN "
+            f"{_daily_sub('old')} {_daily_add('new')} END"
+        ),
+        'stats_access_ai': (
+            f"AFTER INSERT ON file_access_stats BEGIN "
+            f"{_counter_update(_ACCESS_COUNTERS, add='new', sub=None)} END"
+        ),
+        'stats_access_ad': (
+            f"AFTER DELETE ON file_access_stats BEGIN "
+            f"{_counter_update(_ACCESS_COUNTERS, add=None, sub='old')} END"
+        ),
+        'stats_access_au': (
+            f"AFTER UPDATE OF access_count, cdn_hit_count, direct_hit_count ON file_access_stats BEGIN "
+            f"{_counter_update(_ACCESS_COUNTERS, add='new', sub='old')} END"
+        ),
+    }
+
+
+def ensure_stats_counters(cursor, *, recompute: bool = False) -> None:
+    """
+    创建计数表与维护触发器（首次创建时从零重算）
+
+    Args:
+        cursor: 数据库游标（init_database 事务内）
+        recompute: 强制重算（数据迁移后使用）
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'")
+    existed = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_daily_uploads (
+            day TEXT PRIMARY KEY,
+            uploads INTEGER NOT NULL DEFAULT 0,
+            total_size INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for name, body in _triggers().items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+    if not existed or recompute:
+        _recompute(cursor)
+        logger.info("已完成统计计数器汇总")
+
+
+def _recompute(cursor) -> Dict[str, int]:
+    """在当前事务中从零重算全部计数器，返回重算前后有偏差的计数器"""
+    cursor.execute('SELECT name, value FROM stats_counters')
+    before = {row[0]: row[1] for row in cursor.fetchall()}
+
+    # 先写后读：DELETE 取得写锁，重算期间不会有并发写入漏计
+    cursor.execute('DELETE FROM stats_counters')
+    cursor.execute('DELETE FROM stats_daily_uploads')
+    values: Dict[str, int] = {}
+    for table, counters in (('file_storage', _FILE_COUNTERS), ('file_access_stats', _ACCESS_COUNTERS)):
+        selects = ', '.join(
+            f"COALESCE(SUM({expr.format(r=table)}), 0)" for expr in counters.values()
+        )
+        cursor.execute(f'SELECT {selects} FROM {table}')
+        values.update(zip(counters, cursor.fetchone()))
+    cursor.executemany(
+        'INSERT INTO stats_counters (name, value) VALUES (?, ?)',
+        list(values.items()),
+    )
+    cursor.execute(f'''
+        INSERT INTO stats_daily_uploads (day, uploads, total_size)
+        SELECT {_DAY_EXPR.format(r='file_storage')}, COUNT(*), COALESCE(SUM(file_size), 0)
+        FROM file_storage
+        GROUP BY 1
+    ''')
+    return {
+        name: value - before.get(name, 0)
+        for name, value in values.items()
+        if before and value != before.get(name, 0)
+    }
+
+
+def reconcile_stats_counters() -> Dict[str, int]:
+    """
+    从零重算统计计数器
+
+    Returns:
+        有偏差的计数器及其修正量（正常情况下为空）
+    """
+    with get_connection() as conn:
+        drift = _recompute(conn.cursor())
+    if drift:
+        logger.warning(f"统计计数器存在偏差，已修正: {drift}")
+    else:
+        logger.debug("统计计数器重算完成，无偏差")
+    return drift
+
+
+def get_stats_counters() -> Dict[str, int]:
+    """读取全部计数器"""
+    with get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, value FROM stats_counters')
+        counters = {row[0]: int(row[1] or 0) for row in cursor.fetchall()}
+    return {name: counters.get(name, 0) for name in _ALL_COUNTERS}
+
+
+def get_daily_upload_stats(day: Optional[str] = None) -> Dict[str, int]:
+    """
+    读取某天（本地时间，默认今天）的上传数与上传量
+
+    Args:
+        day: 日期（YYYY-MM-DD）
+    """
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    with get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT uploads, total_size FROM stats_daily_uploads WHERE day = ?', (day,))
+        row = cursor.fetchone()
+    return {'uploads': int(row[0]) if row else 0, 'total_size': int(row[1]) if row else 0}
+
+
+# ===================== 定期重算 =====================
+def _reconcile_worker(interval: float) -> None:
+    """定期重算线程"""
+    while not _reconcile_stop.wait(timeout=interval):
+        try:
+            reconcile_stats_counters()
+        except Exception as e:
+            logger.error(f"统计计数器重算失败: {e}")
+
+
+def start_stats_reconciler(interval: float = STATS_RECONCILE_INTERVAL) -> None:
+    """启动定期重算线程"""
+    global _reconcile_thread
+    with _reconcile_thread_lock:
+        if _reconcile_thread is not None and _reconcile_thread.is_alive():
+            return
+        _reconcile_stop.clear()
+        _reconcile_thread = threading.Thread(
+            target=_reconcile_worker, args=(interval,), name='stats-reconciler', daemon=True
+        )
+        _reconcile_thread.start()
+
+
+def stop_stats_reconciler() -> None:
+    """停止定期重算线程"""
+    _reconcile_stop.set()
+    thread = _reconcile_thread
+    if thread is not None and thread.is_alive():
+        thread.join(timeout=5)
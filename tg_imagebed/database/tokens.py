@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any, List
 
 from ..config import logger
 from .connection import get_connection
+from .pagination import cached_count, keyset_condition, next_page_cursor
 
 
 # ===================== 内部辅助 =====================
@@ -218,21 +219,74 @@ def update_token_description(token: str, description: Optional[str]) -> bool:
         return False
 
 
-def update_token_usage(token: str) -> None:
-    """更新 token 使用记录"""
+def update_token_usage(token: str, count: int = 1) -> None:
+    """更新 token 使用记录（count 为本次上传成功的文件数）"""
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE auth_tokens
-                SET upload_count = upload_count + 1,
+                SET upload_count = upload_count + ?,
                     last_used = CURRENT_TIMESTAMP
                 WHERE token = ?
-            ''', (token,))
+            ''', (count, token))
     except Exception as e:
         logger.error(f"更新token使用记录失败: {e}")
 
 
+def reserve_token_uploads(token: str, count: int = 1) -> int:
+    """
+    预占 Token 上传次数（提交上传前调用，上传失败时用 release_token_uploads 归还）
+
+    以 upload_count + n <= upload_limit 的条件 UPDATE 原子扣减，
+    排队中的异步任务也计入已用次数，不会超出上传限制。
+
+    Returns:
+        实际预占的次数（额度不足时只预占剩余部分，0 表示已用完）
+    """
+    # 与 _verify_token_core 一致：未设置上限时视为 999999
+    limit_expr = 'COALESCE(NULLIF(upload_limit, 0), 999999)'
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            wanted = count
+            while wanted > 0:
+                cursor.execute(f'''
+                    UPDATE auth_tokens
+                    SET upload_count = COALESCE(upload_count, 0) + ?,
+                        last_used = CURRENT_TIMESTAMP
+                    WHERE token = ? AND COALESCE(upload_count, 0) + ? <= {limit_expr}
+                ''', (wanted, token, wanted))
+                if cursor.rowcount:
+                    return wanted
+                cursor.execute(
+                    f'SELECT COALESCE(upload_count, 0), {limit_expr} FROM auth_tokens WHERE token = ?',
+                    (token,)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    return 0
+                wanted = min(wanted, int(row[1]) - int(row[0]))
+            return 0
+    except Exception as e:
+        logger.error(f"预占token上传次数失败: {e}")
+        return 0
+
+
+def release_token_uploads(token: str, count: int = 1) -> None:
+    """归还预占但未上传成功的 Token 上传次数"""
+    if count <= 0:
+        return
+    try:
+        with get_connection() as conn:
+            conn.execute(
+                'UPDATE auth_tokens SET upload_count = MAX(0, COALESCE(upload_count, 0) - ?) WHERE token = ?',
+                (count, token)
+            )
+    except Exception as e:
+        logger.error(f"归还token上传次数失败: {e}")
+
+
 def get_token_info(token: str) -> Optional[Dict[str, Any]]:
     """获取 token 详细信息"""
     try:
@@ -264,23 +318,41 @@ def count_tokens_by_ip(ip_address: str) -> int:
         return 0
 
 
-def get_token_uploads(token: str, limit: int = 50, page: int = 1) -> List[Dict[str, Any]]:
-    """获取 token 上传的所有图片"""
+def get_token_uploads(token: str, limit: int = 50, page: int = 1, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    获取 token 上传的所有图片
+
+    Args:
+        token: Token 字符串
+        limit: 每页数量
+        page: 页码（从1开始，未提供 cursor 时使用）
+        cursor: 分页游标（提供时忽略 page）
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
+    where = 'WHERE auth_token = ?'
+    params: List[Any] = [token]
+    offset = (page - 1) * limit
+    if cursor:
+        condition, cursor_params = keyset_condition('created_at', 'encrypted_id', cursor)
+        where += f' AND {condition}'
+        params += cursor_params
+        offset = 0
+
     try:
         with get_connection() as conn:
-            cursor = conn.cursor()
-            offset = (page - 1) * limit
-
-            cursor.execute('''
+            cur = conn.cursor()
+            cur.execute(f'''
                 SELECT encrypted_id, original_filename, file_size, created_at,
                        cdn_cached, cdn_url, mime_type
                 FROM file_storage
-                WHERE auth_token = ?
-                ORDER BY created_at DESC
+                {where}
+                ORDER BY created_at DESC, encrypted_id DESC
                 LIMIT ? OFFSET ?
-            ''', (token, limit, offset))
+            ''', params + [limit, offset])
 
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in cur.fetchall()]
 
     except Exception as e:
         logger.error(f"获取token上传记录失败: {e}")
@@ -722,49 +794,66 @@ def admin_get_token_detail(token_id: int) -> Optional[Dict[str, Any]]:
 def admin_get_token_uploads(
     token_id: int,
     page: int = 1,
-    page_size: int = 50
+    page_size: int = 50,
+    cursor: Optional[str] = None
 ) -> Dict[str, Any]:
-    """按 rowid 获取 Token 上传的图片（分页，含 total）"""
+    """
+    按 rowid 获取 Token 上传的图片（分页，含 total）
+
+    提供 cursor 时按游标翻页（忽略 page），返回值中的 next_cursor 用于获取下一页。
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
     page = max(1, int(page))
     page_size = max(1, min(200, int(page_size)))
     offset = (page - 1) * page_size
+    condition, cursor_params = ('', [])
+    if cursor:
+        condition, cursor_params = keyset_condition('created_at', 'encrypted_id', cursor)
+        condition = f'AND {condition}'
+        offset = 0
 
     try:
         with get_connection() as conn:
-            cursor = conn.cursor()
+            cur = conn.cursor()
 
             # 先查 token 字符串
-            cursor.execute("SELECT token FROM auth_tokens WHERE rowid = ?", (int(token_id),))
-            token_row = cursor.fetchone()
+            cur.execute("SELECT token FROM auth_tokens WHERE rowid = ?", (int(token_id),))
+            token_row = cur.fetchone()
             if not token_row:
-                return {'items': [], 'total': 0, 'page': page, 'page_size': page_size}
+                return {'items': [], 'total': 0, 'page': page, 'page_size': page_size, 'next_cursor': None}
 
             token_str = token_row[0]
 
-            # 查总数
-            cursor.execute(
-                "SELECT COUNT(1) FROM file_storage WHERE auth_token = ?",
-                (token_str,)
-            )
-            total = cursor.fetchone()[0] or 0
+            # 查总数（短时缓存，翻页时不重复 COUNT）
+            def _count() -> int:
+                cur.execute(
+                    "SELECT COUNT(1) FROM file_storage WHERE auth_token = ?",
+                    (token_str,)
+                )
+                return cur.fetchone()[0] or 0
+
+            total = cached_count(('token_uploads', token_str), _count)
 
             # 查分页数据
-            cursor.execute("""
+            cur.execute(f"""
                 SELECT encrypted_id, original_filename, file_size, created_at,
                        cdn_cached, cdn_url, mime_type
                 FROM file_storage
-                WHERE auth_token = ?
-                ORDER BY created_at DESC
+                WHERE auth_token = ? {condition}
+                ORDER BY created_at DESC, encrypted_id DESC
                 LIMIT ? OFFSET ?
-            """, (token_str, page_size, offset))
+            """, [token_str] + cursor_params + [page_size, offset])
 
-            items = [dict(row) for row in cursor.fetchall()]
+            items = [dict(row) for row in cur.fetchall()]
 
             return {
                 'items': items,
                 'total': total,
                 'page': page,
                 'page_size': page_size,
+                'next_cursor': next_page_cursor(items, page_size, 'created_at'),
             }
 
     except Exception as e:
@@ -22,61 +22,25 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from ..config import logger, get_proxy_url
-from ..database import update_cdn_cache_status, get_file_info, get_uncached_files, get_system_setting
-
-
-# CDN 配置缓存（减少数据库查询）
-_CDN_SETTINGS_CACHE = {
-    "ts": 0.0,
-    "cdn_enabled": False,
-    "monitor_enabled": False,
-    "cdn_domain": "",
-    "api_token": "",
-    "zone_id": "",
-    "cache_warming_enabled": False,
-}
+from ..database import update_cdn_cache_status, get_file_info, get_uncached_files, get_settings_snapshot
 
 
 def _get_effective_cdn_settings():
-    """从数据库读取 CDN 设置（带缓存，1秒 TTL）"""
-    now = time.time()
-    if (now - _CDN_SETTINGS_CACHE["ts"]) < 1.0:
+    """从设置快照读取 CDN 设置"""
+    try:
+        settings = get_settings_snapshot()
         return (
-            _CDN_SETTINGS_CACHE["cdn_enabled"],
-            _CDN_SETTINGS_CACHE["monitor_enabled"],
-            _CDN_SETTINGS_CACHE["cdn_domain"],
-            _CDN_SETTINGS_CACHE["api_token"],
-            _CDN_SETTINGS_CACHE["zone_id"],
-            _CDN_SETTINGS_CACHE["cache_warming_enabled"],
+            settings.get_bool("cdn_enabled"),
+            settings.get_bool("cdn_monitor_enabled"),
+            settings.get_str("cloudflare_cdn_domain"),
+            settings.get_str("cloudflare_api_token"),
+            settings.get_str("cloudflare_zone_id"),
+            settings.get_bool("enable_cache_warming"),
         )
-
-    cdn_enabled = False
-    monitor_enabled = False
-    cdn_domain = ""
-    api_token = ""
-    zone_id = ""
-    cache_warming_enabled = False
-    try:
-        cdn_enabled = str(get_system_setting("cdn_enabled") or "0") == "1"
-        monitor_enabled = str(get_system_setting("cdn_monitor_enabled") or "0") == "1"
-        cdn_domain = str(get_system_setting("cloudflare_cdn_domain") or "").strip()
-        api_token = str(get_system_setting("cloudflare_api_token") or "").strip()
-        zone_id = str(get_system_setting("cloudflare_zone_id") or "").strip()
-        cache_warming_enabled = str(get_system_setting("enable_cache_warming") or "0") == "1"
     except Exception as e:
-        # 数据库不可用时使用默认值（全部关闭）
-        logger.debug(f"从数据库读取 CDN 设置失败: {e}")
-
-    _CDN_SETTINGS_CACHE.update({
-        "ts": now,
-        "cdn_enabled": cdn_enabled,
-        "monitor_enabled": monitor_enabled,
-        "cdn_domain": cdn_domain,
-        "api_token": api_token,
-        "zone_id": zone_id,
-        "cache_warming_enabled": cache_warming_enabled,
-    })
-    return cdn_enabled, monitor_enabled, cdn_domain, api_token, zone_id, cache_warming_enabled
+        # 设置不可用时使用默认值（全部关闭）
+        logger.debug(f"读取 CDN 设置失败: {e}")
+        return False, False, "", "", "", False
 
 
 # CDN 监控默认参数（硬编码，不再从环境变量读取）
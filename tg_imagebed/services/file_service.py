@@ -7,16 +7,23 @@
 """
 import time
 import hashlib
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 
-import requests
-
-from ..config import logger
-from ..database import save_file_info, get_file_info, update_file_path_in_db
+from ..config import get_proxy_url, logger
+from ..database import (
+    save_file_info, save_file_infos, get_file_info, update_file_path_in_db, find_file_by_hash,
+)
 from ..utils import encrypt_file_id, get_mime_type
 from .cdn_service import add_to_cdn_monitor
+from .upload_stream import UploadStream
+from ..storage.base import StorageBackend, PutItem, PutResult
 from ..storage.router import get_storage_router
 from ..bot_control import get_effective_bot_token
+from ..telegram_api import get_telegram_client
+
+
+UPLOAD_BATCH_WORKERS = 4    # 批量上传时并行写入后端的线程数
 
 
 def get_fresh_file_path(file_id: str) -> Optional[str]:
@@ -34,10 +41,11 @@ def get_fresh_file_path(file_id: str) -> Optional[str]:
         return None
 
     try:
-        response = requests.get(
-            f"https://api.telegram.org/bot{bot_token}/getFile",
+        response = get_telegram_client(get_proxy_url()).call(
+            bot_token,
+            'getFile',
             params={'file_id': file_id},
-            timeout=10
+            timeout=10,
         )
 
         if response.ok:
@@ -56,7 +64,7 @@ def get_fresh_file_path(file_id: str) -> Optional[str]:
 
 
 def process_upload(
-    file_content: bytes,
+    file_content: Optional[bytes],
     filename: str,
     content_type: str,
     username: str = 'web_user',
@@ -66,12 +74,14 @@ def process_upload(
     group_message_id: Optional[int] = None,
     upload_scene: Optional[str] = None,
     requested_backend: Optional[str] = None,
+    file_stream: Optional[UploadStream] = None,
+    encrypted_id: Optional[str] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     处理文件上传的完整流程
 
     Args:
-        file_content: 文件内容
+        file_content: 文件内容（与 file_stream 二选一）
         filename: 文件名
         content_type: MIME 类型
         username: 用户名
@@ -81,78 +91,84 @@ def process_upload(
         group_message_id: 群组消息 ID
         upload_scene: 上传场景 (guest/token/group/admin)
         requested_backend: 管理员请求的特定后端
+        file_stream: 已完成哈希统计的上传流（大小/哈希不再重复计算，后端流式读取）
+        encrypted_id: 预分配的加密 ID（异步上传任务提交时已返回给客户端）
 
     Returns:
         包含 encrypted_id, url 等信息的字典，失败返回 None
     """
-    file_size = len(file_content)
+    if file_stream is not None:
+        file_size = file_stream.size
+    else:
+        file_content = file_content or b''
+        file_size = len(file_content)
 
     # 规范化 content_type（防止 None 或空字符串导致后端出错）
     if not content_type:
         content_type = get_mime_type(filename)
 
-    # 推断上传场景（可由调用方显式传入 upload_scene 覆盖）
-    scene = (upload_scene or "").strip().lower()
-    if not scene:
-        if is_group_upload:
-            scene = "group"
-        elif auth_token:
-            scene = "token"
-        else:
-            scene = "guest"
-
-    # 计算文件哈希
-    file_hash = hashlib.md5(file_content).hexdigest()
+    scene = _resolve_upload_scene(upload_scene, is_group_upload, auth_token)
 
-    # 构建说明
-    caption = f"{source} | 文件名: {filename} | 大小: {file_size} bytes | 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
+    # 计算内容哈希 SHA-256（流式上传时已在读取过程中计算）
+    if file_stream is not None:
+        file_hash = file_stream.sha256
+    else:
+        file_hash = hashlib.sha256(file_content).hexdigest()
 
-    # 通过存储路由器选择后端并上传
+    # 通过存储路由器选择后端
     router = get_storage_router()
     backend_name = router.resolve_upload_backend(
         scene=scene,
         requested_backend=requested_backend,
         is_admin=(scene == "admin"),
     )
-    backend = router.get_backend(backend_name)
-    put_result = backend.put_bytes(
-        file_content=file_content,
+
+    # 内容去重：目标后端已有相同内容时直接复用存储对象，不再上传
+    file_data = _new_file_data(
         filename=filename,
-        content_type=content_type,
-        file_size=file_size,
-        caption=caption,
-        source=source,
+        file_hash=file_hash,
         username=username,
+        source=source,
+        auth_token=auth_token,
+        is_group_upload=is_group_upload,
+        group_message_id=group_message_id,
     )
+    result = _save_deduplicated(file_data, backend_name, file_size, encrypted_id)
+    if result:
+        return result
+
+    # 构建说明
+    caption = _build_caption(source, filename, file_size)
+
+    backend = router.get_backend(backend_name)
+    if file_stream is not None:
+        put_result = _put_stream(backend, file_stream, filename, content_type, source, username)
+    else:
+        put_result = backend.put_bytes(
+            file_content=file_content,
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            caption=caption,
+            source=source,
+            username=username,
+        )
 
     if not put_result:
         return None
 
-    # 生成加密 ID
-    encrypted_id = encrypt_file_id(put_result.file_id, put_result.file_path)
-
-    # 获取 MIME 类型
-    mime_type = get_mime_type(filename)
+    # 生成加密 ID（未预分配时）
+    encrypted_id = encrypted_id or encrypt_file_id(put_result.file_id, put_result.file_path)
 
     # 保存文件信息
-    file_data = {
+    file_data.update({
         'file_id': put_result.file_id,
         'file_path': put_result.file_path,
-        'upload_time': int(time.time()),
-        'user_id': 0,
-        'username': username,
         'file_size': put_result.file_size,
-        'source': source,
-        'original_filename': filename,
-        'mime_type': mime_type,
-        'file_hash': file_hash,
-        'is_group_upload': is_group_upload,
-        'group_message_id': group_message_id,
-        'auth_token': auth_token,
         'storage_backend': put_result.storage_backend,
         'storage_key': put_result.storage_key,
         'storage_meta': put_result.storage_meta,
-    }
+    })
     save_file_info(encrypted_id, file_data)
 
     # 添加到 CDN 监控
@@ -164,7 +180,255 @@ def process_upload(
         'encrypted_id': encrypted_id,
         'file_size': put_result.file_size,
         'filename': filename,
-        'mime_type': mime_type
+        'mime_type': file_data['mime_type']
+    }
+
+
+def process_upload_batch(
+    files: List[Tuple[UploadStream, str, str]],
+    *,
+    username: str = 'web_user',
+    source: str = 'web_upload',
+    auth_token: Optional[str] = None,
+    upload_scene: Optional[str] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    批量上传：后端写入由线程池并行执行，全部记录在一个事务中保存
+
+    Args:
+        files: (上传流, 文件名, content_type) 列表
+        其余参数同 process_upload
+
+    Returns:
+        与 files 顺序一致的结果列表（失败项为 None）
+    """
+    if not files:
+        return []
+
+    scene = _resolve_upload_scene(upload_scene, False, auth_token)
+    router = get_storage_router()
+    backend_name = router.resolve_upload_backend(
+        scene=scene,
+        requested_backend=None,
+        is_admin=(scene == "admin"),
+    )
+    backend = router.get_backend(backend_name)
+
+    # 按内容哈希分组：库中已有的直接复用，同批次重复的只上传一次
+    sources: Dict[str, Optional[Dict[str, Any]]] = {}
+    reused = set()
+    pending: Dict[str, int] = {}
+    for index, (upload, _filename, _content_type) in enumerate(files):
+        file_hash = upload.sha256
+        if file_hash in sources or file_hash in pending:
+            continue
+        try:
+            existing = find_file_by_hash(file_hash, backend_name, upload.size)
+        except Exception as e:
+            logger.warning(f"去重查询失败，按新文件上传: {e}")
+            existing = None
+        if existing:
+            sources[file_hash] = existing
+            reused.add(file_hash)
+        else:
+            pending[file_hash] = index
+
+    def _put_group(group: List[Tuple[str, int]]) -> List[Optional[PutResult]]:
+        items = []
+        for _file_hash, index in group:
+            upload, filename, content_type = files[index]
+            items.append(PutItem(
+                stream=upload.open(),
+                filename=filename,
+                content_type=content_type or get_mime_type(filename),
+                file_size=upload.size,
+                caption=_build_caption(source, filename, upload.size),
+            ))
+        return backend.put_many(items=items, source=source, username=username)
+
+    if pending:
+        # 支持批量接口的后端（如 Telegram sendMediaGroup）按组提交，各组并行执行
+        group_size = max(1, backend.max_batch_put)
+        entries = list(pending.items())
+        groups = [entries[i:i + group_size] for i in range(0, len(entries), group_size)]
+        workers = min(UPLOAD_BATCH_WORKERS, len(groups))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload-batch') as pool:
+            futures = [(group, pool.submit(_put_group, group)) for group in groups]
+        put_results: Dict[str, Optional[PutResult]] = {}
+        for group, future in futures:
+            try:
+                group_results = future.result()
+            except Exception as e:
+                logger.error(f"批量上传写入后端失败: {e}")
+                group_results = [None] * len(group)
+            for (file_hash, _index), put_result in zip(group, group_results):
+                put_results[file_hash] = put_result
+        for file_hash, put_result in put_results.items():
+            sources[file_hash] = {
+                'file_id': put_result.file_id,
+                'file_path': put_result.file_path,
+                'file_size': put_result.file_size,
+                'storage_backend': put_result.storage_backend,
+                'storage_key': put_result.storage_key,
+                'storage_meta': put_result.storage_meta,
+            } if put_result else None
+
+    # 单个事务写入全部记录
+    records = []
+    positions = []
+    for index, (upload, filename, _content_type) in enumerate(files):
+        storage = sources.get(upload.sha256)
+        if not storage:
+            continue
+        record = _new_file_data(
+            filename=filename,
+            file_hash=upload.sha256,
+            username=username,
+            source=source,
+            auth_token=auth_token,
+        )
+        record.update({key: storage[key] for key in (
+            'file_id', 'file_path', 'file_size', 'storage_backend', 'storage_key', 'storage_meta',
+        )})
+        encrypted_id = encrypt_file_id(storage['file_id'], storage['file_path'])
+        records.append((encrypted_id, record, upload.sha256 in reused))
+        positions.append(index)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+    if not records:
+        return results
+    try:
+        saved = save_file_infos(records)
+    except Exception as e:
+        logger.error(f"批量保存文件信息失败: {e}")
+        return results
+
+    for (encrypted_id, record, _reused), index, ok in zip(records, positions, saved):
+        if not ok:
+            continue
+        add_to_cdn_monitor(encrypted_id, record['upload_time'])
+        results[index] = {
+            'encrypted_id': encrypted_id,
+            'file_size': record['file_size'],
+            'filename': record['original_filename'],
+            'mime_type': record['mime_type']
+        }
+
+    logger.info(
+        f"批量上传完成: {sum(1 for r in results if r)}/{len(files)} 个文件，"
+        f"新上传 {len(pending)} 个对象"
+    )
+    return results
+
+
+def _resolve_upload_scene(upload_scene: Optional[str], is_group_upload: bool, auth_token: Optional[str]) -> str:
+    """推断上传场景（可由调用方显式传入 upload_scene 覆盖）"""
+    scene = (upload_scene or "").strip().lower()
+    if scene:
+        return scene
+    if is_group_upload:
+        return "group"
+    if auth_token:
+        return "token"
+    return "guest"
+
+
+def _new_file_data(
+    *,
+    filename: str,
+    file_hash: str,
+    username: str,
+    source: str,
+    auth_token: Optional[str],
+    is_group_upload: bool = False,
+    group_message_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """构建文件记录中与存储对象无关的字段"""
+    return {
+        'upload_time': int(time.time()),
+        'user_id': 0,
+        'username': username,
+        'source': source,
+        'original_filename': filename,
+        'mime_type': get_mime_type(filename),
+        'file_hash': file_hash,
+        'is_group_upload': is_group_upload,
+        'group_message_id': group_message_id,
+        'auth_token': auth_token,
+    }
+
+
+def _build_caption(source: str, filename: str, file_size: int) -> str:
+    """构建存储说明"""
+    return f"{source} | 文件名: {filename} | 大小: {file_size} bytes | 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+def _put_stream(
+    backend: StorageBackend,
+    upload: UploadStream,
+    filename: str,
+    content_type: str,
+    source: str,
+    username: str,
+) -> Optional[PutResult]:
+    """以流方式写入存储后端"""
+    return backend.put_stream(
+        stream=upload.open(),
+        filename=filename,
+        content_type=content_type,
+        file_size=upload.size,
+        caption=_build_caption(source, filename, upload.size),
+        source=source,
+        username=username,
+    )
+
+
+def _save_deduplicated(
+    file_data: Dict[str, Any],
+    backend_name: str,
+    file_size: int,
+    encrypted_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    按内容哈希复用已有存储对象，新建一条引用同一对象的记录
+
+    Returns:
+        命中时返回上传结果字典，未命中（或来源记录已被并发删除）返回 None
+    """
+    try:
+        existing = find_file_by_hash(file_data['file_hash'], backend_name, file_size)
+    except Exception as e:
+        logger.warning(f"去重查询失败，按新文件上传: {e}")
+        return None
+    if not existing:
+        return None
+
+    encrypted_id = encrypted_id or encrypt_file_id(existing['file_id'], existing['file_path'])
+    record = dict(file_data)
+    record.update({
+        'file_id': existing['file_id'],
+        'file_path': existing['file_path'],
+        'file_size': existing['file_size'],
+        'storage_backend': existing['storage_backend'],
+        'storage_key': existing['storage_key'],
+        'storage_meta': existing['storage_meta'],
+    })
+    # 仅在存储对象仍有引用时写入，避免与删除最后一个引用的操作竞争
+    if not save_file_info(encrypted_id, record, require_existing_object=True):
+        return None
+
+    add_to_cdn_monitor(encrypted_id, record['upload_time'])
+
+    logger.info(
+        f"文件内容重复，复用存储对象: {record['original_filename']} -> {encrypted_id} "
+        f"({existing['storage_backend']}:{existing['storage_key']})"
+    )
+
+    return {
+        'encrypted_id': encrypted_id,
+        'file_size': existing['file_size'],
+        'filename': record['original_filename'],
+        'mime_type': record['mime_type']
     }
 
 
@@ -198,7 +462,7 @@ def record_existing_telegram_file(
     if not content_type:
         content_type = get_mime_type(filename)
 
-    file_hash = hashlib.md5(file_content or b'').hexdigest()
+    file_hash = hashlib.sha256(file_content or b'').hexdigest()
     encrypted_id = encrypt_file_id(file_id, file_path)
     mime_type = get_mime_type(filename)
     upload_time = int(time.time())
@@ -243,5 +507,6 @@ def record_existing_telegram_file(
 __all__ = [
     'get_fresh_file_path',
     'process_upload',
+    'process_upload_batch',
     'record_existing_telegram_file',
 ]
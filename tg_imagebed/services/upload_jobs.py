@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传任务队列模块
+
+API 完成校验并把文件写入自有临时文件后入队，立即返回任务 ID 与预分配的 encrypted_id；
+由有界的工作线程池调用存储后端，HTTP 线程不再等待 Telegram / S3 等后端的延迟。
+任务状态只保存在内存中（进程重启后丢失），结束后保留 UPLOAD_JOB_TTL_SECONDS 供查询。
+"""
+import time
+import queue
+import secrets
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import logger
+from ..utils import encrypt_file_id
+from .file_service import process_upload
+from .upload_stream import UploadStream
+
+
+# 上传任务默认参数
+UPLOAD_JOB_WORKERS = 4              # 工作线程数
+UPLOAD_JOB_QUEUE_SIZE = 100         # 排队任务上限，超过时拒绝新任务
+UPLOAD_JOB_TTL_SECONDS = 3600       # 已结束任务的保留时间
+UPLOAD_JOB_PRUNE_INTERVAL = 60.0    # 清理过期任务的最小间隔
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class UploadQueueFullError(RuntimeError):
+    """上传队列已满"""
+
+
+class UploadJob:
+    """上传任务"""
+
+    def __init__(
+        self,
+        job_id: str,
+        encrypted_id: str,
+        upload: UploadStream,
+        upload_kwargs: Dict[str, Any],
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_failure: Optional[Callable[[], None]] = None,
+    ):
+        self.job_id = job_id
+        self.encrypted_id = encrypted_id
+        self.filename = upload_kwargs.get('filename', '')
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._upload: Optional[UploadStream] = upload
+        self._upload_kwargs = upload_kwargs
+        self._on_success = on_success
+        self._on_failure = on_failure
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态（供 API 返回）"""
+        with _jobs_lock:
+            data = {
+                'job_id': self.job_id,
+                'status': self.status,
+                'encrypted_id': self.encrypted_id,
+                'filename': self.filename,
+                'created_at': int(self.created_at),
+                'finished_at': int(self.finished_at) if self.finished_at else None,
+            }
+            if self.result is not None:
+                data['file_size'] = self.result.get('file_size', 0)
+            if self.error:
+                data['error'] = self.error
+        return data
+
+
+_jobs: Dict[str, UploadJob] = {}
+_jobs_lock = threading.Lock()
+_jobs_last_prune = 0.0
+_job_queue: "queue.Queue[Optional[UploadJob]]" = queue.Queue(maxsize=UPLOAD_JOB_QUEUE_SIZE)
+_job_stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+def _ensure_workers() -> None:
+    """按需启动工作线程（首次提交任务时）"""
+    with _workers_lock:
+        alive = [t for t in _workers if t.is_alive()]
+        for i in range(len(alive), UPLOAD_JOB_WORKERS):
+            t = threading.Thread(target=_upload_job_worker, name=f'upload-job-{i}', daemon=True)
+            t.start()
+            alive.append(t)
+        _workers[:] = alive
+
+
+def _upload_job_worker() -> None:
+    """工作线程：依次执行队列中的上传任务"""
+    while True:
+        job = _job_queue.get()
+        if job is None:
+            break
+        _run_job(job)
+
+
+def _run_job(job: UploadJob) -> None:
+    """执行单个上传任务"""
+    with _jobs_lock:
+        job.status = JOB_RUNNING
+
+    upload = job._upload
+    result = None
+    error = None
+    try:
+        result = process_upload(
+            file_content=None,
+            file_stream=upload,
+            encrypted_id=job.encrypted_id,
+            **job._upload_kwargs,
+        )
+        if not result:
+            error = '上传到存储后端失败'
+    except Exception as e:
+        logger.error(f"上传任务执行失败 {job.job_id}: {e}")
+        error = '上传失败，请稍后重试'
+    finally:
+        if upload is not None:
+            upload.close()
+        job._upload = None
+
+    callback = job._on_failure if error else job._on_success
+    if callback:
+        try:
+            callback() if error else callback(result)
+        except Exception as e:
+            logger.warning(f"上传任务回调失败 {job.job_id}: {e}")
+
+    with _jobs_lock:
+        job.result = result
+        job.error = error
+        job.status = JOB_FAILED if error else JOB_DONE
+        job.finished_at = time.time()
+        _job_stats['failed' if error else 'completed'] += 1
+
+    if error:
+        logger.warning(f"上传任务失败: {job.filename} ({job.job_id})")
+    else:
+        logger.info(f"上传任务完成: {job.filename} -> {job.encrypted_id}")
+
+
+def _prune_jobs(now: float) -> None:
+    """清理过期的已结束任务（需持有 _jobs_lock）"""
+    global _jobs_last_prune
+    if now - _jobs_last_prune < UPLOAD_JOB_PRUNE_INTERVAL:
+        return
+    _jobs_last_prune = now
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at and now - job.finished_at > UPLOAD_JOB_TTL_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def submit_upload_job(
+    upload: UploadStream,
+    *,
+    on_success: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_failure: Optional[Callable[[], None]] = None,
+    **upload_kwargs: Any,
+) -> UploadJob:
+    """
+    提交上传任务
+
+    Args:
+        upload: 上传流（须为自有临时文件，提交成功后由任务负责关闭）
+        on_success: 上传成功后的回调（如更新 Token 使用次数）
+        on_failure: 上传失败后的回调（如归还预占的上传额度）
+        **upload_kwargs: 传给 process_upload 的参数（filename、content_type、username 等）
+
+    Returns:
+        UploadJob
+
+    Raises:
+        UploadQueueFullError: 队列已满（upload 仍由调用方关闭）
+    """
+    _ensure_workers()
+
+    job_id = secrets.token_urlsafe(16)
+    encrypted_id = encrypt_file_id(job_id, upload_kwargs.get('filename', ''))
+    job = UploadJob(job_id, encrypted_id, upload, upload_kwargs, on_success, on_failure)
+
+    with _jobs_lock:
+        _prune_jobs(job.created_at)
+        _jobs[job_id] = job
+    try:
+        _job_queue.put_nowait(job)
+    except queue.Full:
+        with _jobs_lock:
+            _jobs.pop(job_id, None)
+            _job_stats['rejected'] += 1
+        job._upload = None
+        raise UploadQueueFullError('upload queue is full')
+
+    with _jobs_lock:
+        _job_stats['submitted'] += 1
+    return job
+
+
+def get_upload_job(job_id: str) -> Optional[UploadJob]:
+    """按 ID 获取任务"""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def get_upload_job_stats() -> Dict[str, int]:
+    """上传任务统计（用于监控）"""
+    with _jobs_lock:
+        stats = dict(_job_stats)
+        stats['tracked'] = len(_jobs)
+    stats['queued'] = _job_queue.qsize()
+    with _workers_lock:
+        stats['workers'] = sum(1 for t in _workers if t.is_alive())
+    return stats
+
+
+def stop_upload_workers(timeout: float = 10.0) -> None:
+    """停止工作线程（已在执行的任务会先完成，最多等待 timeout 秒）"""
+    with _workers_lock:
+        workers = [t for t in _workers if t.is_alive()]
+        _workers.clear()
+    if not workers:
+        return
+
+    logger.info('正在停止上传任务线程...')
+    for _ in workers:
+        try:
+            _job_queue.put(None, timeout=1.0)
+        except queue.Full:
+            break
+    deadline = time.time() + timeout
+    for t in workers:
+        t.join(timeout=max(0.0, deadline - time.time()))
+
+
+__all__ = [
+    'UploadJob', 'UploadQueueFullError',
+    'JOB_QUEUED', 'JOB_RUNNING', 'JOB_DONE', 'JOB_FAILED',
+    'submit_upload_job', 'get_upload_job', 'get_upload_job_stats', 'stop_upload_workers',
+]
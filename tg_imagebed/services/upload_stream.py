@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传流处理模块
+
+一次顺序读取完成：大小统计 + 哈希计算 + 文件头嗅探，之后可从头重新读取交给存储后端。
+- 可 seek 的输入（Werkzeug 上传文件，超过 500KB 时已落盘）原地读取，不再复制
+- 不可 seek 的输入（或需要脱离请求生命周期时）边读边写入 SpooledTemporaryFile，超过阈值自动落盘
+"""
+import hashlib
+import tempfile
+from typing import BinaryIO, Optional
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SPOOL_THRESHOLD = 1024 * 1024    # 内存缓冲上限，超过后落盘
+UPLOAD_HEAD_BYTES = 64                  # 魔数嗅探所需的文件头长度
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过大小限制"""
+
+
+class UploadStream:
+    """已完成哈希与大小统计的上传内容（可重复读取）"""
+
+    def __init__(self, file: BinaryIO, *, size: int, sha256: str, head: bytes, owned: bool):
+        self._file = file
+        self._owned = owned
+        self.size = size
+        self.sha256 = sha256
+        self.head = head
+
+    @classmethod
+    def from_stream(
+        cls,
+        stream: BinaryIO,
+        *,
+        max_size: Optional[int] = None,
+        spool_threshold: int = UPLOAD_SPOOL_THRESHOLD,
+        detached: bool = False,
+    ) -> 'UploadStream':
+        """
+        读取上传流
+
+        Args:
+            stream: 输入流
+            max_size: 最大字节数（超过时抛出 UploadTooLargeError）
+            spool_threshold: 临时文件的内存缓冲上限
+            detached: 始终复制到自有临时文件（请求结束后仍需读取时使用，如异步上传）
+
+        Returns:
+            UploadStream
+        """
+        seekable = False
+        try:
+            seekable = stream.seekable()
+        except Exception:
+            seekable = False
+
+        if seekable and not detached:
+            stream.seek(0)
+            target = stream
+            spool = None
+        else:
+            spool = tempfile.SpooledTemporaryFile(max_size=spool_threshold, prefix='upload_')
+            target = spool
+
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        try:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(f'upload exceeds {max_size} bytes')
+                if len(head) < UPLOAD_HEAD_BYTES:
+                    head += chunk[:UPLOAD_HEAD_BYTES - len(head)]
+                digest.update(chunk)
+                if spool is not None:
+                    spool.write(chunk)
+        except Exception:
+            if spool is not None:
+                spool.close()
+            raise
+
+        target.seek(0)
+        return cls(target, size=size, sha256=digest.hexdigest(), head=head, owned=spool is not None)
+
+    def open(self) -> BinaryIO:
+        """回到开头并返回底层文件对象"""
+        self._file.seek(0)
+        return self._file
+
+    def close(self) -> None:
+        """释放自行创建的临时文件"""
+        if self._owned:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+
+    def __enter__(self) -> 'UploadStream':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -7,46 +7,18 @@
 """
 from __future__ import annotations
 
+import io
 import os
 import uuid
 import time
+import shutil
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Tuple
+from typing import Any, BinaryIO, Dict, Optional
 
-from ..base import StorageBackend, PutResult, DownloadResult
+from ..base import StorageBackend, PutResult, DownloadResult, FileBody, parse_range
 from ...config import logger
 
 
-def _parse_range(range_header: str, total_size: int) -> Optional[Tuple[int, int]]:
-    """解析 HTTP Range 头"""
-    if not range_header:
-        return None
-    if not range_header.startswith('bytes='):
-        return None
-    spec = range_header[len('bytes='):].strip()
-    if ',' in spec:
-        return None
-    if '-' not in spec:
-        return None
-    start_s, end_s = (spec.split('-', 1) + [''])[:2]
-    try:
-        if start_s == '':
-            # suffix: bytes=-N
-            length = int(end_s)
-            if length <= 0:
-                return None
-            start = max(0, total_size - length)
-            end = total_size - 1
-            return (start, end)
-        start = int(start_s)
-        end = int(end_s) if end_s != '' else total_size - 1
-        if start < 0 or end < start:
-            return None
-        return (start, min(end, total_size - 1))
-    except Exception:
-        return None
-
-
 class LocalBackend(StorageBackend):
     """本地文件系统存储后端"""
 
@@ -83,6 +55,29 @@ class LocalBackend(StorageBackend):
         username: str,
     ) -> Optional[PutResult]:
         """上传文件到本地"""
+        return self.put_stream(
+            stream=io.BytesIO(file_content),
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            caption=caption,
+            source=source,
+            username=username,
+        )
+
+    def put_stream(
+        self,
+        *,
+        stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        caption: str,
+        source: str,
+        username: str,
+    ) -> Optional[PutResult]:
+        """流式写入本地文件（先写临时文件再原子替换）"""
+        tmp_path: Optional[Path] = None
         try:
             key = self._generate_key(filename)
             path = (self._root / key).resolve()
@@ -96,7 +91,11 @@ class LocalBackend(StorageBackend):
             path.parent.mkdir(parents=True, exist_ok=True)
 
             # 写入文件
-            path.write_bytes(file_content)
+            tmp_path = path.with_name(path.name + '.part')
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(stream, f, 1024 * 1024)
+            os.replace(tmp_path, path)
+            tmp_path = None
 
             logger.info(f"本地存储上传成功: {key} ({file_size} bytes)")
 
@@ -115,6 +114,12 @@ class LocalBackend(StorageBackend):
         except Exception as e:
             logger.error(f"本地存储上传失败: {e}")
             return None
+        finally:
+            if tmp_path is not None:
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
 
     def download(
         self,
@@ -161,52 +166,39 @@ class LocalBackend(StorageBackend):
         content_type = file_info.get('mime_type') or 'application/octet-stream'
 
         # 解析 Range 头
-        r = _parse_range(range_header or '', total) if range_header else None
-
-        if not r:
-            # 完整文件
-            def body() -> Iterable[bytes]:
-                with open(path, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)
-                        if not chunk:
-                            break
-                        yield chunk
+        r = parse_range(range_header or '', total) if range_header else None
+
+        if r:
+            start, end = r
+        else:
+            start, end = 0, total - 1
+        length = max(0, end - start + 1)
 
+        # 交给 FileBody，由 WSGI 服务器的 file_wrapper 直接发送
+        try:
+            f = open(path, 'rb')
+        except OSError as e:
+            logger.error(f"本地文件打开失败: {key}: {e}")
             return DownloadResult(
-                status_code=200,
-                content_type=content_type,
-                headers={
-                    'Content-Length': str(total),
-                    'Accept-Ranges': 'bytes',
-                },
-                body=body(),
+                status_code=404,
+                content_type='text/plain',
+                headers={},
+                body=[b'not found']
             )
 
-        # 部分内容 (206)
-        start, end = r
-        length = end - start + 1
-
-        def body() -> Iterable[bytes]:
-            with open(path, 'rb') as f:
-                f.seek(start, os.SEEK_SET)
-                remaining = length
-                while remaining > 0:
-                    chunk = f.read(min(8192, remaining))
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
+        headers = {
+            'Content-Length': str(length),
+            'Accept-Ranges': 'bytes',
+        }
+        if r:
+            # 部分内容 (206)
+            headers['Content-Range'] = f'bytes {start}-{end}/{total}'
 
         return DownloadResult(
-            status_code=206,
+            status_code=206 if r else 200,
             content_type=content_type,
-            headers={
-                'Content-Length': str(length),
-                'Content-Range': f'bytes {start}-{end}/{total}',
-                'Accept-Ranges': 'bytes',
-            },
-            body=body(),
+            headers=headers,
+            body=FileBody(f, start, length),
         )
 
     def delete(self, *, storage_key: str) -> bool:
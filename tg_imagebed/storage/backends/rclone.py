@@ -3,23 +3,44 @@
 """
 rclone 存储后端
 
-通过 rclone CLI 支持各种网盘存储（OneDrive、Google Drive、Dropbox 等）。
+通过 rclone 支持各种网盘存储（OneDrive、Google Drive、Dropbox 等）。
+
+可选常驻模式：后端启动并监管一个只监听 127.0.0.1 的 `rclone rcd --rc-serve` 进程，
+下载（HTTP GET + Range）、上传（operations/uploadfile）、删除（operations/deletefile）
+经连接池发送到该进程，避免每次请求都启动 rclone、解析配置并重新认证；
+守护进程不可用时回退到 CLI。
 """
 from __future__ import annotations
 
+import io
 import json
 import os
+import secrets
+import shutil
+import socket
 import subprocess
 import tempfile
+import threading
 import time
 import uuid
+import weakref
 from pathlib import PurePosixPath
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from ..base import StorageBackend, PutResult, DownloadResult
 from ...config import logger
 
 
+# 常驻守护进程默认参数
+DEFAULT_DAEMON_STARTUP_TIMEOUT = 15     # 等待守护进程就绪的时间（秒）
+DEFAULT_DAEMON_RESTART_BACKOFF = 30     # 启动失败后多久再尝试（期间使用 CLI）
+DAEMON_CHUNK_SIZE = 64 * 1024
+
+
 def _is_not_found(stderr_text: str) -> bool:
     """检查错误是否为'文件不存在'"""
     s = (stderr_text or "").lower()
@@ -79,6 +100,140 @@ def _parse_http_range(range_header: str) -> Optional[Tuple[int, Optional[int]]]:
         return None
 
 
+def _free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _terminate_process(holder: List[Optional[subprocess.Popen]]) -> None:
+    """结束守护进程（后端实例被回收或解释器退出时调用）"""
+    proc = holder[0]
+    holder[0] = None
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        proc.terminate()
+        proc.wait(timeout=5)
+    except Exception:
+        try:
+            proc.kill()
+        except Exception:
+            pass
+
+
+class _RcloneDaemon:
+    """受监管的 rclone rcd 进程（随机端口 + 随机凭据，仅监听 127.0.0.1）"""
+
+    def __init__(self, *, name: str, base_cmd: List[str], startup_timeout: float, restart_backoff: float):
+        self._name = name
+        self._base_cmd = base_cmd
+        self._startup_timeout = startup_timeout
+        self._restart_backoff = restart_backoff
+        self._user = "imagebed"
+        self._password = secrets.token_urlsafe(24)
+        self._url: Optional[str] = None
+        self._next_start = 0.0
+        self._starting = False
+        self._generation = 0  # stop() 后递增，使仍在进行的启动作废
+        self._lock = threading.Lock()
+        self._proc_holder: List[Optional[subprocess.Popen]] = [None]
+        self._finalizer = weakref.finalize(self, _terminate_process, self._proc_holder)
+
+        self.session = requests.Session()
+        self.session.trust_env = False  # 本地连接不走代理
+        self.session.auth = (self._user, self._password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self.session.mount("http://", adapter)
+
+    def url(self) -> Optional[str]:
+        """
+        返回守护进程地址
+
+        进程未运行时在后台线程中（重新）启动，启动期间及失败后的退避期内返回 None，
+        由调用方使用 CLI；启动可能耗时 startup_timeout，不能阻塞持锁的请求线程。
+        """
+        with self._lock:
+            proc = self._proc_holder[0]
+            if proc is not None and proc.poll() is None:
+                return self._url
+            if proc is not None:
+                logger.warning(f"rclone 守护进程已退出 ({self._name}): code={proc.returncode}")
+                self._proc_holder[0] = None
+                self._url = None
+            if self._starting or time.monotonic() < self._next_start:
+                return None
+            self._starting = True
+            generation = self._generation
+        threading.Thread(
+            target=self._start, args=(generation,), name=f"rclone-rcd-{self._name}", daemon=True
+        ).start()
+        return None
+
+    def _start(self, generation: int) -> None:
+        proc, url = None, None
+        try:
+            proc, url = self._spawn()
+        finally:
+            with self._lock:
+                self._starting = False
+                if proc is None:
+                    self._next_start = time.monotonic() + self._restart_backoff
+                elif generation != self._generation:
+                    _terminate_process([proc])
+                else:
+                    self._proc_holder[0] = proc
+                    self._url = url
+                    logger.info(f"rclone 守护进程已启动 ({self._name}): {url} pid={proc.pid}")
+
+    def _spawn(self) -> Tuple[Optional[subprocess.Popen], Optional[str]]:
+        """启动 rcd 并等待就绪（不持锁）；失败返回 (None, None)"""
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        args = self._base_cmd + [
+            "rcd",
+            "--rc-addr", f"127.0.0.1:{port}",
+            "--rc-user", self._user,
+            "--rc-serve",
+        ]
+        # 密码经环境变量传入：命令行参数对本机所有用户可见（/proc/<pid>/cmdline），
+        # 而该守护进程可通过 config/dump 读出所有远端的凭据
+        env = {**os.environ, "RCLONE_RC_PASS": self._password}
+        try:
+            proc = subprocess.Popen(
+                args,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except FileNotFoundError:
+            logger.error(f"rclone 守护进程启动失败 ({self._name}): rclone binary not found")
+            return None, None
+
+        deadline = time.monotonic() + self._startup_timeout
+        while time.monotonic() < deadline and proc.poll() is None:
+            try:
+                resp = self.session.post(f"{url}/rc/noop", json={}, timeout=1)
+                if resp.ok:
+                    return proc, url
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+
+        _terminate_process([proc])
+        logger.error(f"rclone 守护进程未能就绪 ({self._name})，暂时使用 CLI")
+        return None, None
+
+    def stop(self) -> None:
+        """停止守护进程"""
+        with self._lock:
+            self._generation += 1
+            _terminate_process(self._proc_holder)
+            self._url = None
+
+
 class RcloneBackend(StorageBackend):
     """rclone 存储后端"""
 
@@ -93,6 +248,7 @@ class RcloneBackend(StorageBackend):
         cli_flags: Optional[List[str]] = None,
         upload: Optional[Dict[str, Any]] = None,
         download: Optional[Dict[str, Any]] = None,
+        daemon: Optional[Dict[str, Any]] = None,
     ):
         """
         初始化 rclone 存储后端
@@ -106,6 +262,7 @@ class RcloneBackend(StorageBackend):
             cli_flags: 额外的 rclone 命令行参数
             upload: 上传配置
             download: 下载配置
+            daemon: 常驻守护进程配置（enabled、startup_timeout_seconds、restart_backoff_seconds）
         """
         self.name = name
         self._rclone_bin = (rclone_bin or "rclone").strip()
@@ -127,6 +284,16 @@ class RcloneBackend(StorageBackend):
         if not self._remote:
             raise ValueError("rclone backend requires 'remote'")
 
+        daemon_cfg = daemon or {}
+        self._daemon: Optional[_RcloneDaemon] = None
+        if bool(daemon_cfg.get("enabled", False)):
+            self._daemon = _RcloneDaemon(
+                name=name,
+                base_cmd=self._base_cmd(),
+                startup_timeout=float(daemon_cfg.get("startup_timeout_seconds", DEFAULT_DAEMON_STARTUP_TIMEOUT)),
+                restart_backoff=float(daemon_cfg.get("restart_backoff_seconds", DEFAULT_DAEMON_RESTART_BACKOFF)),
+            )
+
         logger.info(f"rclone 存储后端初始化: {self._remote}:{self._base_path}")
 
     def _base_cmd(self) -> List[str]:
@@ -142,6 +309,102 @@ class RcloneBackend(StorageBackend):
         rel = _safe_join_posix(self._base_path, key)
         return f"{self._remote}:{rel}"
 
+    def _relative_path(self, key: str) -> str:
+        """remote 内的相对路径"""
+        return _safe_join_posix(self._base_path, key)
+
+    def _put_via_daemon(self, url: str, stream: BinaryIO, key: str, content_type: str) -> bool:
+        """通过守护进程上传（multipart 请求体按块从文件流读取，不整体载入内存）"""
+        directory, _, basename = self._relative_path(key).rpartition("/")
+        if any(c in basename for c in '"\r\n'):
+            return False
+        boundary = uuid.uuid4().hex
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{basename}"\r\n'
+            f"Content-Type: {content_type or 'application/octet-stream'}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+
+        def body() -> Iterator[bytes]:
+            yield head
+            while True:
+                chunk = stream.read(DAEMON_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            yield tail
+
+        try:
+            resp = self._daemon.session.post(
+                f"{url}/operations/uploadfile",
+                params={"fs": f"{self._remote}:", "remote": directory},
+                data=body(),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                timeout=self._upload_timeout,
+            )
+        except requests.RequestException as e:
+            logger.warning(f"rclone 守护进程上传请求失败: {e}")
+            return False
+        if resp.ok:
+            return True
+        logger.error(f"rclone 守护进程上传失败: HTTP {resp.status_code} {resp.text[:200]}")
+        return False
+
+    def _download_via_daemon(
+        self,
+        url: str,
+        key: str,
+        range_header: Optional[str],
+        content_type: str,
+    ) -> Optional[DownloadResult]:
+        """通过守护进程（--rc-serve）下载；连接失败或异常状态返回 None，由调用方回退到 CLI"""
+        object_url = f"{url}/[{quote(self._remote, safe='')}:]/{quote(self._relative_path(key))}"
+        headers: Dict[str, str] = {}
+        if range_header and self._enable_range:
+            headers["Range"] = range_header
+        try:
+            resp = self._daemon.session.get(
+                object_url, headers=headers, stream=True, timeout=(5, self._download_timeout)
+            )
+        except requests.RequestException as e:
+            logger.warning(f"rclone 守护进程下载请求失败: {e}")
+            return None
+
+        if resp.status_code == 404:
+            resp.close()
+            return DownloadResult(
+                status_code=404,
+                content_type="text/plain",
+                headers={},
+                body=[b"not found"]
+            )
+        if resp.status_code not in (200, 206):
+            logger.warning(f"rclone 守护进程下载失败: HTTP {resp.status_code}")
+            resp.close()
+            return None
+
+        def body() -> Iterable[bytes]:
+            try:
+                for chunk in resp.iter_content(chunk_size=DAEMON_CHUNK_SIZE):
+                    if chunk:
+                        yield chunk
+            finally:
+                resp.close()
+
+        out_headers: Dict[str, str] = {"Accept-Ranges": "bytes"}
+        if "content-length" in resp.headers:
+            out_headers["Content-Length"] = resp.headers["content-length"]
+        if "content-range" in resp.headers:
+            out_headers["Content-Range"] = resp.headers["content-range"]
+
+        return DownloadResult(
+            status_code=resp.status_code,
+            content_type=content_type,
+            headers=out_headers,
+            body=body(),
+        )
+
     def _generate_key(self, filename: str) -> str:
         """生成存储 key"""
         ext = os.path.splitext(filename or "")[1]
@@ -197,6 +460,28 @@ class RcloneBackend(StorageBackend):
         username: str,
     ) -> Optional[PutResult]:
         """上传文件到 rclone remote"""
+        return self.put_stream(
+            stream=io.BytesIO(file_content),
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            caption=caption,
+            source=source,
+            username=username,
+        )
+
+    def put_stream(
+        self,
+        *,
+        stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        caption: str,
+        source: str,
+        username: str,
+    ) -> Optional[PutResult]:
+        """流式上传文件到 rclone remote（大文件分块写入临时文件，小文件经 stdin 传入）"""
         key = self._generate_key(filename)
         obj = self._object_path(key)
 
@@ -206,6 +491,14 @@ class RcloneBackend(StorageBackend):
         last_err = ""
         for attempt in range(max(1, self._retries) + 1):
             try:
+                stream.seek(0)
+                daemon_url = self._daemon.url() if self._daemon is not None else None
+                if daemon_url:
+                    if self._put_via_daemon(daemon_url, stream, key, content_type):
+                        logger.info(f"rclone 存储上传成功（守护进程）: {key}")
+                        return self._put_result(key, file_size, content_type)
+                    stream.seek(0)
+
                 if use_spool:
                     # 大文件：先写临时文件，再用 copyto
                     with tempfile.NamedTemporaryFile(
@@ -214,7 +507,7 @@ class RcloneBackend(StorageBackend):
                         delete=False
                     ) as f:
                         tmp_path = f.name
-                        f.write(file_content)
+                        shutil.copyfileobj(stream, f, 1024 * 1024)
                     try:
                         args = self._base_cmd() + ["copyto", tmp_path, obj]
                         cp = self._run_capture(args=args, timeout_seconds=self._upload_timeout)
@@ -236,7 +529,7 @@ class RcloneBackend(StorageBackend):
                     except FileNotFoundError as e:
                         raise RuntimeError("rclone binary not found") from e
                     try:
-                        stdout, stderr = p.communicate(input=file_content, timeout=self._upload_timeout)
+                        stdout, stderr = p.communicate(input=stream.read(), timeout=self._upload_timeout)
                     except subprocess.TimeoutExpired:
                         p.kill()
                         stdout, stderr = p.communicate()
@@ -245,19 +538,7 @@ class RcloneBackend(StorageBackend):
 
                 if cp.returncode == 0:
                     logger.info(f"rclone 存储上传成功: {key}")
-                    return PutResult(
-                        file_id=key,
-                        file_path=key,
-                        file_size=file_size,
-                        storage_backend=self.name,
-                        storage_key=key,
-                        storage_meta={
-                            "driver": "rclone",
-                            "remote": self._remote,
-                            "base_path": self._base_path,
-                            "content_type": content_type,
-                        },
-                    )
+                    return self._put_result(key, file_size, content_type)
 
                 last_err = (cp.stderr or b"").decode("utf-8", errors="replace")
                 logger.error(f"rclone upload failed (attempt {attempt}): {last_err}")
@@ -269,6 +550,21 @@ class RcloneBackend(StorageBackend):
 
         return None
 
+    def _put_result(self, key: str, file_size: int, content_type: str) -> PutResult:
+        return PutResult(
+            file_id=key,
+            file_path=key,
+            file_size=file_size,
+            storage_backend=self.name,
+            storage_key=key,
+            storage_meta={
+                "driver": "rclone",
+                "remote": self._remote,
+                "base_path": self._base_path,
+                "content_type": content_type,
+            },
+        )
+
     def download(
         self,
         *,
@@ -290,6 +586,13 @@ class RcloneBackend(StorageBackend):
                 body=[b"not found"]
             )
 
+        content_type = file_info.get("mime_type") or "application/octet-stream"
+        daemon_url = self._daemon.url() if self._daemon is not None else None
+        if daemon_url:
+            result = self._download_via_daemon(daemon_url, key, range_header, content_type)
+            if result is not None:
+                return result
+
         obj = self._object_path(key)
         want_range = self._enable_range and bool(range_header)
         parsed = _parse_http_range(range_header or "") if want_range else None
@@ -351,8 +654,6 @@ class RcloneBackend(StorageBackend):
                     except Exception:
                         pass
 
-        content_type = file_info.get("mime_type") or "application/octet-stream"
-
         if not parsed:
             return DownloadResult(
                 status_code=200,
@@ -384,6 +685,20 @@ class RcloneBackend(StorageBackend):
 
     def delete(self, *, storage_key: str) -> bool:
         """删除文件"""
+        daemon_url = self._daemon.url() if self._daemon is not None else None
+        if daemon_url:
+            try:
+                resp = self._daemon.session.post(
+                    f"{daemon_url}/operations/deletefile",
+                    json={"fs": f"{self._remote}:", "remote": self._relative_path(storage_key)},
+                    timeout=30,
+                )
+                if resp.ok:
+                    return True
+                logger.warning(f"rclone 守护进程删除失败: HTTP {resp.status_code} {resp.text[:200]}")
+            except requests.RequestException as e:
+                logger.warning(f"rclone 守护进程删除请求失败: {e}")
+
         try:
             obj = self._object_path(storage_key)
             args = self._base_cmd() + ["deletefile", obj]
@@ -395,6 +710,12 @@ class RcloneBackend(StorageBackend):
 
     def healthcheck(self) -> bool:
         """检查 rclone 是否可用"""
+        daemon_url = self._daemon.url() if self._daemon is not None else None
+        if daemon_url:
+            try:
+                return self._daemon.session.post(f"{daemon_url}/rc/noop", json={}, timeout=5).ok
+            except requests.RequestException:
+                return False
         try:
             args = self._base_cmd() + ["version"]
             cp = self._run_capture(args=args, timeout_seconds=10)
@@ -4,13 +4,18 @@
 S3 兼容对象存储后端
 
 支持 AWS S3、Cloudflare R2、MinIO、阿里云 OSS 等 S3 兼容存储。
+大文件使用分片上传（multipart）：分片由线程池并行上传，单个分片失败只重试该分片。
+serve_mode 为 redirect 时图片请求 302 到公开 URL 或预签名 URL，不经本服务代理。
 """
 from __future__ import annotations
 
+import io
 import os
 import time
 import uuid
-from typing import Any, Dict, Iterable, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple
 
 from ..base import StorageBackend, PutResult, DownloadResult
 from ...config import logger
@@ -18,12 +23,25 @@ from ...config import logger
 # 尝试导入 boto3
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.config import Config as BotoConfig
     HAS_BOTO3 = True
 except ImportError:
     HAS_BOTO3 = False
     boto3 = None
     BotoConfig = None
+    TransferConfig = None
+
+
+# 分片上传默认参数
+DEFAULT_MULTIPART_THRESHOLD_MB = 16     # 超过该大小使用分片上传
+DEFAULT_MULTIPART_PART_SIZE_MB = 8      # 分片大小（S3 要求除最后一片外不小于 5MB）
+DEFAULT_MULTIPART_CONCURRENCY = 4       # 并行上传的分片数
+DEFAULT_MAX_ATTEMPTS = 5                # 单个请求（含单个分片）的最大尝试次数
+
+# 重定向模式默认参数
+DEFAULT_PRESIGN_EXPIRES = 3600          # 预签名 URL 有效期（秒）
+PRESIGN_CACHE_MAX_ENTRIES = 10000       # 缓存的预签名 URL 条目数（LRU 淘汰）
 
 
 class S3Backend(StorageBackend):
@@ -40,6 +58,12 @@ class S3Backend(StorageBackend):
         region: str = "auto",
         public_url_prefix: str = "",
         path_style: bool = False,
+        multipart_threshold_mb: int = DEFAULT_MULTIPART_THRESHOLD_MB,
+        multipart_part_size_mb: int = DEFAULT_MULTIPART_PART_SIZE_MB,
+        multipart_concurrency: int = DEFAULT_MULTIPART_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        serve_mode: str = "proxy",
+        presign_expires: int = DEFAULT_PRESIGN_EXPIRES,
         **kwargs: Any,
     ):
         """
@@ -54,6 +78,12 @@ class S3Backend(StorageBackend):
             region: 区域
             public_url_prefix: 公开访问 URL 前缀（用于重定向）
             path_style: 是否使用路径风格（而非虚拟主机风格）
+            multipart_threshold_mb: 超过该大小（MB）使用分片上传
+            multipart_part_size_mb: 分片大小（MB，不小于 5）
+            multipart_concurrency: 并行上传的分片数
+            max_attempts: 单个请求的最大尝试次数（网络不稳定时按分片重试）
+            serve_mode: proxy（代理）或 redirect（302 到公开 URL / 预签名 URL）
+            presign_expires: 预签名 URL 有效期（秒，无 public_url_prefix 时使用）
         """
         self.name = name
         self._endpoint = (endpoint or "").strip()
@@ -63,7 +93,21 @@ class S3Backend(StorageBackend):
         self._region = (region or "auto").strip()
         self._public_url_prefix = (public_url_prefix or "").strip().rstrip("/")
         self._path_style = path_style
+        self._multipart_threshold = max(5, int(multipart_threshold_mb)) * 1024 * 1024
+        self._multipart_part_size = max(5, int(multipart_part_size_mb)) * 1024 * 1024
+        self._multipart_concurrency = max(1, int(multipart_concurrency))
+        self._max_attempts = max(1, int(max_attempts))
         self._client = None
+        self._transfer_config = None
+        self.serve_mode = (serve_mode or "proxy").strip().lower()
+        if self.serve_mode not in ("proxy", "redirect"):
+            logger.warning(f"S3 后端 {name} 的 serve_mode 无效: {serve_mode}，使用 proxy")
+            self.serve_mode = "proxy"
+        self._presign_expires = max(60, int(presign_expires))
+        # 距离过期不足该时间时重新签名（保证重定向后的请求仍在有效期内）
+        self._presign_margin = min(300, self._presign_expires // 2)
+        self._presign_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._presign_lock = threading.Lock()
 
         if not self._bucket:
             raise ValueError("S3 backend requires 'bucket'")
@@ -84,6 +128,9 @@ class S3Backend(StorageBackend):
             config = BotoConfig(
                 s3={'addressing_style': 'path' if self._path_style else 'auto'},
                 signature_version='s3v4',
+                retries={'max_attempts': self._max_attempts, 'mode': 'standard'},
+                # 连接池需容纳并行上传的分片
+                max_pool_connections=max(10, self._multipart_concurrency * 2),
             )
 
             client_kwargs = {
@@ -100,6 +147,12 @@ class S3Backend(StorageBackend):
                 client_kwargs['region_name'] = self._region
 
             self._client = boto3.client(**client_kwargs)
+            self._transfer_config = TransferConfig(
+                multipart_threshold=self._multipart_threshold,
+                multipart_chunksize=self._multipart_part_size,
+                max_concurrency=self._multipart_concurrency,
+                use_threads=self._multipart_concurrency > 1,
+            )
         except Exception as e:
             logger.error(f"S3 客户端初始化失败: {e}")
             self._client = None
@@ -124,6 +177,34 @@ class S3Backend(StorageBackend):
         username: str,
     ) -> Optional[PutResult]:
         """上传文件到 S3"""
+        return self.put_stream(
+            stream=io.BytesIO(file_content),
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            caption=caption,
+            source=source,
+            username=username,
+        )
+
+    def put_stream(
+        self,
+        *,
+        stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        caption: str,
+        source: str,
+        username: str,
+    ) -> Optional[PutResult]:
+        """
+        流式上传文件到 S3
+
+        小文件一次 put_object（botocore 直接从文件对象读取请求体）；
+        超过分片阈值时交给 boto3 传输管理器：按分片从文件流读取，线程池并行上传，
+        失败的分片单独重试，整体失败时自动中止（abort）分片上传。
+        """
         if not HAS_BOTO3 or not self._client:
             logger.error("S3 客户端不可用")
             return None
@@ -131,14 +212,27 @@ class S3Backend(StorageBackend):
         try:
             key = self._generate_key(filename)
 
-            self._client.put_object(
-                Bucket=self._bucket,
-                Key=key,
-                Body=file_content,
-                ContentType=content_type,
-            )
-
-            logger.info(f"S3 存储上传成功: {key}")
+            if file_size >= self._multipart_threshold and self._transfer_config is not None:
+                self._client.upload_fileobj(
+                    stream,
+                    self._bucket,
+                    key,
+                    ExtraArgs={'ContentType': content_type},
+                    Config=self._transfer_config,
+                )
+                logger.info(
+                    f"S3 存储分片上传成功: {key} "
+                    f"({file_size} bytes, {-(-file_size // self._multipart_part_size)} parts)"
+                )
+            else:
+                self._client.put_object(
+                    Bucket=self._bucket,
+                    Key=key,
+                    Body=stream,
+                    ContentLength=file_size,
+                    ContentType=content_type,
+                )
+                logger.info(f"S3 存储上传成功: {key}")
 
             return PutResult(
                 file_id=key,
@@ -253,6 +347,7 @@ class S3Backend(StorageBackend):
 
         try:
             self._client.delete_object(Bucket=self._bucket, Key=storage_key)
+            self._forget_presigned_url(storage_key)
             logger.info(f"S3 存储删除成功: {storage_key}")
             return True
         except Exception as e:
@@ -260,11 +355,55 @@ class S3Backend(StorageBackend):
             return False
 
     def get_public_url(self, *, storage_key: str, file_info: Dict[str, Any]) -> Optional[str]:
-        """获取公开访问 URL"""
+        """
+        获取公开访问 URL
+
+        配置了 public_url_prefix 时直接拼接；否则在重定向模式下返回预签名 GET URL。
+        """
         if self._public_url_prefix:
             return f"{self._public_url_prefix}/{storage_key}"
+        if self.serve_mode == "redirect":
+            return self._presigned_url(storage_key)
         return None
 
+    def _presigned_url(self, key: str) -> Optional[str]:
+        """
+        获取预签名 GET URL
+
+        同一对象在临近过期前复用同一个 URL，浏览器/CDN 可以按 URL 缓存图片内容。
+        """
+        if not HAS_BOTO3 or not self._client or not key:
+            return None
+
+        now = time.time()
+        with self._presign_lock:
+            item = self._presign_cache.get(key)
+            if item and item[1] - now > self._presign_margin:
+                self._presign_cache.move_to_end(key)
+                return item[0]
+
+        try:
+            url = self._client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self._bucket, 'Key': key},
+                ExpiresIn=self._presign_expires,
+            )
+        except Exception as e:
+            logger.error(f"S3 预签名 URL 生成失败: {e}")
+            return None
+
+        with self._presign_lock:
+            self._presign_cache[key] = (url, now + self._presign_expires)
+            self._presign_cache.move_to_end(key)
+            while len(self._presign_cache) > PRESIGN_CACHE_MAX_ENTRIES:
+                self._presign_cache.popitem(last=False)
+        return url
+
+    def _forget_presigned_url(self, storage_key: str) -> None:
+        """丢弃对象的预签名 URL 缓存"""
+        with self._presign_lock:
+            self._presign_cache.pop(storage_key, None)
+
     def healthcheck(self) -> bool:
         """检查 S3 是否可用"""
         if not HAS_BOTO3 or not self._client:
@@ -4,22 +4,171 @@
 Telegram Cloud 存储后端
 
 将文件上传到 Telegram 频道，通过 Bot API 获取和代理文件。
+支持配置多个 Bot / 存储频道（分片），上传在分片间轮询，优先选择无需限流等待的分片；
+对象所在的 Bot 与频道记录在 storage_meta 中（file_id 只对上传它的 Bot 有效）。
+所有 Bot API 请求经共享的 TelegramApiClient 发送（统一限流与 429 处理）。
 """
 from __future__ import annotations
 
+import json
 import time
-from typing import Any, Dict, Iterable, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import requests
 
-from ..base import StorageBackend, PutResult, DownloadResult
+from ..base import StorageBackend, PutItem, PutResult, DownloadResult
 from ...config import logger
+from ...telegram_api import (
+    TelegramRateLimitError, get_telegram_client, get_telegram_rate_limiter, request_cost,
+)
+
+# Telegram 保证文件下载链接至少 1 小时有效，预留 5 分钟余量
+FILE_PATH_TTL_SECONDS = 55 * 60
+# 内存中最多缓存的 file_path 条目数（LRU 淘汰）
+FILE_PATH_CACHE_MAX_ENTRIES = 10000
+# 上传后在后台预取 file_path 的线程数（不阻塞上传请求）
+FILE_PATH_PREFETCH_WORKERS = 2
+# 下载时调用 getFile 的最长限流等待（秒）
+GET_FILE_MAX_WAIT_SECONDS = 15.0
+
+
+class _FilePathCache:
+    """file_id -> (file_path, resolved_at) 的进程内 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_id: str, ttl_seconds: float) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(file_id)
+            if not item:
+                return None
+            file_path, resolved_at = item
+            if (time.time() - resolved_at) >= ttl_seconds:
+                self._data.pop(file_id, None)
+                return None
+            self._data.move_to_end(file_id)
+            return file_path
+
+    def put(self, file_id: str, file_path: str, resolved_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[file_id] = (file_path, resolved_at if resolved_at is not None else time.time())
+            self._data.move_to_end(file_id)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, file_id: str) -> None:
+        with self._lock:
+            self._data.pop(file_id, None)
+
+
+# 全局缓存：file_id 与 Bot 绑定，按 file_id 缓存即可跨后端实例共享
+_file_path_cache = _FilePathCache(FILE_PATH_CACHE_MAX_ENTRIES)
+
+# 预取线程池（首次上传时创建）
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+_prefetch_lock = threading.Lock()
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=FILE_PATH_PREFETCH_WORKERS,
+                thread_name_prefix='tg-file-path',
+            )
+        return _prefetch_executor
+
+
+class _Shard:
+    """一个 Bot Token + 存储频道的组合"""
+
+    def __init__(self, bot_token: str, chat_id: int):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        # Token 中冒号前的部分即 Bot 用户 ID（非敏感信息，可写入 storage_meta）
+        self.bot_id = bot_token.split(':', 1)[0]
+
+
+def _build_shards(bot_token: str, chat_id: int, shards: Optional[List[Dict[str, Any]]]) -> List[_Shard]:
+    """
+    构建分片列表（主 Bot/频道在前，去重）
+
+    shards 中未填写 bot_token / chat_id 的条目沿用主配置，
+    因此既可以配置“一个 Bot 多个频道”，也可以配置“多个 Bot 一个频道”。
+    """
+    result: List[_Shard] = []
+    seen = set()
+    entries = [{'bot_token': bot_token, 'chat_id': chat_id}] + list(shards or [])
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        token = str(entry.get('bot_token') or bot_token or '').strip()
+        try:
+            cid = int(entry.get('chat_id') or chat_id or 0)
+        except (TypeError, ValueError):
+            cid = 0
+        if not token or not cid or (token, cid) in seen:
+            continue
+        seen.add((token, cid))
+        result.append(_Shard(token, cid))
+    return result
+
+
+def _parse_storage_meta(value: Any) -> Dict[str, Any]:
+    """解析数据库中的 storage_meta（JSON 字符串或 dict）"""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    try:
+        meta = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _parse_db_timestamp(value: Any) -> Optional[float]:
+    """解析数据库中的时间戳（SQLite CURRENT_TIMESTAMP 为 UTC 字符串）"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        dt = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
 
 
 class TelegramBackend(StorageBackend):
     """Telegram Cloud 存储后端"""
 
-    def __init__(self, *, name: str, bot_token: str, chat_id: int, proxy_url: Optional[str] = None):
+    max_batch_put = 10  # sendMediaGroup 单次最多 10 个文件
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        bot_token: str,
+        chat_id: int,
+        proxy_url: Optional[str] = None,
+        file_path_ttl: int = FILE_PATH_TTL_SECONDS,
+        prefetch_file_path: bool = True,
+        shards: Optional[List[Dict[str, Any]]] = None,
+        bot_rate_per_second: Optional[float] = None,
+        chat_rate_per_minute: Optional[float] = None,
+        upload_max_wait: Optional[float] = None,
+    ):
         """
         初始化 Telegram 存储后端
 
@@ -28,34 +177,127 @@ class TelegramBackend(StorageBackend):
             bot_token: Telegram Bot Token
             chat_id: 存储频道/群组 ID
             proxy_url: 可选代理 URL
+            file_path_ttl: file_path 缓存有效期（秒）
+            prefetch_file_path: 上传后在后台预取 file_path（否则在首次下载时解析）
+            shards: 额外的 Bot/频道分片 [{"bot_token": ..., "chat_id": ...}]
+            bot_rate_per_second: 每个 Bot 的全局请求速率（默认 30/秒）
+            chat_rate_per_minute: 每个存储频道的消息速率（默认 20/分钟，相册按文件数计）
+            upload_max_wait: 上传的最长限流等待（秒）；None 表示排队等待而不拒绝
         """
         self.name = name
-        self._bot_token = bot_token
-        self._chat_id = chat_id
-        self._session = requests.Session()
-        self._session.trust_env = True
+        self._shards = _build_shards(bot_token, chat_id, shards)
+        # 下载只需要 Bot Token（如群组中记录的文件），未配置存储频道时也可用
+        self._primary = _Shard(bot_token, chat_id) if bot_token else None
+        self._shard_lock = threading.Lock()
+        self._shard_cursor = 0
+        self._file_path_ttl = max(0, int(file_path_ttl))
+        self._prefetch_file_path = bool(prefetch_file_path)
+        self._upload_max_wait = upload_max_wait
+        # 限流速率登记到全局限流器（机器人线程等其他路径使用同一 Bot 时同样生效）
+        bot_tokens = {shard.bot_token for shard in self._shards}
+        if self._primary:
+            bot_tokens.add(self._primary.bot_token)
+        limiter = get_telegram_rate_limiter()
+        for token in bot_tokens:
+            limiter.configure(token, bot_rate=bot_rate_per_second, chat_rate_per_minute=chat_rate_per_minute)
         proxy_url_norm = (proxy_url or "").strip()
+        if proxy_url_norm and "://" not in proxy_url_norm:
+            proxy_url_norm = f"http://{proxy_url_norm}"
+        self._client = get_telegram_client(proxy_url_norm or None)
         if proxy_url_norm:
-            if "://" not in proxy_url_norm:
-                proxy_url_norm = f"http://{proxy_url_norm}"
-            self._session.proxies = {"http": proxy_url_norm, "https": proxy_url_norm}
             # 掩码代理凭据避免日志泄露
             masked = proxy_url_norm
             if "@" in masked:
                 masked = masked.split("://")[0] + "://" + "***@" + masked.split("@")[-1]
-            logger.info(f"Telegram 存储后端初始化: chat_id={chat_id}, proxy={masked}")
+            logger.info(f"Telegram 存储后端初始化: chat_id={chat_id}, shards={len(self._shards)}, proxy={masked}")
         else:
-            logger.info(f"Telegram 存储后端初始化: chat_id={chat_id}")
+            logger.info(f"Telegram 存储后端初始化: chat_id={chat_id}, shards={len(self._shards)}")
+
+    def _pick_shard(self, cost: int, exclude: Iterable[_Shard] = ()) -> Optional[_Shard]:
+        """
+        选择上传分片
+
+        按轮询顺序选择预计限流等待最短的分片（被 429 冷却或配额用尽的分片自然排在后面）。
+        """
+        with self._shard_lock:
+            count = len(self._shards)
+            if not count:
+                return None
+            candidates = [
+                self._shards[(self._shard_cursor + i) % count]
+                for i in range(count)
+            ]
+            candidates = [s for s in candidates if s not in exclude]
+            if not candidates:
+                return None
+            shard = min(candidates, key=lambda s: self._client.estimate_wait(s.bot_token, s.chat_id, cost))
+            self._shard_cursor = (self._shards.index(shard) + 1) % count
+            return shard
+
+    def _shard_for(self, file_info: Dict[str, Any]) -> Optional[_Shard]:
+        """按 storage_meta 中记录的 Bot 找到下载所用分片（旧记录使用主 Bot）"""
+        bot_id = str(_parse_storage_meta(file_info.get('storage_meta')).get('bot_id') or '')
+        if bot_id:
+            for shard in self._shards:
+                if shard.bot_id == bot_id:
+                    return shard
+            if not self._primary or self._primary.bot_id != bot_id:
+                logger.warning(f"Telegram 分片中找不到 bot_id={bot_id}，使用主 Bot")
+        return self._primary or (self._shards[0] if self._shards else None)
 
-    def _get_file_path(self, file_id: str) -> Optional[str]:
-        """通过 Telegram API 获取文件路径"""
-        if not self._bot_token or not file_id:
+    def _post_upload(
+        self,
+        method: str,
+        *,
+        files: Dict[str, Any],
+        data: Dict[str, Any],
+        timeout: int,
+    ) -> Tuple[Optional[requests.Response], Optional[_Shard]]:
+        """
+        选择分片发送上传请求
+
+        按预计等待最短的分片发送；默认在限流器中排队等待而不拒绝（批量上传的多个相册
+        会依次排队），配置了 upload_max_wait 时等待超限的分片被跳过。
+        收到 429 时换下一个分片；最后一个分片按 retry_after 等待重试。
+        所有分片都失败时返回最后一次响应（可能为 None）。
+        """
+        cost = request_cost(method, data)
+        tried: List[_Shard] = []
+        resp: Optional[requests.Response] = None
+        shard: Optional[_Shard] = None
+        while True:
+            candidate = self._pick_shard(cost, exclude=tried)
+            if candidate is None:
+                return resp, shard
+            tried.append(candidate)
+            try:
+                resp = self._client.call(
+                    candidate.bot_token,
+                    method,
+                    files=files,
+                    data={**data, 'chat_id': candidate.chat_id},
+                    timeout=timeout,
+                    max_wait=self._upload_max_wait,
+                    max_retries=1 if len(tried) == len(self._shards) else 0,
+                )
+            except TelegramRateLimitError as e:
+                logger.warning(f"Telegram 分片限流等待过长，跳过: bot={candidate.bot_id} chat={candidate.chat_id} ({e})")
+                continue
+            shard = candidate
+            if resp.status_code != 429:
+                return resp, shard
+
+    def _get_file_path(self, file_id: str, shard: Optional[_Shard]) -> Optional[str]:
+        """通过 Telegram API 获取文件路径（须使用上传该文件的 Bot）"""
+        if shard is None or not file_id:
             return None
         try:
-            resp = self._session.get(
-                f"https://api.telegram.org/bot{self._bot_token}/getFile",
+            resp = self._client.call(
+                shard.bot_token,
+                'getFile',
                 params={'file_id': file_id},
                 timeout=15,
+                max_wait=GET_FILE_MAX_WAIT_SECONDS,
             )
             if not resp.ok:
                 return None
@@ -68,6 +310,50 @@ class TelegramBackend(StorageBackend):
             logger.error(f"获取 Telegram 文件路径失败: {e}")
             return None
 
+    def _resolve_file_path(self, file_id: str, shard: Optional[_Shard]) -> Optional[str]:
+        """调用 getFile 获取最新 file_path 并写入缓存"""
+        fresh = self._get_file_path(file_id, shard)
+        if fresh:
+            _file_path_cache.put(file_id, fresh)
+        return fresh
+
+    def _schedule_prefetch(self, file_id: str, shard: _Shard) -> None:
+        """后台预取 file_path 写入缓存（首次访问时无需再调用 getFile）"""
+        if not self._prefetch_file_path or self._file_path_ttl <= 0:
+            return
+        try:
+            _get_prefetch_executor().submit(self._resolve_file_path, file_id, shard)
+        except RuntimeError:
+            # 解释器退出中，线程池已关闭
+            pass
+
+    def _get_cached_file_path(self, file_id: str, file_info: Dict[str, Any], db_file_path: str) -> Optional[str]:
+        """
+        获取仍在有效期内的 file_path
+
+        先查进程内缓存，再查数据库记录（last_file_path_update，缺失时回退 upload_time）。
+        """
+        if self._file_path_ttl <= 0:
+            return None
+        cached = _file_path_cache.get(file_id, self._file_path_ttl)
+        if cached:
+            return cached
+        if not db_file_path:
+            return None
+        resolved_at = _parse_db_timestamp(file_info.get('last_file_path_update'))
+        if resolved_at is None:
+            resolved_at = _parse_db_timestamp(file_info.get('upload_time'))
+        if resolved_at is None or (time.time() - resolved_at) >= self._file_path_ttl:
+            return None
+        _file_path_cache.put(file_id, db_file_path, resolved_at)
+        return db_file_path
+
+    def _file_url(self, file_path: str, shard: _Shard) -> str:
+        """构建文件下载 URL"""
+        if file_path.startswith('https://'):
+            return file_path
+        return f"https://api.telegram.org/file/bot{shard.bot_token}/{file_path}"
+
     def put_bytes(
         self,
         *,
@@ -80,34 +366,31 @@ class TelegramBackend(StorageBackend):
         username: str,
     ) -> Optional[PutResult]:
         """上传文件到 Telegram"""
-        if not self._bot_token or not self._chat_id:
+        if not self._shards:
             logger.error("Telegram 存储后端未配置 bot_token 或 chat_id")
             return None
 
         try:
             # 根据文件大小选择上传方式
             # Telegram 对 sendPhoto 有 10MB 限制，超过使用 sendDocument
-            if file_size <= 10 * 1024 * 1024 and content_type.startswith('image/'):
-                files = {'photo': (filename, file_content, content_type)}
-                data = {'chat_id': self._chat_id, 'caption': caption or ''}
-                resp = self._session.post(
-                    f"https://api.telegram.org/bot{self._bot_token}/sendPhoto",
-                    files=files,
-                    data=data,
+            as_photo = self._send_as_photo(content_type, file_size)
+            if as_photo:
+                resp, shard = self._post_upload(
+                    'sendPhoto',
+                    files={'photo': (filename, file_content, content_type)},
+                    data={'caption': caption or ''},
                     timeout=60,
                 )
             else:
-                files = {'document': (filename, file_content, content_type)}
-                data = {'chat_id': self._chat_id, 'caption': caption or ''}
-                resp = self._session.post(
-                    f"https://api.telegram.org/bot{self._bot_token}/sendDocument",
-                    files=files,
-                    data=data,
+                resp, shard = self._post_upload(
+                    'sendDocument',
+                    files={'document': (filename, file_content, content_type)},
+                    data={'caption': caption or ''},
                     timeout=120,
                 )
 
-            if not resp.ok:
-                logger.error(f"Telegram 上传失败: HTTP {resp.status_code}")
+            if resp is None or shard is None or not resp.ok:
+                logger.error(f"Telegram 上传失败: HTTP {getattr(resp, 'status_code', None)}")
                 return None
 
             payload = resp.json() or {}
@@ -116,43 +399,158 @@ class TelegramBackend(StorageBackend):
                 return None
 
             result = payload.get('result') or {}
+            return self._put_result_from_message(result, as_photo, file_size, shard)
+        except Exception as e:
+            logger.error(f"Telegram 存储上传异常: {e}")
+            return None
 
-            # 获取 file_id
-            if file_size <= 10 * 1024 * 1024 and content_type.startswith('image/'):
-                photos = result.get('photo') or []
-                if not photos:
-                    logger.error("Telegram 上传失败: 无法获取 photo")
-                    return None
-                file_id = photos[-1].get('file_id')
-            else:
-                doc = result.get('document') or {}
-                file_id = doc.get('file_id')
+    def put_many(
+        self,
+        *,
+        items: List[PutItem],
+        source: str,
+        username: str,
+    ) -> List[Optional[PutResult]]:
+        """
+        批量上传：每组最多 10 个文件通过一次 sendMediaGroup 发送
 
-            if not file_id:
-                logger.error("Telegram 上传失败: 无法获取 file_id")
-                return None
+        图片与文档不能混在同一相册中，分别分组；单个文件的分组退回 sendPhoto/sendDocument。
+        """
+        results: List[Optional[PutResult]] = [None] * len(items)
+        if not self._shards:
+            logger.error("Telegram 存储后端未配置 bot_token 或 chat_id")
+            return results
 
-            # 获取 file_path
-            file_path = self._get_file_path(file_id) or ''
-
-            logger.info(f"Telegram 存储上传成功: {file_id}")
-
-            return PutResult(
-                file_id=file_id,
-                file_path=file_path,
-                file_size=file_size,
-                storage_backend=self.name,
-                storage_key=file_id,
-                storage_meta={
-                    'file_path': file_path,
-                    'uploaded_at': int(time.time()),
-                    'message_id': result.get('message_id'),
-                },
+        photos = [i for i, item in enumerate(items) if self._send_as_photo(item.content_type, item.file_size)]
+        documents = [i for i, item in enumerate(items) if not self._send_as_photo(item.content_type, item.file_size)]
+        for indices, as_photo in ((photos, True), (documents, False)):
+            for start in range(0, len(indices), self.max_batch_put):
+                group = indices[start:start + self.max_batch_put]
+                if len(group) == 1:
+                    item = items[group[0]]
+                    results[group[0]] = self.put_stream(
+                        stream=item.stream,
+                        filename=item.filename,
+                        content_type=item.content_type,
+                        file_size=item.file_size,
+                        caption=item.caption,
+                        source=source,
+                        username=username,
+                    )
+                    continue
+                group_results = self._send_media_group(
+                    [items[i] for i in group], as_photo, source=source, username=username
+                )
+                for i, put_result in zip(group, group_results):
+                    results[i] = put_result
+        return results
+
+    def _send_media_group(
+        self,
+        items: List[PutItem],
+        as_photo: bool,
+        *,
+        source: str,
+        username: str,
+    ) -> List[Optional[PutResult]]:
+        """通过 sendMediaGroup 上传一组文件（2-10 个），失败时逐个重试"""
+        media_type = 'photo' if as_photo else 'document'
+        media = []
+        files = {}
+        for i, item in enumerate(items):
+            attach = f'file{i}'
+            media.append({'type': media_type, 'media': f'attach://{attach}', 'caption': item.caption or ''})
+            files[attach] = (item.filename, item.stream.read(), item.content_type)
+
+        try:
+            resp, shard = self._post_upload(
+                'sendMediaGroup',
+                files=files,
+                data={'media': json.dumps(media, ensure_ascii=False)},
+                timeout=120,
             )
+            if resp is None or shard is None:
+                return [None] * len(items)
+            payload = resp.json() if resp.content else {}
         except Exception as e:
-            logger.error(f"Telegram 存储上传异常: {e}")
+            logger.error(f"Telegram 批量上传异常: {e}")
+            return [None] * len(items)
+
+        messages = payload.get('result') if payload.get('ok') else None
+        if not isinstance(messages, list) or len(messages) != len(items):
+            if resp.status_code == 429:
+                # 所有分片都被限流：逐个重试只会更快被限流
+                logger.error(f"Telegram 批量上传被限流: {payload.get('description')}")
+                return [None] * len(items)
+            logger.warning(
+                f"Telegram 批量上传失败，逐个重试: HTTP {resp.status_code} {payload.get('description')}"
+            )
+            results: List[Optional[PutResult]] = []
+            for item, (_name, content, _ct) in zip(items, files.values()):
+                results.append(self.put_bytes(
+                    file_content=content,
+                    filename=item.filename,
+                    content_type=item.content_type,
+                    file_size=item.file_size,
+                    caption=item.caption,
+                    source=source,
+                    username=username,
+                ))
+            return results
+
+        # 返回的消息与 media 顺序一致
+        return [
+            self._put_result_from_message(message or {}, as_photo, item.file_size, shard)
+            for item, message in zip(items, messages)
+        ]
+
+    @staticmethod
+    def _send_as_photo(content_type: str, file_size: int) -> bool:
+        """是否以 photo 发送（sendPhoto 限 10MB，其余走 document）"""
+        return file_size <= 10 * 1024 * 1024 and (content_type or '').startswith('image/')
+
+    def _put_result_from_message(
+        self,
+        message: Dict[str, Any],
+        as_photo: bool,
+        file_size: int,
+        shard: _Shard,
+    ) -> Optional[PutResult]:
+        """从发送结果消息中提取 file_id 并构建 PutResult"""
+        if as_photo:
+            photos = message.get('photo') or []
+            if not photos:
+                logger.error("Telegram 上传失败: 无法获取 photo")
+                return None
+            file_id = photos[-1].get('file_id')
+        else:
+            doc = message.get('document') or {}
+            file_id = doc.get('file_id')
+
+        if not file_id:
+            logger.error("Telegram 上传失败: 无法获取 file_id")
             return None
 
+        # file_path 不在上传时同步获取（有效期仅约 1 小时），首次下载时再解析
+        self._schedule_prefetch(file_id, shard)
+
+        logger.info(f"Telegram 存储上传成功: {file_id}")
+
+        return PutResult(
+            file_id=file_id,
+            file_path='',
+            file_size=file_size,
+            storage_backend=self.name,
+            storage_key=file_id,
+            storage_meta={
+                'uploaded_at': int(time.time()),
+                'message_id': message.get('message_id'),
+                'chat_id': shard.chat_id,
+                'bot_id': shard.bot_id,
+                'media_group_id': message.get('media_group_id'),
+            },
+        )
+
     def download(
         self,
         *,
@@ -174,12 +572,29 @@ class TelegramBackend(StorageBackend):
                 body=[b'not found']
             )
 
-        # 刷新 file_path（Telegram 的 file_path 会过期）
-        fresh = self._get_file_path(file_id)
+        shard = self._shard_for(file_info)
+        if shard is None:
+            return DownloadResult(
+                status_code=503,
+                content_type='text/plain',
+                headers={},
+                body=[b'storage not configured']
+            )
+
+        # 解析 file_path：优先使用未过期的缓存，避免每次访问都调用 getFile
         updated_fields: Optional[Dict[str, Any]] = None
-        if fresh and fresh != file_path:
-            file_path = fresh
-            updated_fields = {'file_path': fresh}
+        cached_path = self._get_cached_file_path(file_id, file_info, file_path)
+        from_cache = bool(cached_path)
+        if cached_path:
+            if not file_path:
+                # 后台预取的结果：首次访问时写回数据库
+                updated_fields = {'file_path': cached_path}
+            file_path = cached_path
+        else:
+            fresh = self._resolve_file_path(file_id, shard)
+            if fresh:
+                file_path = fresh
+                updated_fields = {'file_path': fresh}
 
         if not file_path:
             return DownloadResult(
@@ -190,19 +605,22 @@ class TelegramBackend(StorageBackend):
                 updated_fields=updated_fields
             )
 
-        # 构建文件 URL
-        if file_path.startswith('https://'):
-            file_url = file_path
-        else:
-            file_url = f"https://api.telegram.org/file/bot{self._bot_token}/{file_path}"
-
         # 请求文件
         headers: Dict[str, str] = {}
         if range_header:
             headers['Range'] = range_header
 
         try:
-            resp = self._session.get(file_url, stream=True, timeout=60, headers=headers)
+            resp = self._client.download(self._file_url(file_path, shard), headers=headers)
+            # 缓存的 file_path 已失效：刷新后重试一次
+            if resp.status_code == 404 and from_cache:
+                resp.close()
+                _file_path_cache.invalidate(file_id)
+                fresh = self._resolve_file_path(file_id, shard)
+                if fresh:
+                    file_path = fresh
+                    updated_fields = {'file_path': fresh}
+                    resp = self._client.download(self._file_url(file_path, shard), headers=headers)
         except Exception as e:
             logger.error(f"Telegram 下载失败: {e}")
             return DownloadResult(
@@ -214,6 +632,7 @@ class TelegramBackend(StorageBackend):
             )
 
         if resp.status_code not in (200, 206):
+            resp.close()
             return DownloadResult(
                 status_code=resp.status_code,
                 content_type='text/plain',
@@ -245,14 +664,17 @@ class TelegramBackend(StorageBackend):
         )
 
     def healthcheck(self) -> bool:
-        """检查 Bot Token 是否有效"""
-        if not self._bot_token:
+        """检查所有分片的 Bot Token 是否有效"""
+        tokens = {shard.bot_token for shard in self._shards}
+        if self._primary:
+            tokens.add(self._primary.bot_token)
+        if not tokens:
             return False
         try:
-            resp = self._session.get(
-                f"https://api.telegram.org/bot{self._bot_token}/getMe",
-                timeout=10
-            )
-            return resp.ok and resp.json().get('ok', False)
+            for token in tokens:
+                resp = self._client.call(token, 'getMe', timeout=10)
+                if not (resp.ok and resp.json().get('ok', False)):
+                    return False
+            return True
         except Exception:
             return False
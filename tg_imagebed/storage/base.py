@@ -8,8 +8,9 @@
 from __future__ import annotations
 
 import abc
+import os
 from dataclasses import dataclass, field
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -23,20 +24,114 @@ class PutResult:
     storage_meta: Dict[str, Any] = field(default_factory=dict)  # 存储元数据
 
 
+@dataclass(frozen=True)
+class PutItem:
+    """批量上传中的单个文件"""
+    stream: BinaryIO                # 文件流（位于开头）
+    filename: str                   # 原始文件名
+    content_type: str               # MIME 类型
+    file_size: int                  # 文件大小
+    caption: str                    # 描述/标题
+
+
+class FileBody:
+    """
+    本地文件响应体
+
+    可直接迭代（逐块读取）；在支持 wsgi.file_wrapper 的服务器上，
+    由 wsgi_iter() 交给服务器发送，避免每个字节经过 Python 层。
+    """
+
+    def __init__(self, file: BinaryIO, offset: int, length: int, chunk_size: int = 64 * 1024):
+        self._file = file
+        self.offset = offset
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            self._file.seek(self.offset, os.SEEK_SET)
+            remaining = self.length
+            while remaining > 0:
+                chunk = self._file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def wsgi_iter(self, environ: Dict[str, Any]) -> Iterable[bytes]:
+        """
+        返回交给 WSGI 服务器的响应体
+
+        文件定位到 offset 后交给 wsgi.file_wrapper，发送长度由 Content-Length 限定
+        （waitress / gunicorn 均按当前位置 + Content-Length 发送）。
+        """
+        wrapper = environ.get('wsgi.file_wrapper')
+        if wrapper is None:
+            return self
+        try:
+            self._file.seek(self.offset, os.SEEK_SET)
+            return wrapper(self._file, self.chunk_size)
+        except Exception:
+            return self
+
+
 @dataclass(frozen=True)
 class DownloadResult:
     """下载结果"""
     status_code: int                # HTTP 状态码 (200, 206, 404, etc.)
     content_type: str               # MIME 类型
     headers: Dict[str, str]         # 响应头
-    body: Iterable[bytes]           # 响应体（流式）
+    body: Iterable[bytes]           # 响应体（流式，本地文件为 FileBody）
     updated_fields: Optional[Dict[str, Any]] = None  # 需要更新的字段（如 file_path）
 
 
+def parse_range(range_header: str, total_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 HTTP Range 头（仅支持单区间）
+
+    Returns:
+        (start, end) 闭区间；无法解析或多区间时返回 None
+    """
+    if not range_header:
+        return None
+    if not range_header.startswith('bytes='):
+        return None
+    spec = range_header[len('bytes='):].strip()
+    if ',' in spec:
+        return None
+    if '-' not in spec:
+        return None
+    start_s, end_s = (spec.split('-', 1) + [''])[:2]
+    try:
+        if start_s == '':
+            # suffix: bytes=-N
+            length = int(end_s)
+            if length <= 0:
+                return None
+            start = max(0, total_size - length)
+            end = total_size - 1
+            return (start, end)
+        start = int(start_s)
+        end = int(end_s) if end_s != '' else total_size - 1
+        if start < 0 or end < start:
+            return None
+        return (start, min(end, total_size - 1))
+    except Exception:
+        return None
+
+
 class StorageBackend(abc.ABC):
     """存储后端抽象基类"""
 
     name: str  # 后端名称
+    max_batch_put: int = 1  # 单次 put_many 最多文件数（大于 1 表示后端原生支持批量上传）
+    serve_mode: str = "proxy"  # 图片访问方式：proxy（由本服务代理）/ redirect（302 到 get_public_url）
 
     @abc.abstractmethod
     def put_bytes(
@@ -67,6 +162,68 @@ class StorageBackend(abc.ABC):
         """
         raise NotImplementedError
 
+    def put_stream(
+        self,
+        *,
+        stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        caption: str,
+        source: str,
+        username: str,
+    ) -> Optional[PutResult]:
+        """
+        流式上传文件（默认读入内存后调用 put_bytes，支持流式写入的后端应覆盖）
+
+        Args:
+            stream: 文件流（位于开头）
+            其余参数同 put_bytes
+
+        Returns:
+            PutResult 或 None（失败时）
+        """
+        return self.put_bytes(
+            file_content=stream.read(),
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            caption=caption,
+            source=source,
+            username=username,
+        )
+
+    def put_many(
+        self,
+        *,
+        items: List[PutItem],
+        source: str,
+        username: str,
+    ) -> List[Optional[PutResult]]:
+        """
+        批量上传文件（默认逐个调用 put_stream，支持批量接口的后端应覆盖）
+
+        Args:
+            items: 待上传文件（不超过 max_batch_put 个）
+            source: 来源
+            username: 用户名
+
+        Returns:
+            与 items 顺序一致的 PutResult 列表（失败项为 None）
+        """
+        return [
+            self.put_stream(
+                stream=item.stream,
+                filename=item.filename,
+                content_type=item.content_type,
+                file_size=item.file_size,
+                caption=item.caption,
+                source=source,
+                username=username,
+            )
+            for item in items
+        ]
+
     @abc.abstractmethod
     def download(
         self,
@@ -109,7 +266,7 @@ class StorageBackend(abc.ABC):
 
     def get_public_url(self, *, storage_key: str, file_info: Dict[str, Any]) -> Optional[str]:
         """
-        获取公开访问 URL（可选实现，用于重定向）
+        获取公开访问 URL（可选实现，serve_mode 为 redirect 时用于重定向）
 
         Args:
             storage_key: 存储 key
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地磁盘缓存层
+
+包装任意存储后端的 download()，将远端对象缓存到本地磁盘：
+- 读穿透：未命中时边向客户端流式输出边写入临时文件，完整后原子替换
+- 字节预算：超出预算时按 LRU / LFU 策略淘汰
+- Range 请求：命中时直接从缓存文件返回 206
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .base import StorageBackend, PutResult, DownloadResult, FileBody, parse_range
+from ..config import DATA_DIR, logger
+
+# 默认缓存目录与预算
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, "cache")
+DEFAULT_CACHE_MAX_SIZE_MB = 1024
+DEFAULT_CACHE_MAX_OBJECT_MB = 50
+CACHE_POLICIES = ("lru", "lfu")
+# 淘汰时降到预算的该比例以下，避免每次写入都触发淘汰
+_EVICT_LOW_WATERMARK = 0.9
+_TMP_SUFFIX = ".tmp"
+
+
+class _Entry:
+    """缓存条目元数据"""
+
+    __slots__ = ("size", "hits", "last_access")
+
+    def __init__(self, size: int, last_access: float, hits: int = 0):
+        self.size = size
+        self.hits = hits
+        self.last_access = last_access
+
+
+class DiskCache:
+    """基于本地目录的对象缓存（线程安全）"""
+
+    def __init__(self, *, root_dir: str, max_bytes: int, policy: str = "lru", max_object_bytes: int = 0):
+        """
+        初始化磁盘缓存
+
+        Args:
+            root_dir: 缓存目录
+            max_bytes: 缓存总字节预算
+            policy: 淘汰策略（lru / lfu）
+            max_object_bytes: 单个对象大小上限（0 表示仅受总预算限制）
+        """
+        self._root = Path(root_dir).resolve()
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max(0, int(max_bytes))
+        self._policy = policy if policy in CACHE_POLICIES else "lru"
+        self._max_object_bytes = max(0, int(max_object_bytes))
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_index()
+        logger.info(
+            f"磁盘缓存初始化: {self._root} (预算 {self._max_bytes} bytes, 策略 {self._policy}, "
+            f"已有 {len(self._entries)} 个对象)"
+        )
+
+    # ---------- 索引 ----------
+    def _load_index(self) -> None:
+        """扫描缓存目录重建索引（按访问时间排序，清理残留临时文件）"""
+        found = []
+        for dirpath, _dirnames, filenames in os.walk(self._root):
+            for fn in filenames:
+                path = os.path.join(dirpath, fn)
+                if fn.endswith(_TMP_SUFFIX):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((max(st.st_atime, st.st_mtime), fn, int(st.st_size)))
+        found.sort()
+        for ts, key, size in found:
+            self._entries[key] = _Entry(size, ts)
+            self._total += size
+        self._evict_locked()
+
+    def _path_for(self, key: str) -> Path:
+        return self._root / key[:2] / key[2:4] / key
+
+    @staticmethod
+    def make_key(backend_name: str, storage_key: str) -> str:
+        """根据后端名称和存储 key 生成缓存 key"""
+        return hashlib.sha256(f"{backend_name}\0{storage_key}".encode("utf-8")).hexdigest()
+
+    # ---------- 读取 ----------
+    def open(self, key: str):
+        """打开缓存文件，未命中返回 None（调用方负责关闭）"""
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return None
+        try:
+            f = open(self._path_for(key), "rb")
+        except OSError:
+            # 文件被外部删除：同步索引
+            self.discard(key)
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.hits += 1
+                entry.last_access = time.time()
+                self._entries.move_to_end(key)
+        return f
+
+    def accepts(self, size: Optional[int]) -> bool:
+        """判断指定大小的对象是否可以缓存"""
+        if self._max_bytes <= 0:
+            return False
+        if size is None:
+            return True
+        if self._max_object_bytes and size > self._max_object_bytes:
+            return False
+        return size <= self._max_bytes
+
+    # ---------- 写入 ----------
+    def new_temp_path(self, key: str) -> Path:
+        """分配临时文件路径（与目标文件同目录，保证 os.replace 原子性）"""
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{key}.{uuid.uuid4().hex}{_TMP_SUFFIX}")
+
+    def commit(self, key: str, tmp_path: Path, size: int) -> bool:
+        """将完整写入的临时文件原子提交到缓存"""
+        if not self.accepts(size):
+            self._remove_file(tmp_path)
+            return False
+        try:
+            os.replace(tmp_path, self._path_for(key))
+        except OSError as e:
+            logger.warning(f"磁盘缓存提交失败: {e}")
+            self._remove_file(tmp_path)
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old.size
+            self._entries[key] = _Entry(size, time.time())
+            self._total += size
+            self._evict_locked()
+        return True
+
+    def discard(self, key: str) -> None:
+        """移除缓存对象"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total -= entry.size
+        self._remove_file(self._path_for(key))
+
+    # ---------- 淘汰 ----------
+    def _evict_locked(self) -> None:
+        """超出预算时淘汰对象（需持有锁）"""
+        if self._total <= self._max_bytes:
+            return
+        target = int(self._max_bytes * _EVICT_LOW_WATERMARK)
+        if self._policy == "lfu":
+            victims = sorted(self._entries.items(), key=lambda kv: (kv[1].hits, kv[1].last_access))
+        else:
+            victims = list(self._entries.items())  # OrderedDict 头部即最久未使用
+        for key, entry in victims:
+            if self._total <= target:
+                break
+            del self._entries[key]
+            self._total -= entry.size
+            self._evictions += 1
+            self._remove_file(self._path_for(key))
+
+    @staticmethod
+    def _remove_file(path: Path) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "root_dir": str(self._root),
+                "policy": self._policy,
+                "max_bytes": self._max_bytes,
+                "used_bytes": self._total,
+                "objects": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+class CachedBackend(StorageBackend):
+    """为任意存储后端增加本地磁盘读缓存"""
+
+    def __init__(self, inner: StorageBackend, cache: DiskCache):
+        self.name = inner.name
+        self._inner = inner
+        self._cache = cache
+
+    @property
+    def inner(self) -> StorageBackend:
+        """被包装的原始后端"""
+        return self._inner
+
+    def put_bytes(self, **kwargs: Any) -> Optional[PutResult]:
+        return self._inner.put_bytes(**kwargs)
+
+    def put_stream(self, **kwargs: Any) -> Optional[PutResult]:
+        return self._inner.put_stream(**kwargs)
+
+    @property
+    def max_batch_put(self) -> int:
+        return self._inner.max_batch_put
+
+    @property
+    def serve_mode(self) -> str:
+        return self._inner.serve_mode
+
+    def put_many(self, **kwargs: Any) -> List[Optional[PutResult]]:
+        return self._inner.put_many(**kwargs)
+
+    def delete(self, *, storage_key: str) -> bool:
+        self._cache.discard(DiskCache.make_key(self.name, storage_key))
+        return self._inner.delete(storage_key=storage_key)
+
+    def healthcheck(self) -> bool:
+        return self._inner.healthcheck()
+
+    def get_public_url(self, *, storage_key: str, file_info: Dict[str, Any]) -> Optional[str]:
+        return self._inner.get_public_url(storage_key=storage_key, file_info=file_info)
+
+    def download(
+        self,
+        *,
+        file_info: Dict[str, Any],
+        range_header: Optional[str],
+    ) -> DownloadResult:
+        """优先从磁盘缓存返回，未命中时回源并写入缓存"""
+        storage_key = str(
+            file_info.get("storage_key") or
+            file_info.get("file_id") or ""
+        ).strip()
+        if not storage_key:
+            return self._inner.download(file_info=file_info, range_header=range_header)
+
+        key = DiskCache.make_key(self.name, storage_key)
+        f = self._cache.open(key)
+        if f is not None:
+            return self._serve_cached(f, file_info, range_header)
+
+        dl = self._inner.download(file_info=file_info, range_header=range_header)
+
+        # 仅缓存完整响应；Range 未命中直接透传
+        if range_header or dl.status_code != 200:
+            return dl
+
+        expected: Optional[int] = None
+        try:
+            expected = int(dl.headers.get("Content-Length")) if dl.headers.get("Content-Length") else None
+        except (TypeError, ValueError):
+            expected = None
+        if not self._cache.accepts(expected):
+            return dl
+
+        headers = dict(dl.headers or {})
+        headers["X-Local-Cache"] = "MISS"
+        return DownloadResult(
+            status_code=dl.status_code,
+            content_type=dl.content_type,
+            headers=headers,
+            body=self._tee_body(key, dl.body, expected),
+            updated_fields=dl.updated_fields,
+        )
+
+    def _tee_body(self, key: str, upstream: Iterable[bytes], expected: Optional[int]) -> Iterable[bytes]:
+        """边输出边写入临时文件，完整读取后原子提交"""
+        try:
+            tmp_path: Optional[Path] = self._cache.new_temp_path(key)
+            tmp = open(tmp_path, "wb")
+        except OSError as e:
+            logger.warning(f"磁盘缓存写入失败: {e}")
+            tmp_path, tmp = None, None
+
+        written = 0
+        completed = False
+        try:
+            for chunk in upstream:
+                if tmp is not None:
+                    try:
+                        tmp.write(chunk)
+                        written += len(chunk)
+                        if not self._cache.accepts(written):
+                            raise OSError("object exceeds cache limit")
+                    except OSError:
+                        tmp.close()
+                        tmp = None
+                        DiskCache._remove_file(tmp_path)
+                yield chunk
+            completed = True
+        finally:
+            close = getattr(upstream, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+            if tmp is not None:
+                tmp.close()
+                if completed and (expected is None or written == expected):
+                    self._cache.commit(key, tmp_path, written)
+                else:
+                    DiskCache._remove_file(tmp_path)
+
+    @staticmethod
+    def _serve_cached(f, file_info: Dict[str, Any], range_header: Optional[str]) -> DownloadResult:
+        """从缓存文件构建响应（支持单段 Range）"""
+        total = os.fstat(f.fileno()).st_size
+        content_type = file_info.get("mime_type") or "application/octet-stream"
+        r = parse_range(range_header or "", total) if range_header else None
+        start, end = r if r else (0, total - 1)
+        length = max(0, end - start + 1)
+
+        headers = {
+            "Content-Length": str(length),
+            "Accept-Ranges": "bytes",
+            "X-Local-Cache": "HIT",
+        }
+        if r:
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        return DownloadResult(
+            status_code=206 if r else 200,
+            content_type=content_type,
+            headers=headers,
+            body=FileBody(f, start, length),
+        )
+
+
+# 全局缓存实例（按配置复用，避免路由器重建时重复扫描目录）
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_key: Optional[tuple] = None
+_disk_cache_lock = threading.Lock()
+
+
+def _size_mb(cfg: Dict[str, Any], key: str, default: int) -> int:
+    """
+    读取大小配置（MB）：未设置时取默认值，显式 0 保留
+
+    Raises:
+        ValueError: 不是整数或为负数
+    """
+    value = cfg.get(key)
+    if value is None or value == "":
+        return default
+    size = int(value)
+    if size < 0:
+        raise ValueError(f"{key} 不能为负数")
+    return size
+
+
+def normalize_cache_config(cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """补全缓存配置默认值"""
+    cfg = cfg or {}
+    policy = str(cfg.get("policy") or "lru").strip().lower()
+    backends = cfg.get("backends")
+    return {
+        "enabled": bool(cfg.get("enabled", False)),
+        "root_dir": str(cfg.get("root_dir") or DEFAULT_CACHE_DIR),
+        "max_size_mb": _size_mb(cfg, "max_size_mb", DEFAULT_CACHE_MAX_SIZE_MB),
+        "max_object_mb": _size_mb(cfg, "max_object_mb", DEFAULT_CACHE_MAX_OBJECT_MB),
+        "policy": policy if policy in CACHE_POLICIES else "lru",
+        "backends": [str(x) for x in backends] if isinstance(backends, list) else None,
+    }
+
+
+def get_disk_cache(cfg: Dict[str, Any]) -> Optional[DiskCache]:
+    """根据（已规范化的）配置获取全局磁盘缓存实例，未启用返回 None"""
+    global _disk_cache, _disk_cache_key
+    if not cfg.get("enabled"):
+        return None
+    key = (cfg["root_dir"], cfg["max_size_mb"], cfg["max_object_mb"], cfg["policy"])
+    with _disk_cache_lock:
+        if _disk_cache is None or _disk_cache_key != key:
+            try:
+                _disk_cache = DiskCache(
+                    root_dir=cfg["root_dir"],
+                    max_bytes=cfg["max_size_mb"] * 1024 * 1024,
+                    policy=cfg["policy"],
+                    max_object_bytes=cfg["max_object_mb"] * 1024 * 1024,
+                )
+                _disk_cache_key = key
+            except Exception as e:
+                logger.error(f"磁盘缓存初始化失败: {e}")
+                return None
+        return _disk_cache
+
+
+def get_disk_cache_stats() -> Optional[Dict[str, Any]]:
+    """获取当前磁盘缓存统计（未启用返回 None）"""
+    cache = _disk_cache
+    return cache.stats() if cache else None
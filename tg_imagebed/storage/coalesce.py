@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回源请求合并（single-flight）
+
+同一对象 (后端, storage_key, Range) 的并发下载只向上游发起一次请求，
+其余请求等待首个请求的响应头，然后共享其响应体数据。
+首个请求的客户端中途断开时，只要仍有等待者，剩余数据由后台线程继续拉取。
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import StorageBackend, PutResult, DownloadResult, FileBody
+from ..config import logger
+
+
+DEFAULT_COALESCE_MAX_BYTES = 32 * 1024 * 1024   # 单个合并对象的内存上限
+DEFAULT_COALESCE_WAIT_SECONDS = 30.0            # 等待首个请求响应头的超时
+
+
+class _Flight:
+    """一次进行中的回源请求"""
+
+    def __init__(self) -> None:
+        self.cond = threading.Condition()
+        self.ready = False                          # 响应头已确定
+        self.result: Optional[DownloadResult] = None  # 可共享时的响应（不含 body）
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.failed = False
+        self.readers = 0
+
+    def publish(self, result: Optional[DownloadResult]) -> None:
+        with self.cond:
+            self.result = result
+            self.ready = True
+            self.cond.notify_all()
+
+    def append(self, chunk: bytes) -> None:
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, failed: bool) -> None:
+        with self.cond:
+            self.done = True
+            self.failed = failed
+            self.cond.notify_all()
+
+
+class _ClosingBody:
+    """
+    共享回源的响应体
+
+    WSGI 服务器在响应结束（包括客户端在响应体开始前断开）时调用 close()；
+    生成器未开始迭代时其 finally 不会执行，清理逻辑因此挂在 close() / 回收上。
+    """
+
+    def __init__(self, chunks: Iterator[bytes], on_close: Callable[[], None]) -> None:
+        self._chunks = chunks
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._chunks
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close:
+                close()
+        finally:
+            self._on_close()
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class CoalescingBackend(StorageBackend):
+    """合并并发回源请求的后端包装器"""
+
+    def __init__(
+        self,
+        inner: StorageBackend,
+        *,
+        max_bytes: int = DEFAULT_COALESCE_MAX_BYTES,
+        wait_seconds: float = DEFAULT_COALESCE_WAIT_SECONDS,
+    ):
+        self._inner = inner
+        self.name = inner.name
+        self._max_bytes = max_bytes
+        self._wait_seconds = wait_seconds
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    @property
+    def inner(self) -> StorageBackend:
+        """被包装的原始后端"""
+        return self._inner
+
+    def put_bytes(self, **kwargs: Any) -> Optional[PutResult]:
+        return self._inner.put_bytes(**kwargs)
+
+    def put_stream(self, **kwargs: Any) -> Optional[PutResult]:
+        return self._inner.put_stream(**kwargs)
+
+    @property
+    def max_batch_put(self) -> int:
+        return self._inner.max_batch_put
+
+    @property
+    def serve_mode(self) -> str:
+        return self._inner.serve_mode
+
+    def put_many(self, **kwargs: Any) -> List[Optional[PutResult]]:
+        return self._inner.put_many(**kwargs)
+
+    def delete(self, *, storage_key: str) -> bool:
+        return self._inner.delete(storage_key=storage_key)
+
+    def healthcheck(self) -> bool:
+        return self._inner.healthcheck()
+
+    def get_public_url(self, *, storage_key: str, file_info: Dict[str, Any]) -> Optional[str]:
+        return self._inner.get_public_url(storage_key=storage_key, file_info=file_info)
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
+
+    def download(
+        self,
+        *,
+        file_info: Dict[str, Any],
+        range_header: Optional[str],
+    ) -> DownloadResult:
+        """下载文件，合并同一对象的并发请求"""
+        storage_key = str(
+            file_info.get("storage_key") or
+            file_info.get("file_id") or ""
+        ).strip()
+        if not storage_key:
+            return self._inner.download(file_info=file_info, range_header=range_header)
+
+        key = (storage_key, range_header or "")
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["leaders"] += 1
+            else:
+                with flight.cond:
+                    flight.readers += 1
+                self._stats["followers"] += 1
+
+        if not leader:
+            return self._follow(flight, file_info, range_header)
+        return self._lead(key, flight, file_info, range_header)
+
+    def _release(self, key: Tuple[str, str], flight: _Flight) -> None:
+        """从进行中列表移除（之后的请求将重新回源）"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _lead(
+        self,
+        key: Tuple[str, str],
+        flight: _Flight,
+        file_info: Dict[str, Any],
+        range_header: Optional[str],
+    ) -> DownloadResult:
+        """首个请求：回源并发布响应"""
+        try:
+            dl = self._inner.download(file_info=file_info, range_header=range_header)
+        except Exception:
+            self._release(key, flight)
+            flight.publish(None)
+            flight.finish(failed=True)
+            raise
+
+        length: Optional[int] = None
+        try:
+            length = int(dl.headers.get("Content-Length")) if dl.headers.get("Content-Length") else None
+        except (TypeError, ValueError):
+            length = None
+
+        # 本地文件（磁盘缓存命中）、长度未知或过大的对象不共享，等待者各自回源
+        if isinstance(dl.body, FileBody) or length is None or length > self._max_bytes:
+            self._release(key, flight)
+            flight.publish(None)
+            flight.finish(failed=False)
+            return dl
+
+        shared = DownloadResult(
+            status_code=dl.status_code,
+            content_type=dl.content_type,
+            headers=dict(dl.headers or {}),
+            body=(),
+        )
+        flight.publish(shared)
+        return DownloadResult(
+            status_code=dl.status_code,
+            content_type=dl.content_type,
+            headers=dl.headers,
+            body=self._lead_body(key, flight, dl.body),
+            updated_fields=dl.updated_fields,
+        )
+
+    def _lead_body(self, key: Tuple[str, str], flight: _Flight, upstream: Iterable[bytes]) -> _ClosingBody:
+        """首个请求的响应体：边转发边写入共享缓冲"""
+        it = iter(upstream)
+        settled = threading.Lock()
+
+        def settle(completed: bool) -> None:
+            # 正常结束、中途断开、未读取即关闭三种情况只处理一次
+            if not settled.acquire(blocking=False):
+                return
+            if completed:
+                self._complete(key, flight, upstream, failed=False)
+                return
+            with flight.cond:
+                has_readers = flight.readers > 0
+            if has_readers:
+                # 首个客户端已断开，但仍有等待者：后台继续拉取
+                threading.Thread(
+                    target=self._pump, args=(key, flight, it, upstream),
+                    name="coalesce-pump", daemon=True,
+                ).start()
+            else:
+                self._complete(key, flight, upstream, failed=True)
+
+        def chunks() -> Iterator[bytes]:
+            completed = False
+            try:
+                for chunk in it:
+                    flight.append(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                settle(completed)
+
+        return _ClosingBody(chunks(), lambda: settle(False))
+
+    def _pump(self, key: Tuple[str, str], flight: _Flight, it: Iterator[bytes], upstream: Iterable[bytes]) -> None:
+        """后台拉取剩余数据"""
+        failed = False
+        try:
+            for chunk in it:
+                flight.append(chunk)
+        except Exception as e:
+            failed = True
+            logger.warning(f"合并回源后台拉取失败: {e}")
+        self._complete(key, flight, upstream, failed=failed)
+
+    def _complete(self, key: Tuple[str, str], flight: _Flight, upstream: Iterable[bytes], *, failed: bool) -> None:
+        self._release(key, flight)
+        flight.finish(failed=failed)
+        close = getattr(upstream, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def _follow(self, flight: _Flight, file_info: Dict[str, Any], range_header: Optional[str]) -> DownloadResult:
+        """等待首个请求的响应头，然后共享响应体"""
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.ready, timeout=self._wait_seconds)
+            shared = flight.result if flight.ready else None
+            if shared is None:
+                flight.readers -= 1
+
+        if shared is None:
+            return self._inner.download(file_info=file_info, range_header=range_header)
+
+        return DownloadResult(
+            status_code=shared.status_code,
+            content_type=shared.content_type,
+            headers=dict(shared.headers),
+            body=self._follow_body(flight),
+        )
+
+    @staticmethod
+    def _follow_body(flight: _Flight) -> _ClosingBody:
+        """按序读取共享缓冲"""
+        left = threading.Lock()
+
+        def leave() -> None:
+            # 读完、中途断开或未读取即关闭时退出等待者计数（只减一次）
+            if left.acquire(blocking=False):
+                with flight.cond:
+                    flight.readers -= 1
+
+        def chunks() -> Iterator[bytes]:
+            index = 0
+            try:
+                while True:
+                    with flight.cond:
+                        flight.cond.wait_for(lambda: index < len(flight.chunks) or flight.done)
+                        if index < len(flight.chunks):
+                            pending = flight.chunks[index:]
+                        elif flight.failed:
+                            raise IOError("upstream fetch aborted")
+                        else:
+                            return
+                    index += len(pending)
+                    for chunk in pending:
+                        yield chunk
+            finally:
+                leave()
+
+        return _ClosingBody(chunks(), leave)
@@ -7,17 +7,23 @@
 """
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import time
 import threading
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from .base import PutResult, StorageBackend
-from .backends.telegram import TelegramBackend
+from .cache import CachedBackend, get_disk_cache, normalize_cache_config
+from .coalesce import CoalescingBackend
+from .backends.telegram import TelegramBackend, FILE_PATH_TTL_SECONDS
 from .backends.local import LocalBackend
 from .backends.rclone import RcloneBackend
-from .backends.s3 import S3Backend
+from .backends.s3 import (
+    S3Backend, DEFAULT_MAX_ATTEMPTS, DEFAULT_MULTIPART_CONCURRENCY,
+    DEFAULT_MULTIPART_PART_SIZE_MB, DEFAULT_MULTIPART_THRESHOLD_MB, DEFAULT_PRESIGN_EXPIRES,
+)
 
 from ..config import get_proxy_url, logger
 from ..bot_control import get_effective_bot_token
@@ -37,24 +43,78 @@ def _resolve_config(cfg: Dict[str, Any]) -> Dict[str, Any]:
         if isinstance(v, dict):
             result[k] = _resolve_config(v)
         elif isinstance(v, list):
-            result[k] = [_resolve_env_ref(item) if isinstance(item, str) else item for item in v]
+            result[k] = [
+                _resolve_config(item) if isinstance(item, dict) else
+                _resolve_env_ref(item) if isinstance(item, str) else item
+                for item in v
+            ]
         else:
             result[k] = _resolve_env_ref(v)
     return result
 
 
+def _fingerprint(value: Any) -> str:
+    """计算配置指纹（用于判断配置是否变化）"""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _backend_fingerprint(cfg: Dict[str, Any]) -> str:
+    """
+    计算单个后端的构建指纹
+
+    包含解析环境变量后的配置，以及 telegram 驱动隐式依赖的 Bot Token 与代理设置。
+    """
+    cfg2 = _resolve_config(cfg)
+    extra: Dict[str, Any] = {}
+    if (cfg2.get("driver") or "").strip() in ("", "telegram"):
+        extra["effective_bot_token"] = get_effective_bot_token()[0]
+        extra["proxy_url"] = get_proxy_url()
+    return _fingerprint({"cfg": cfg2, "extra": extra})
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    """可选数值配置（未设置或无效时返回 None）"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class StorageRouter:
     """存储路由器"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        *,
+        previous: Optional["StorageRouter"] = None,
+    ):
         """
         初始化存储路由器
 
         Args:
             config: 存储配置
+            previous: 旧的路由器实例（配置未变化的后端实例将被复用）
         """
         self._config = config
         self._cache: Dict[str, StorageBackend] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # 旧路由器中可复用的后端：name -> (指纹, 实例)
+        self._reusable: Dict[str, Tuple[str, StorageBackend]] = {}
+        if previous is not None:
+            self._reusable = previous._export_backends()
+
+    def _export_backends(self) -> Dict[str, Tuple[str, StorageBackend]]:
+        """导出已构建的后端实例及其指纹（供新路由器复用）"""
+        with self._lock:
+            exported = dict(self._reusable)
+            for name, backend in self._cache.items():
+                exported[name] = (self._fingerprints[name], backend)
+            return exported
 
     def get_active_backend_name(self) -> str:
         """获取当前激活的后端名称"""
@@ -76,7 +136,19 @@ class StorageRouter:
             bot_token = str(cfg2.get("bot_token") or effective_token or "")
             chat_id = int(cfg2.get("chat_id") or 0)
             proxy_url = str(cfg2.get("proxy_url") or get_proxy_url() or "").strip() or None
-            return TelegramBackend(name=name, bot_token=bot_token, chat_id=chat_id, proxy_url=proxy_url)
+            file_path_ttl = int(cfg2.get("file_path_ttl_seconds") or FILE_PATH_TTL_SECONDS)
+            return TelegramBackend(
+                name=name,
+                bot_token=bot_token,
+                chat_id=chat_id,
+                proxy_url=proxy_url,
+                file_path_ttl=file_path_ttl,
+                prefetch_file_path=bool(cfg2.get("prefetch_file_path", True)),
+                shards=cfg2.get("shards") if isinstance(cfg2.get("shards"), list) else None,
+                bot_rate_per_second=_optional_float(cfg2.get("bot_rate_per_second")),
+                chat_rate_per_minute=_optional_float(cfg2.get("chat_rate_per_minute")),
+                upload_max_wait=_optional_float(cfg2.get("upload_max_wait")),
+            )
 
         if driver == "local":
             root_dir = str(cfg2.get("root_dir") or os.path.join(os.getcwd(), "data", "uploads"))
@@ -92,6 +164,7 @@ class StorageRouter:
                 cli_flags=list(cfg2.get("cli_flags") or []),
                 upload=dict(cfg2.get("upload") or {}),
                 download=dict(cfg2.get("download") or {}),
+                daemon=dict(cfg2.get("daemon") or {}),
             )
 
         if driver == "s3":
@@ -104,14 +177,32 @@ class StorageRouter:
                 region=str(cfg2.get("region") or "auto"),
                 public_url_prefix=str(cfg2.get("public_url_prefix") or ""),
                 path_style=bool(cfg2.get("path_style", False)),
+                multipart_threshold_mb=int(cfg2.get("multipart_threshold_mb") or DEFAULT_MULTIPART_THRESHOLD_MB),
+                multipart_part_size_mb=int(cfg2.get("multipart_part_size_mb") or DEFAULT_MULTIPART_PART_SIZE_MB),
+                multipart_concurrency=int(cfg2.get("multipart_concurrency") or DEFAULT_MULTIPART_CONCURRENCY),
+                max_attempts=int(cfg2.get("max_attempts") or DEFAULT_MAX_ATTEMPTS),
+                serve_mode=str(cfg2.get("serve_mode") or "proxy"),
+                presign_expires=int(cfg2.get("presign_expires") or DEFAULT_PRESIGN_EXPIRES),
             )
 
         raise ValueError(f"未知的存储驱动: {driver}")
 
+    def _cache_config_for(self, name: str, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """返回适用于该后端的磁盘缓存配置（未启用返回 None）"""
+        cache_cfg = normalize_cache_config(self._config.get("cache"))
+        if not cache_cfg["enabled"]:
+            return None
+        if cache_cfg["backends"] is not None:
+            return cache_cfg if name in cache_cfg["backends"] else None
+        # 未指定后端列表时，默认只缓存远端后端（local 本身就在磁盘上）
+        driver = (cfg.get("driver") or name).strip()
+        return cache_cfg if driver != "local" else None
+
     def get_backend(self, name: str) -> StorageBackend:
         """获取指定名称的后端实例"""
-        if name in self._cache:
-            return self._cache[name]
+        backend = self._cache.get(name)
+        if backend is not None:
+            return backend
 
         backends_cfg = self._config.get("backends") or {}
         cfg = backends_cfg.get(name)
@@ -122,9 +213,27 @@ class StorageRouter:
             cfg = backends_cfg.get("telegram") or {"driver": "telegram"}
             name = "telegram"
 
-        backend = self._build_backend(name, cfg)
-        self._cache[name] = backend
-        return backend
+        with self._lock:
+            backend = self._cache.get(name)
+            if backend is not None:
+                return backend
+
+            cache_cfg = self._cache_config_for(name, cfg)
+            fp = _fingerprint([_backend_fingerprint(cfg), cache_cfg])
+            reused = self._reusable.pop(name, None)
+            if reused and reused[0] == fp:
+                backend = reused[1]
+            else:
+                backend = self._build_backend(name, cfg)
+                disk_cache = get_disk_cache(cache_cfg) if cache_cfg else None
+                if disk_cache is not None:
+                    backend = CachedBackend(backend, disk_cache)
+                # 远端后端合并并发回源（位于磁盘缓存外层，缓存未命中只回源并写入一次）
+                if (cfg.get("driver") or name).strip() != "local":
+                    backend = CoalescingBackend(backend)
+            self._cache[name] = backend
+            self._fingerprints[name] = fp
+            return backend
 
     def get_backend_for_record(self, file_info: Dict[str, Any]) -> StorageBackend:
         """根据文件记录获取对应的后端"""
@@ -253,6 +362,7 @@ class StorageRouter:
 # 全局路由器缓存
 _router: Optional[StorageRouter] = None
 _router_ts: float = 0.0
+_router_fp: str = ""  # 构建 _router 时的配置指纹
 _router_lock = threading.Lock()  # 保护缓存读写的线程锁
 
 
@@ -284,37 +394,57 @@ def _load_storage_config() -> Dict[str, Any]:
     }
 
 
+def _router_fingerprint(cfg: Dict[str, Any]) -> str:
+    """路由器级指纹：存储配置 + telegram 驱动依赖的全局设置"""
+    return _fingerprint({
+        "cfg": _resolve_config(cfg),
+        "effective_bot_token": get_effective_bot_token()[0],
+        "proxy_url": get_proxy_url(),
+    })
+
+
 def get_storage_router(*, ttl_seconds: int = 5) -> StorageRouter:
     """
     获取存储路由器实例（带缓存，线程安全）
 
+    TTL 到期后仅重新读取配置并比较指纹；配置未变化时沿用原路由器，
+    保留后端实例上的连接池（requests.Session / boto3 client）。
+
     Args:
-        ttl_seconds: 缓存有效期（秒）
+        ttl_seconds: 配置检查间隔（秒）
 
     Returns:
         StorageRouter 实例
     """
-    global _router, _router_ts
+    global _router, _router_ts, _router_fp
     now = time.time()
     # 快速路径：缓存有效时直接返回（无锁读取）
     if _router and (now - _router_ts) < ttl_seconds:
         return _router
     with _router_lock:
-        # 双重检查：进入锁后再次验证，避免重复创建
+        # 双重检查：进入锁后再次验证，避免重复检查
         now = time.time()
         if _router and (now - _router_ts) < ttl_seconds:
             return _router
         cfg = _load_storage_config()
-        _router = StorageRouter(cfg)
+        fp = _router_fingerprint(cfg)
+        if _router is None or fp != _router_fp:
+            _router = StorageRouter(cfg, previous=_router)
+            _router_fp = fp
         _router_ts = now
         return _router
 
 
 def reload_storage_router() -> StorageRouter:
-    """强制重新加载存储路由器（线程安全）"""
-    global _router, _router_ts
+    """
+    强制重新加载存储路由器（线程安全）
+
+    供管理端修改存储配置后显式调用；配置未变化的后端实例仍会被复用。
+    """
+    global _router, _router_ts, _router_fp
     with _router_lock:
         cfg = _load_storage_config()
-        _router = StorageRouter(cfg)
+        _router = StorageRouter(cfg, previous=_router)
+        _router_fp = _router_fingerprint(cfg)
         _router_ts = time.time()
         return _router
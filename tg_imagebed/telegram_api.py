@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telegram Bot API 客户端
+
+所有调用 Bot API 的代码路径（存储后端、file_path 刷新、管理端删除消息、机器人线程）共享：
+- 每个 Bot、每个聊天的令牌桶限流：发送前排队等待，避免突发请求触发 429
+- 429 retry_after：记录冷却时间，冷却期内所有路径对同一 Bot/聊天的请求都会等待
+- 按代理复用的 requests.Session 连接池
+- 按方法统计请求数、失败数、429 次数与限流等待时间
+"""
+import json
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import logger
+
+
+# Telegram 官方建议：单个 Bot 全局约 30 条/秒，同一群组/频道约 20 条/分钟
+# （默认值，可由 telegram 存储后端配置按 Bot 覆盖）
+TELEGRAM_BOT_RATE_PER_SECOND = 30.0
+TELEGRAM_CHAT_RATE_PER_MINUTE = 20.0
+# 调用方未指定时，限流等待的最长时间（秒），超过时不发送请求（getFile 等交互路径）；
+# 上传路径默认不设上限，排队等待
+TELEGRAM_MAX_WAIT_SECONDS = 30.0
+# 429 响应未给出 retry_after 时的默认冷却时间（秒）
+TELEGRAM_DEFAULT_RETRY_AFTER = 5.0
+# 连接池大小（每个代理一个 Session）
+TELEGRAM_POOL_MAXSIZE = 32
+
+# 会向聊天发送/修改消息的方法：同时受聊天级限流
+CHAT_METHODS = frozenset({
+    'sendMessage', 'sendPhoto', 'sendDocument', 'sendMediaGroup', 'sendAnimation',
+    'sendVideo', 'copyMessage', 'forwardMessage', 'editMessageText', 'editMessageCaption',
+    'editMessageReplyMarkup',
+})
+# 不参与限流的方法（长轮询）
+UNLIMITED_METHODS = frozenset({'getUpdates'})
+
+
+class TelegramRateLimitError(RuntimeError):
+    """限流等待时间超过调用方允许的上限，请求未发送"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'telegram rate limited, retry after {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    """令牌桶（需在限流器锁内调用）"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate: float, capacity: float, now: float) -> None:
+        """调整速率与容量（已积累的令牌不超过新容量）"""
+        self._refill(now)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float, now: float) -> float:
+        """距离可取出 cost 个令牌还需等待的秒数"""
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        """取出令牌（允许为负：后续请求排在本次预约之后）"""
+        self.tokens -= min(cost, self.capacity)
+
+
+def _bot_key(bot_token: str) -> str:
+    """Token 中冒号前的部分即 Bot 用户 ID"""
+    return (bot_token or '').split(':', 1)[0]
+
+
+class TelegramRateLimiter:
+    """按 Bot 与 (Bot, 聊天) 维度的令牌桶 + 429 冷却（线程安全）"""
+
+    def __init__(
+        self,
+        *,
+        bot_rate: float = TELEGRAM_BOT_RATE_PER_SECOND,
+        chat_rate_per_minute: float = TELEGRAM_CHAT_RATE_PER_MINUTE,
+    ):
+        self._bot_rate = bot_rate
+        self._chat_rate_per_minute = chat_rate_per_minute
+        self._overrides: Dict[str, Tuple[float, float]] = {}  # bot_key -> (每秒, 每聊天每分钟)
+        self._bots: Dict[str, _TokenBucket] = {}
+        self._chats: Dict[Tuple[str, str], _TokenBucket] = {}
+        self._blocked: Dict[Any, float] = {}      # bot_key 或 (bot_key, chat) -> 冷却结束时间
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        bot_token: str,
+        *,
+        bot_rate: Optional[float] = None,
+        chat_rate_per_minute: Optional[float] = None,
+    ) -> None:
+        """
+        设置某个 Bot 的限流速率（None 表示使用默认值）
+
+        Args:
+            bot_token: Bot Token
+            bot_rate: Bot 全局请求数 / 秒
+            chat_rate_per_minute: 同一聊天的消息数 / 分钟
+        """
+        bot = _bot_key(bot_token)
+        rates = (
+            float(bot_rate) if bot_rate else self._bot_rate,
+            float(chat_rate_per_minute) if chat_rate_per_minute else self._chat_rate_per_minute,
+        )
+        with self._lock:
+            if self._overrides.get(bot, (self._bot_rate, self._chat_rate_per_minute)) == rates:
+                return
+            self._overrides[bot] = rates
+            now = time.monotonic()
+            if bot in self._bots:
+                self._bots[bot].set_rate(rates[0], rates[0], now)
+            for (chat_bot, _chat), bucket in self._chats.items():
+                if chat_bot == bot:
+                    bucket.set_rate(rates[1] / 60.0, rates[1], now)
+
+    def _buckets(self, bot: str, chat: Optional[str]) -> Tuple[_TokenBucket, Optional[_TokenBucket]]:
+        bot_rate, chat_per_minute = self._overrides.get(bot, (self._bot_rate, self._chat_rate_per_minute))
+        bot_bucket = self._bots.get(bot)
+        if bot_bucket is None:
+            bot_bucket = self._bots[bot] = _TokenBucket(bot_rate, bot_rate)
+        chat_bucket = None
+        if chat is not None:
+            chat_bucket = self._chats.get((bot, chat))
+            if chat_bucket is None:
+                chat_bucket = self._chats[(bot, chat)] = _TokenBucket(chat_per_minute / 60.0, chat_per_minute)
+        return bot_bucket, chat_bucket
+
+    def _delay(self, bot: str, chat: Optional[str], cost: float, now: float) -> float:
+        bot_bucket, chat_bucket = self._buckets(bot, chat)
+        wall = time.time()
+        delay = max(
+            bot_bucket.delay(1, now),
+            chat_bucket.delay(cost, now) if chat_bucket else 0.0,
+            self._blocked.get(bot, 0.0) - wall,
+            self._blocked.get((bot, chat), 0.0) - wall if chat is not None else 0.0,
+        )
+        return max(0.0, delay)
+
+    def estimate(self, bot_token: str, chat_id: Any = None, cost: float = 1) -> float:
+        """估算发送请求前需要等待的秒数（不预约）"""
+        chat = str(chat_id) if chat_id is not None else None
+        with self._lock:
+            return self._delay(_bot_key(bot_token), chat, cost, time.monotonic())
+
+    def reserve(
+        self,
+        bot_token: str,
+        chat_id: Any = None,
+        cost: float = 1,
+        max_wait: Optional[float] = None,
+    ) -> float:
+        """
+        预约一次请求
+
+        Returns:
+            发送前需要等待的秒数
+
+        Raises:
+            TelegramRateLimitError: 等待时间超过 max_wait（未预约）
+        """
+        bot = _bot_key(bot_token)
+        chat = str(chat_id) if chat_id is not None else None
+        with self._lock:
+            now = time.monotonic()
+            delay = self._delay(bot, chat, cost, now)
+            if max_wait is not None and delay > max_wait:
+                raise TelegramRateLimitError(delay)
+            bot_bucket, chat_bucket = self._buckets(bot, chat)
+            bot_bucket.take(1)
+            if chat_bucket:
+                chat_bucket.take(cost)
+            return delay
+
+    def block(self, bot_token: str, chat_id: Any, retry_after: float) -> None:
+        """记录 429 冷却：带聊天的请求冷却该聊天，否则冷却整个 Bot"""
+        bot = _bot_key(bot_token)
+        key: Any = (bot, str(chat_id)) if chat_id is not None else bot
+        until = time.time() + max(0.0, retry_after)
+        with self._lock:
+            self._blocked[key] = max(self._blocked.get(key, 0.0), until)
+            # 顺带清理已过期的冷却记录
+            now = time.time()
+            for k in [k for k, v in self._blocked.items() if v <= now]:
+                del self._blocked[k]
+
+
+_limiter = TelegramRateLimiter()
+
+_stats: Dict[str, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(method: str, *, status: Optional[int] = None, waited: float = 0.0, rejected: bool = False) -> None:
+    with _stats_lock:
+        item = _stats.get(method)
+        if item is None:
+            item = _stats[method] = {'calls': 0, 'errors': 0, 'throttled': 0, 'rejected': 0, 'waited': 0.0}
+        item['waited'] += waited
+        if rejected:
+            item['rejected'] += 1
+            return
+        item['calls'] += 1
+        if status == 429:
+            item['throttled'] += 1
+        if status is None or status >= 400:
+            item['errors'] += 1
+
+
+def parse_retry_after(resp: requests.Response) -> float:
+    """从 429 响应中解析 retry_after（秒）"""
+    try:
+        params = (resp.json() or {}).get('parameters') or {}
+        return float(params.get('retry_after') or resp.headers.get('Retry-After') or TELEGRAM_DEFAULT_RETRY_AFTER)
+    except Exception:
+        return TELEGRAM_DEFAULT_RETRY_AFTER
+
+
+def request_cost(method: str, data: Optional[Dict[str, Any]]) -> int:
+    """请求占用的聊天消息配额（相册按文件数计）"""
+    if method == 'sendMediaGroup' and data:
+        media = data.get('media')
+        if isinstance(media, str):
+            try:
+                media = json.loads(media)
+            except ValueError:
+                media = None
+        if isinstance(media, list) and media:
+            return len(media)
+    return 1
+
+
+class TelegramApiClient:
+    """共享连接池与限流器的 Bot API 客户端"""
+
+    def __init__(self, proxy_url: Optional[str] = None):
+        self._session = requests.Session()
+        self._session.trust_env = True
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=TELEGRAM_POOL_MAXSIZE)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        if proxy_url:
+            self._session.proxies = {'http': proxy_url, 'https': proxy_url}
+
+    def estimate_wait(self, bot_token: str, chat_id: Any = None, cost: float = 1) -> float:
+        """估算向该 Bot/聊天发送请求前需要等待的秒数"""
+        return _limiter.estimate(bot_token, chat_id, cost)
+
+    def call(
+        self,
+        bot_token: str,
+        method: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: float = 30,
+        max_wait: Optional[float] = TELEGRAM_MAX_WAIT_SECONDS,
+        max_retries: int = 1,
+    ) -> requests.Response:
+        """
+        调用 Bot API 方法
+
+        发送前按令牌桶排队；收到 429 时记录冷却，retry_after 不超过 max_wait 时自动重试
+        （files 中的内容须为 bytes 才能重发）。
+
+        Args:
+            bot_token: Bot Token
+            method: 方法名（如 sendPhoto、getFile）
+            params: 查询参数（有参数且无 data/files 时使用 GET）
+            data: 表单数据
+            files: multipart 文件
+            timeout: 请求超时
+            max_wait: 限流等待上限（秒），None 表示不限
+            max_retries: 429 后的最大重试次数
+
+        Returns:
+            最后一次响应（可能仍为 429）
+
+        Raises:
+            TelegramRateLimitError: 需要等待的时间超过 max_wait
+            requests.RequestException: 网络错误
+        """
+        source = data if data is not None else params
+        chat_id = (source or {}).get('chat_id') if method in CHAT_METHODS else None
+        cost = request_cost(method, data)
+        url = f"https://api.telegram.org/bot{bot_token}/{method}"
+        http_method = 'POST' if (data is not None or files is not None or params is None) else 'GET'
+
+        attempt = 0
+        while True:
+            waited = 0.0
+            if method not in UNLIMITED_METHODS:
+                try:
+                    waited = _limiter.reserve(bot_token, chat_id, cost, max_wait)
+                except TelegramRateLimitError:
+                    _record(method, rejected=True)
+                    raise
+                if waited > 0:
+                    time.sleep(waited)
+            try:
+                resp = self._session.request(
+                    http_method, url, params=params, data=data, files=files, timeout=timeout
+                )
+            except requests.RequestException:
+                _record(method, waited=waited)
+                raise
+            _record(method, status=resp.status_code, waited=waited)
+            if resp.status_code != 429:
+                return resp
+
+            retry_after = parse_retry_after(resp)
+            _limiter.block(bot_token, chat_id, retry_after)
+            logger.warning(
+                f"Telegram API 限流: bot={_bot_key(bot_token)} method={method} "
+                f"chat={chat_id} retry_after={retry_after}s"
+            )
+            if attempt >= max_retries or (max_wait is not None and retry_after > max_wait):
+                return resp
+            attempt += 1
+            resp.close()
+
+    def download(self, url: str, *, headers: Optional[Dict[str, str]] = None, timeout: float = 60) -> requests.Response:
+        """流式下载文件（文件下载不占用 Bot API 配额）"""
+        try:
+            resp = self._session.get(url, stream=True, timeout=timeout, headers=headers)
+        except requests.RequestException:
+            _record('file')
+            raise
+        _record('file', status=resp.status_code)
+        return resp
+
+
+_clients: Dict[str, TelegramApiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_telegram_client(proxy_url: Optional[str] = None) -> TelegramApiClient:
+    """获取共享客户端（同一代理复用同一连接池）"""
+    proxy = (proxy_url or '').strip()
+    if proxy and '://' not in proxy:
+        proxy = f"http://{proxy}"
+    with _clients_lock:
+        client = _clients.get(proxy)
+        if client is None:
+            client = _clients[proxy] = TelegramApiClient(proxy or None)
+        return client
+
+
+def get_telegram_rate_limiter() -> TelegramRateLimiter:
+    """获取全局限流器（供 python-telegram-bot 的限流适配器使用）"""
+    return _limiter
+
+
+def record_telegram_api_call(method: str, *, status: Optional[int], waited: float = 0.0) -> None:
+    """记录一次不经过 TelegramApiClient 的调用（如机器人线程）"""
+    _record(method, status=status, waited=waited)
+
+
+def get_telegram_api_stats() -> Dict[str, Dict[str, float]]:
+    """按方法的请求统计（用于监控）"""
+    with _stats_lock:
+        return {
+            method: {**item, 'waited': round(item['waited'], 3)}
+            for method, item in _stats.items()
+        }
+
+
+__all__ = [
+    'TelegramApiClient', 'TelegramRateLimiter', 'TelegramRateLimitError',
+    'CHAT_METHODS', 'UNLIMITED_METHODS',
+    'get_telegram_client', 'get_telegram_rate_limiter', 'get_telegram_api_stats',
+    'record_telegram_api_call', 'parse_retry_after', 'request_cost',
+]
@@ -180,8 +180,13 @@ def add_cache_headers(response: Response, cache_type: str = 'public', max_age: O
         response.headers['X-XSS-Protection'] = '1; mode=block'
         return response
 
-    # 从数据库获取 CDN 启用状态
-    _, cdn_enabled = _get_effective_domain_settings()
+    # 从设置快照获取 CDN 配置
+    try:
+        from .database import get_settings_snapshot
+        settings = get_settings_snapshot()
+    except Exception:
+        settings = None
+    cdn_enabled = settings.get_bool('cdn_enabled') if settings else False
 
     # CDN 未启用时的处理
     if not cdn_enabled:
@@ -191,22 +196,11 @@ def add_cache_headers(response: Response, cache_type: str = 'public', max_age: O
             response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         return response
 
-    # 设置默认 max_age（从 DB 读取 CDN 缓存 TTL）
+    # 设置默认 max_age（CDN 缓存 TTL）及 edge/browser TTL
     if max_age is None:
-        try:
-            from .database import get_system_setting_int
-            max_age = get_system_setting_int('cdn_cache_ttl', 86400, minimum=0)
-        except Exception:
-            max_age = 86400
-
-    # 从 DB 读取 edge/browser TTL
-    try:
-        from .database import get_system_setting_int as _gsi
-        edge_ttl = _gsi('cloudflare_edge_ttl', 86400, minimum=0)
-        browser_ttl = _gsi('cloudflare_browser_ttl', 3600, minimum=0)
-    except Exception:
-        edge_ttl = 86400
-        browser_ttl = 3600
+        max_age = settings.get_int('cdn_cache_ttl', 86400, minimum=0)
+    edge_ttl = settings.get_int('cloudflare_edge_ttl', 86400, minimum=0)
+    browser_ttl = settings.get_int('cloudflare_browser_ttl', 3600, minimum=0)
 
     # 根据缓存类型设置头部
     if cache_type == 'public':
@@ -256,43 +250,24 @@ def format_size(size_bytes: int) -> str:
 
 
 # ===================== 域名获取 =====================
-_DOMAIN_SETTINGS_CACHE = {"ts": 0.0, "domain": "", "cdn_enabled": False}
-
-
 def clear_domain_cache() -> None:
     """清除域名设置缓存，使设置立即生效"""
-    _DOMAIN_SETTINGS_CACHE["ts"] = 0.0
-    _DOMAIN_SETTINGS_CACHE["domain"] = ""
-    _DOMAIN_SETTINGS_CACHE["cdn_enabled"] = False
+    from .database import invalidate_settings_snapshot
+    invalidate_settings_snapshot()
 
 
 def _get_effective_domain_settings():
     """
-    从数据库读取域名/cdn_enabled 设置。
-    失败时回退到环境变量配置。
+    从设置快照读取域名/cdn_enabled 设置。
+    失败时回退到默认值。
     """
-    import time as _time
-    now = _time.time()
-    age = now - _DOMAIN_SETTINGS_CACHE["ts"]
-    if 0.0 <= age < 1.0:
-        return _DOMAIN_SETTINGS_CACHE["domain"], _DOMAIN_SETTINGS_CACHE["cdn_enabled"]
-
-    domain = ""
-    cdn_enabled = False
     try:
-        from .database import get_system_setting
-        domain = str(get_system_setting("cloudflare_cdn_domain") or "").strip()
-        cdn_enabled = str(get_system_setting("cdn_enabled") or "0") == "1"
-        logger.debug(f"[域名配置] 从数据库读取: domain='{domain}', cdn_enabled={cdn_enabled}")
+        from .database import get_settings_snapshot
+        settings = get_settings_snapshot()
+        return settings.get_str("cloudflare_cdn_domain"), settings.get_bool("cdn_enabled")
     except Exception as e:
-        domain = ""
-        cdn_enabled = False
-        logger.warning(f"[域名配置] 数据库读取失败，使用默认值: error={e}")
-
-    _DOMAIN_SETTINGS_CACHE["ts"] = now
-    _DOMAIN_SETTINGS_CACHE["domain"] = domain
-    _DOMAIN_SETTINGS_CACHE["cdn_enabled"] = cdn_enabled
-    return domain, cdn_enabled
+        logger.warning(f"[域名配置] 读取设置失败，使用默认值: error={e}")
+        return "", False
 
 
 def get_domain(request) -> str: